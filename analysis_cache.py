@@ -0,0 +1,206 @@
+"""
+Cache persistente de análises (envelope de volume, dados derivados e metadados da mídia) em disco.
+"""
+import os
+import json
+import hashlib
+import logging
+import tempfile
+import numpy as np
+from config import AUDIO_EXTRACTION_PARAMS, CACHE_PARAMS
+
+# Quantidade de bytes lidos do início e do fim do arquivo para o hash parcial
+PARTIAL_HASH_BYTES = 1024 * 1024
+
+# Parâmetros de extração que alteram o conteúdo do envelope
+_ENVELOPE_PARAM_KEYS = ("audio_codec", "audio_channels", "sample_rate", "audio_stream")
+
+def file_fingerprint(path):
+    """Identidade do arquivo: caminho, tamanho, mtime e hash do início e do fim do conteúdo."""
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        digest.update(f.read(PARTIAL_HASH_BYTES))
+        if stat.st_size > 2 * PARTIAL_HASH_BYTES:
+            f.seek(-PARTIAL_HASH_BYTES, os.SEEK_END)
+            digest.update(f.read(PARTIAL_HASH_BYTES))
+
+    return f"{path}|{stat.st_size}|{stat.st_mtime_ns}|{digest.hexdigest()}"
+
+def analysis_key(path, params=None):
+    """Chave de cache para a análise de um arquivo com os parâmetros de extração atuais."""
+    params = params if params is not None else {k: AUDIO_EXTRACTION_PARAMS[k] for k in _ENVELOPE_PARAM_KEYS}
+    payload = json.dumps([file_fingerprint(path), params], sort_keys=True)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+class AnalysisCache:
+    """Arrays NumPy em disco indexados por chave e tipo, com remoção LRU por tamanho.
+
+    Cada item é salvo como {chave}.{tipo}.npy; o mtime do arquivo marca o último
+    uso e os itens mais antigos são removidos quando o limite é ultrapassado.
+    """
+
+    def __init__(self, directory=None, max_size_mb=None):
+        self.directory = (directory or CACHE_PARAMS["directory"]
+                          or os.path.join(os.path.expanduser("~"), ".auto_edit_cache"))
+        max_size_mb = max_size_mb if max_size_mb is not None else CACHE_PARAMS["max_size_mb"]
+        self.max_size = int(max_size_mb * 1024 * 1024)
+        os.makedirs(self.directory, exist_ok=True)
+
+    def path(self, key, kind="envelope", ext="npy"):
+        return os.path.join(self.directory, f"{key}.{kind}.{ext}")
+
+    def load(self, key, kind="envelope"):
+        """Retorna o array salvo ou None se não estiver no cache."""
+        path = self.path(key, kind)
+        try:
+            array = np.load(path, allow_pickle=False)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logging.warning(f"Item de cache corrompido, ignorando: {path} ({str(e)})")
+            self._remove(path)
+            return None
+
+        self._touch(path)
+        return array
+
+    def store(self, key, array, kind="envelope"):
+        """Salva um array no cache de forma atômica."""
+        path = self.path(key, kind)
+        fd, temp_path = self._temp_path(path)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, np.asarray(array), allow_pickle=False)
+            os.replace(temp_path, path)
+        except BaseException:
+            self._remove(temp_path)
+            raise
+        self.evict()
+        return path
+
+    def load_json(self, key, kind):
+        """Retorna os metadados salvos em JSON ou None se não estiverem no cache."""
+        path = self.path(key, kind, "json")
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logging.warning(f"Item de cache corrompido, ignorando: {path} ({str(e)})")
+            self._remove(path)
+            return None
+
+        self._touch(path)
+        return data
+
+    def store_json(self, key, data, kind):
+        """Salva metadados (dicionários, listas, números) em JSON de forma atômica."""
+        path = self.path(key, kind, "json")
+        fd, temp_path = self._temp_path(path)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(temp_path, path)
+        except BaseException:
+            self._remove(temp_path)
+            raise
+        self.evict()
+        return path
+
+    def writer(self, key, dtype=np.float32, kind="envelope"):
+        """Retorna um ArrayWriter para gravar um array 1D em pedaços, sem mantê-lo em memória."""
+        return ArrayWriter(self, key, dtype, kind)
+
+    def evict(self):
+        """Remove os itens usados há mais tempo até o cache caber em max_size."""
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".tmp") or name.endswith(".part"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_size:
+                break
+            self._remove(path)
+            total -= size
+
+    def _temp_path(self, path, suffix=".tmp"):
+        """Cria um arquivo temporário exclusivo ao lado de path e retorna (descritor, caminho).
+
+        O nome é único mesmo entre threads do mesmo processo gravando a mesma
+        chave (ex.: aquecimento da interface e detecção); evict ignora o sufixo.
+        """
+        return tempfile.mkstemp(dir=self.directory, prefix=f"{os.path.basename(path)}.", suffix=suffix)
+
+    def _touch(self, path):
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError as e:
+            logging.warning(f"Erro ao remover item do cache: {str(e)}")
+
+class ArrayWriter:
+    """Grava um array 1D no cache pedaço a pedaço; só aparece no cache após commit()."""
+
+    def __init__(self, cache, key, dtype, kind):
+        self.cache = cache
+        self.key = key
+        self.kind = kind
+        self.dtype = np.dtype(dtype)
+        fd, self._part_path = cache._temp_path(cache.path(key, kind), ".part")
+        self._file = os.fdopen(fd, "wb")
+        self.count = 0
+
+    def append(self, values):
+        values = np.asarray(values, dtype=self.dtype)
+        values.tofile(self._file)
+        self.count += len(values)
+
+    def commit(self):
+        """Converte os dados gravados em .npy e publica no cache."""
+        self._file.close()
+        try:
+            data = (np.memmap(self._part_path, dtype=self.dtype, mode="r") if self.count
+                    else np.empty(0, dtype=self.dtype))
+            self.cache.store(self.key, data, self.kind)
+            del data
+        finally:
+            self.cache._remove(self._part_path)
+
+    def discard(self):
+        """Descarta os dados gravados (ex.: análise interrompida)."""
+        self._file.close()
+        self.cache._remove(self._part_path)
+
+_default_cache = None
+_default_settings = None
+
+def get_cache():
+    """Cache padrão configurado por CACHE_PARAMS, ou None se estiver desativado.
+
+    É recriado quando a pasta ou o tamanho máximo mudam (ex.: nas configurações da interface).
+    """
+    global _default_cache, _default_settings
+    if not CACHE_PARAMS["enabled"]:
+        return None
+    settings = (CACHE_PARAMS["directory"], CACHE_PARAMS["max_size_mb"])
+    if _default_cache is None or settings != _default_settings:
+        _default_cache = AnalysisCache()
+        _default_settings = settings
+    return _default_cache
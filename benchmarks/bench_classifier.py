@@ -0,0 +1,249 @@
+"""
+Benchmark rotulado do classificador música/fala (classifier.py).
+
+Gera trechos sintéticos rotulados, calcula as características e as notas
+exatamente como a detecção (compute_features + music_scores) e mede quanto as
+notas separam as duas classes:
+    música: acordes com harmônicos e pulsação, arpejos, com andamento, tom,
+            timbre e ruído de fundo sorteados
+    fala:   sílabas sonoras com altura que desliza, consoantes surdas (ruído)
+            e pausas entre palavras, com voz, ritmo e ruído de fundo sorteados
+Gravações reais podem ser adicionadas com --labelled ROTULO:CAMINHO (decodificadas
+pelo ffmpeg como na detecção; --clips 0 avalia só elas).
+
+O relatório traz, por classe, a distribuição de cada indicador de
+music_indicators e da nota, a acurácia no limiar (DETECTION_PARAMS["music_threshold"])
+e a AUC (probabilidade de uma janela de música ter nota maior que uma de fala).
+Para cada indicador também é sugerido um centro: o ponto médio entre as
+medianas das duas classes. Os centros e escalas de classifier.py
+(_LOW_ENERGY_CENTER etc.) foram escolhidos à mão, não ajustados a um conjunto
+rotulado; este benchmark é a verificação deles (no conjunto sintético padrão
+todas as janelas ficam do lado certo do limiar) e o ponto de partida para
+recalibrá-los com gravações reais.
+
+Com --check o script termina com código 1 se a acurácia ou a AUC ficarem
+abaixo de --min-accuracy/--min-auc, para ser usado como teste na integração contínua.
+
+Exemplos:
+    python benchmarks/bench_classifier.py
+    python benchmarks/bench_classifier.py --clips 20 --duration 60 --output classificador.json
+    python benchmarks/bench_classifier.py --labelled music:show.mp3 speech:entrevista.wav
+    python benchmarks/bench_classifier.py --check
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+LABELS = ("music", "speech")
+
+# Acordes (Hz) das progressões sintéticas, transpostos por um fator sorteado
+CHORDS = ((261.6, 329.6, 392.0), (220.0, 261.6, 329.6), (174.6, 220.0, 261.6), (196.0, 246.9, 293.7))
+
+def synth_music(rng, duration, sample_rate):
+    """Progressão de acordes (ou arpejo) com harmônicos, pulsação e ruído de fundo."""
+    t = np.arange(int(duration * sample_rate)) / sample_rate
+    out = np.zeros_like(t)
+    transpose = 2 ** (rng.integers(-5, 7) / 12)
+    chord_len = rng.choice((1.0, 2.0, 4.0))
+    beat = rng.uniform(0.4, 0.75)  # segundos entre batidas
+    harmonics = rng.integers(2, 7)
+    arpeggio = rng.random() < 0.4
+    for i in range(int(np.ceil(duration / chord_len))):
+        piece = slice(int(i * chord_len * sample_rate), int((i + 1) * chord_len * sample_rate))
+        tt = t[piece]
+        chord = [f * transpose for f in CHORDS[i % len(CHORDS)]]
+        if arpeggio:
+            # Uma nota do acorde por batida, sustentada sobre a tônica
+            note = np.asarray(chord)[(tt // beat).astype(int) % len(chord)]
+            phase = 2 * np.pi * np.cumsum(note) / sample_rate
+            tone = sum(np.sin(h * phase) / h for h in range(1, harmonics + 1))
+            tone += 0.5 * np.sin(2 * np.pi * chord[0] * tt)
+        else:
+            tone = sum(np.sin(2 * np.pi * f * h * tt) / h for f in chord for h in range(1, harmonics + 1))
+        out[piece] = tone * (0.6 + 0.4 * np.exp(-(tt % beat) * 8))
+    out /= np.abs(out).max() + 1e-9
+    return out + rng.uniform(0.005, 0.05) * rng.standard_normal(len(t))
+
+def synth_speech(rng, duration, sample_rate):
+    """Palavras de sílabas sonoras (altura que desliza) e surdas, separadas por pausas."""
+    n = int(duration * sample_rate)
+    pitch = rng.uniform(90, 220)  # Voz grave a aguda
+    rate = rng.uniform(0.8, 1.3)  # Ritmo da fala
+    parts, total = [], 0
+    while total < n:
+        for _ in range(rng.integers(2, 6)):
+            if rng.random() < 0.35:
+                x = rng.standard_normal(int(0.08 * sample_rate / rate)) * 0.5
+            else:
+                d = int(rng.uniform(0.12, 0.25) * sample_rate / rate)
+                tt = np.arange(d) / sample_rate
+                f0 = pitch * rng.uniform(0.8, 1.2) * (1 + 0.3 * tt / tt[-1] * rng.choice((-1, 1)))
+                phase = 2 * np.pi * np.cumsum(f0) / sample_rate
+                x = sum(np.sin(k * phase) / k for k in range(1, 12))
+            parts.append(x * np.hanning(len(x)))
+            total += len(x)
+        pause = np.zeros(int(rng.uniform(0.15, 0.45) * sample_rate / rate))
+        parts.append(pause)
+        total += len(pause)
+    out = np.concatenate(parts)[:n]
+    out /= np.abs(out).max() + 1e-9
+    return out + rng.uniform(0.001, 0.02) * rng.standard_normal(n)
+
+SYNTHESIZERS = {"music": synth_music, "speech": synth_speech}
+
+def _blocks(signal, block_size=65536):
+    """Sinal em [-1, 1] como blocos PCM s16le, como os de video_operations.stream_audio."""
+    pcm = (np.clip(0.3 * signal, -1, 1) * 32767).astype(np.int16)
+    for start in range(0, len(pcm), block_size):
+        yield pcm[start:start + block_size]
+
+def collect(clips, duration, seed, labelled):
+    """Indicadores e notas de todas as janelas, separados por rótulo."""
+    from classifier import INDICATOR_NAMES, compute_features, music_indicators, music_scores
+    from config import AUDIO_EXTRACTION_PARAMS
+
+    sample_rate = AUDIO_EXTRACTION_PARAMS["sample_rate"]
+    rng = np.random.default_rng(seed)
+    sources = []
+    for index in range(clips):
+        for label in LABELS:
+            signal = SYNTHESIZERS[label](rng, duration, sample_rate)
+            sources.append((label, lambda s=signal: _blocks(s), 1))
+    for label, path in labelled:
+        from video_operations import stream_audio
+        sources.append((label, lambda p=path: stream_audio(p), None))
+
+    samples = {label: {"indicators": [], "scores": []} for label in LABELS}
+    for label, blocks, channels in sources:
+        # Os trechos sintéticos são mono; as gravações saem do ffmpeg como na detecção
+        features = compute_features(blocks(), sample_rate=sample_rate, channels=channels)
+        samples[label]["indicators"].append(music_indicators(features))
+        samples[label]["scores"].append(music_scores(features))
+    empty = {"indicators": np.empty((0, len(INDICATOR_NAMES))), "scores": np.empty(0)}
+    return {label: {kind: np.concatenate(values) if values else empty[kind]
+                    for kind, values in data.items()}
+            for label, data in samples.items()}
+
+def auc(positive, negative):
+    """Área sob a curva ROC (estatística de Mann-Whitney): P(positivo > negativo)."""
+    if not len(positive) or not len(negative):
+        return None
+    values = np.concatenate((positive, negative))
+    order = values.argsort(kind="mergesort")
+    ranks = np.empty(len(values))
+    ranks[order] = np.arange(1, len(values) + 1)
+    # Empates recebem a média das posições
+    sorted_values = values[order]
+    _, first, counts = np.unique(sorted_values, return_index=True, return_counts=True)
+    for start, count in zip(first[counts > 1], counts[counts > 1]):
+        ranks[order[start:start + count]] = start + (count + 1) / 2
+    rank_sum = ranks[:len(positive)].sum()
+    return float((rank_sum - len(positive) * (len(positive) + 1) / 2) / (len(positive) * len(negative)))
+
+def _distribution(values):
+    if not len(values):
+        return None
+    p10, median, p90 = np.percentile(values, (10, 50, 90))
+    return {"p10": round(float(p10), 4), "median": round(float(median), 4), "p90": round(float(p90), 4)}
+
+def evaluate(samples, threshold):
+    from classifier import INDICATOR_NAMES
+
+    music, speech = samples["music"], samples["speech"]
+    indicators = {}
+    for column, name in enumerate(INDICATOR_NAMES):
+        music_values, speech_values = music["indicators"][:, column], speech["indicators"][:, column]
+        separation = auc(music_values, speech_values)
+        indicators[name] = {
+            "music": _distribution(music_values),
+            "speech": _distribution(speech_values),
+            # Indicadores menores na música (pausas, variação) têm AUC abaixo de 0,5
+            "auc": round(max(separation, 1 - separation), 4) if separation is not None else None,
+            "suggested_center": (round(float(np.median(music_values) + np.median(speech_values)) / 2, 4)
+                                 if len(music_values) and len(speech_values) else None),
+        }
+
+    correct = int((music["scores"] >= threshold).sum() + (speech["scores"] < threshold).sum())
+    windows = len(music["scores"]) + len(speech["scores"])
+    separation = auc(music["scores"], speech["scores"])
+    return {
+        "windows": {label: int(len(samples[label]["scores"])) for label in LABELS},
+        "threshold": threshold,
+        "accuracy": round(correct / windows, 4) if windows else None,
+        "music_recall": round(float((music["scores"] >= threshold).mean()), 4) if len(music["scores"]) else None,
+        "speech_recall": round(float((speech["scores"] < threshold).mean()), 4) if len(speech["scores"]) else None,
+        "auc": round(separation, 4) if separation is not None else None,
+        "scores": {label: _distribution(samples[label]["scores"]) for label in LABELS},
+        "indicators": indicators,
+    }
+
+def print_report(report):
+    print(f"{'indicador':<24} {'música p10/med/p90':>26} {'fala p10/med/p90':>26} {'AUC':>7} {'centro':>8}",
+          file=sys.stderr)
+    for name, data in report["indicators"].items():
+        cells = ["/".join(f"{data[label][q]:.3f}" for q in ("p10", "median", "p90")) if data[label] else "-"
+                 for label in LABELS]
+        auc_cell = f"{data['auc']:.3f}" if data["auc"] is not None else "-"
+        center = f"{data['suggested_center']:.3f}" if data["suggested_center"] is not None else "-"
+        print(f"{name:<24} {cells[0]:>26} {cells[1]:>26} {auc_cell:>7} {center:>8}", file=sys.stderr)
+    print(f"janelas: {report['windows']}  limiar: {report['threshold']}  acurácia: {report['accuracy']}  "
+          f"AUC: {report['auc']}  (música: {report['music_recall']}, fala: {report['speech_recall']})",
+          file=sys.stderr)
+
+def parse_labelled(value):
+    label, _, path = value.partition(":")
+    if label not in LABELS or not path:
+        raise argparse.ArgumentTypeError(f"Use music:CAMINHO ou speech:CAMINHO (recebido: {value})")
+    return label, path
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Benchmark rotulado do classificador música/fala.")
+    parser.add_argument("--clips", type=int, default=8, help="Trechos sintéticos por classe (padrão: 8)")
+    parser.add_argument("--duration", type=float, default=30, help="Duração de cada trecho em segundos (padrão: 30)")
+    parser.add_argument("--seed", type=int, default=0, help="Semente dos trechos sintéticos")
+    parser.add_argument("--labelled", nargs="+", type=parse_labelled, default=[], metavar="ROTULO:CAMINHO",
+                        help="Gravações reais rotuladas (music:arquivo ou speech:arquivo)")
+    parser.add_argument("--threshold", type=float, help="Limiar da nota (padrão: DETECTION_PARAMS)")
+    parser.add_argument("--check", action="store_true",
+                        help="Termina com código 1 se a acurácia ou a AUC ficarem abaixo do mínimo")
+    parser.add_argument("--min-accuracy", type=float, default=0.95, help="Acurácia mínima com --check")
+    parser.add_argument("--min-auc", type=float, default=0.98, help="AUC mínima com --check")
+    parser.add_argument("--output", help="Arquivo JSON de saída (padrão: só o resumo no terminal)")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    from config import DETECTION_PARAMS
+
+    threshold = args.threshold if args.threshold is not None else DETECTION_PARAMS["music_threshold"]
+    samples = collect(args.clips, args.duration, args.seed, args.labelled)
+    report = evaluate(samples, threshold)
+    print_report(report)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({
+                "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "machine": {"platform": platform.platform(), "python": platform.python_version()},
+                "clips": args.clips,
+                "duration": args.duration,
+                "seed": args.seed,
+                "labelled": [{"label": label, "path": path} for label, path in args.labelled],
+                **report,
+            }, f, indent=2, ensure_ascii=False)
+        print(f"Resultados gravados em {args.output}", file=sys.stderr)
+
+    if args.check and ((report["accuracy"] or 0) < args.min_accuracy or (report["auc"] or 0) < args.min_auc):
+        print(f"Classificador abaixo do mínimo (acurácia {args.min_accuracy}, AUC {args.min_auc})", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
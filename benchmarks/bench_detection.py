@@ -0,0 +1,304 @@
+"""
+Benchmark de extração, detecção e exportação com mídia sintética gerada pelo ffmpeg (lavfi).
+
+Cada fixture é um vídeo com "músicas" de tom e de ruído separadas por
+silêncios de duração controlada; como os limites das músicas são conhecidos,
+além do tempo medimos a precisão dos segmentos detectados. Cada medição roda
+num processo próprio para o pico de memória (RSS) ser só dela.
+
+Exemplos:
+    python benchmarks/bench_detection.py --durations 10m
+    python benchmarks/bench_detection.py --durations 10m 1h 4h --output antes.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+
+# Permite rodar o script direto da pasta do projeto
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ffmpeg
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+DURATIONS = {"10m": 600, "1h": 3600, "4h": 14400}
+BACKENDS = ("numpy", "pydub", "ffmpeg", "streaming", "coarse_to_fine")
+
+# Parâmetros fixos para os resultados serem comparáveis entre execuções
+DETECTION_SETTINGS = {
+    "threshold": -45,
+    "min_silence_len": 2000,
+    "padding_before": 0,
+    "padding_after": 0,
+    "min_segment_duration": 60000,
+}
+
+SAMPLE_RATE = 44100
+
+def build_layout(duration, seed=0):
+    """Sequência determinística de músicas e silêncios somando exatamente duration segundos.
+
+    Returns:
+        Lista de (tipo, duração, parâmetro), com tipo "tone", "noise" ou "gap"
+    """
+    rng = random.Random(seed)
+    layout = []
+    # Posições em ms inteiros para a soma fechar exatamente na duração
+    total_ms = int(duration * 1000)
+    position = 0
+    while position < total_ms:
+        song = rng.randint(90000, 300000)
+        if total_ms - position - song < 90000:
+            song = total_ms - position  # A última música vai até o fim
+        kind = rng.choice(("tone", "noise"))
+        param = rng.randint(220, 880) if kind == "tone" else rng.randint(0, 2**31)
+        layout.append((kind, song / 1000, param))
+        position += song
+        if position < total_ms:
+            gap = rng.randint(3000, 8000)
+            layout.append(("gap", gap / 1000, rng.randint(0, 2**31)))
+            position += gap
+    return layout
+
+def ground_truth(layout):
+    """Intervalos (início, fim) em segundos das músicas do layout."""
+    songs = []
+    position = 0.0
+    for kind, length, _ in layout:
+        if kind != "gap":
+            songs.append((round(position, 3), round(position + length, 3)))
+        position += length
+    return songs
+
+def _audio_piece(kind, length, param):
+    if kind == "tone":
+        source = ffmpeg.input(f"sine=frequency={param}:sample_rate={SAMPLE_RATE}:duration={length}", f="lavfi")
+        stream = source.audio.filter("volume", 0.5)
+    elif kind == "noise":
+        source = ffmpeg.input(f"anoisesrc=color=pink:amplitude=0.25:sample_rate={SAMPLE_RATE}:"
+                              f"duration={length}:seed={param}", f="lavfi")
+        stream = source.audio
+    else:
+        # Silêncio com ruído de fundo em torno de -75 dBFS, como uma gravação real
+        source = ffmpeg.input(f"anoisesrc=color=white:amplitude=0.0002:sample_rate={SAMPLE_RATE}:"
+                              f"duration={length}:seed={param}", f="lavfi")
+        stream = source.audio
+    return stream.filter("aformat", sample_fmts="fltp", sample_rates=str(SAMPLE_RATE), channel_layouts="mono")
+
+def generate_fixture(fixtures_dir, duration, seed=0):
+    """Gera (ou reaproveita) o vídeo sintético e o JSON com as músicas esperadas."""
+    os.makedirs(fixtures_dir, exist_ok=True)
+    base = os.path.join(fixtures_dir, f"bench_{duration}s_seed{seed}")
+    video_path, truth_path = f"{base}.mp4", f"{base}.json"
+    if os.path.exists(video_path) and os.path.exists(truth_path):
+        return video_path, truth_path
+
+    layout = build_layout(duration, seed)
+    audio = ffmpeg.concat(*(_audio_piece(*piece) for piece in layout), v=0, a=1)
+    video = ffmpeg.input(f"color=c=black:s=160x120:r=25:d={duration}", f="lavfi").video
+
+    print(f"Gerando fixture de {duration}s: {video_path}", file=sys.stderr)
+    temp_path = f"{base}.tmp.mp4"
+    (
+        ffmpeg
+        .output(video, audio, temp_path, vcodec="libx264", preset="ultrafast", g=50,
+                acodec="aac", ar=SAMPLE_RATE, t=duration)
+        .overwrite_output()
+        .run(quiet=True)
+    )
+    os.replace(temp_path, video_path)
+
+    with open(truth_path, "w", encoding="utf-8") as f:
+        json.dump({"duration": duration, "seed": seed, "songs": ground_truth(layout)}, f, indent=2)
+    return video_path, truth_path
+
+def score_segments(segments, songs):
+    """Compara os segmentos detectados com as músicas esperadas.
+
+    Cada música é associada ao segmento com maior sobreposição; os erros são a
+    distância (em segundos) entre os limites esperados e os detectados.
+    """
+    start_errors, end_errors = [], []
+    for song_start, song_end in songs:
+        best, best_overlap = None, 0.0
+        for seg in segments:
+            overlap = min(song_end, seg['end']) - max(song_start, seg['start'])
+            if overlap > best_overlap:
+                best, best_overlap = seg, overlap
+        if best is not None and best_overlap >= 0.5 * (song_end - song_start):
+            start_errors.append(abs(best['start'] - song_start))
+            end_errors.append(abs(best['end'] - song_end))
+
+    errors = start_errors + end_errors
+    return {
+        "expected": len(songs),
+        "detected": len(segments),
+        "matched": len(start_errors),
+        "max_boundary_error": round(max(errors), 3) if errors else None,
+        "mean_boundary_error": round(sum(errors) / len(errors), 4) if errors else None,
+    }
+
+def _peak_rss_mb():
+    """Pico de memória deste processo e dos filhos (ffmpeg), em MB."""
+    if resource is None:
+        return None, None
+    # ru_maxrss vem em KB no Linux e em bytes no macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale
+    return round(own, 1), round(children, 1)
+
+def _run_task(settings, task, args):
+    """Executa uma medição dentro de um processo novo."""
+    from config import save_config
+    save_config(settings)
+
+    begin = time.perf_counter()
+    result = task(*args)
+    elapsed = time.perf_counter() - begin
+    rss, child_rss = _peak_rss_mb()
+    return elapsed, rss, child_rss, result
+
+def task_extract(video_path, audio_path):
+    from video_operations import extract_audio
+    extract_audio(video_path, audio_path)
+
+def task_detect(backend, video_path, audio_path):
+    import main
+    from music_detection import detect_music_segments
+
+    if backend in ("numpy", "pydub"):
+        return detect_music_segments(audio_path, backend=backend)
+    if backend == "ffmpeg":
+        return main.detect_with_ffmpeg(video_path)
+    if backend == "coarse_to_fine":
+        return main.detect_coarse_to_fine(video_path)
+    # streaming: consome o gerador, como a interface e export_segments fazem
+    return list(main.iter_extract_and_detect(video_path))
+
+def task_export(video_path, segments, output_dir):
+    from main import export_segments
+    export_segments(video_path, output_dir, segments)
+
+def measure(settings, task, *args):
+    """Roda task(*args) num processo isolado e retorna (segundos, RSS, RSS do ffmpeg, resultado)."""
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        return executor.submit(_run_task, settings, task, args).result()
+
+def run_fixture(video_path, truth_path, backends, skip_export=False, pydub_max_duration=600):
+    """Mede extração, detecção (por backend) e exportação de uma fixture."""
+    with open(truth_path, encoding="utf-8") as f:
+        truth = json.load(f)
+    duration = truth["duration"]
+    songs = [tuple(song) for song in truth["songs"]]
+
+    # Sem cache: cada medição decodifica o arquivo de verdade
+    settings = {"detection": dict(DETECTION_SETTINGS), "cache": {"enabled": False}}
+    results = []
+
+    def record(stage, backend, elapsed, rss, child_rss, media_seconds, accuracy=None):
+        entry = {
+            "fixture": os.path.basename(video_path),
+            "duration": duration,
+            "stage": stage,
+            "backend": backend,
+            "seconds": round(elapsed, 3),
+            "x_realtime": round(media_seconds / elapsed, 1) if elapsed else None,
+            "peak_rss_mb": rss,
+            "ffmpeg_peak_rss_mb": child_rss,
+        }
+        if accuracy is not None:
+            entry["accuracy"] = accuracy
+        results.append(entry)
+        print(f"{entry['fixture']:<28} {stage:<7} {backend or '-':<15} {entry['seconds']:>9.2f}s "
+              f"{entry['x_realtime'] or 0:>8.1f}x {rss or 0:>8.1f} MB", file=sys.stderr)
+
+    work_dir = tempfile.mkdtemp(prefix="auto_edit_bench_")
+    try:
+        audio_path = os.path.join(work_dir, "audio.wav")
+        elapsed, rss, child_rss, _ = measure(settings, task_extract, video_path, audio_path)
+        record("extract", None, elapsed, rss, child_rss, duration)
+
+        segments = None
+        for backend in backends:
+            if backend == "pydub" and duration > pydub_max_duration:
+                print(f"Pulando pydub em {duration}s (--pydub-max-duration)", file=sys.stderr)
+                continue
+            elapsed, rss, child_rss, detected = measure(settings, task_detect, backend, video_path, audio_path)
+            record("detect", backend, elapsed, rss, child_rss, duration, score_segments(detected, songs))
+            if segments is None:
+                segments = detected
+
+        if not skip_export and segments:
+            output_dir = os.path.join(work_dir, "export")
+            os.makedirs(output_dir)
+            exported = sum(seg['end'] - seg['start'] for seg in segments)
+            elapsed, rss, child_rss, _ = measure(settings, task_export, video_path, segments, output_dir)
+            record("export", None, elapsed, rss, child_rss, exported)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+def parse_duration(value):
+    if value in DURATIONS:
+        return DURATIONS[value]
+    try:
+        return int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Duração inválida: {value} (use 10m, 1h, 4h ou segundos)")
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Benchmark de extração, detecção e exportação.")
+    parser.add_argument("--durations", nargs="+", type=parse_duration, default=[600, 3600, 14400],
+                        help="Durações das fixtures: 10m, 1h, 4h ou segundos (padrão: as três)")
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS),
+                        help="Motores de detecção medidos (padrão: todos)")
+    parser.add_argument("--fixtures-dir",
+                        default=os.path.join(tempfile.gettempdir(), "auto_edit_bench_fixtures"),
+                        help="Onde guardar as fixtures geradas (reaproveitadas entre execuções)")
+    parser.add_argument("--seed", type=int, default=0, help="Semente do layout das fixtures")
+    parser.add_argument("--skip-export", action="store_true", help="Não medir a exportação")
+    parser.add_argument("--pydub-max-duration", type=int, default=600,
+                        help="Maior fixture (s) medida com o backend pydub, que é lento (padrão: 600)")
+    parser.add_argument("--output", help="Arquivo JSON de saída (padrão: bench_<data>.json)")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    results = []
+    for duration in args.durations:
+        video_path, truth_path = generate_fixture(args.fixtures_dir, duration, args.seed)
+        results.extend(run_fixture(video_path, truth_path, args.backends,
+                                   args.skip_export, args.pydub_max_duration))
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "machine": {
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+        },
+        "detection": DETECTION_SETTINGS,
+        "results": results,
+    }
+    output = args.output or f"bench_{time.strftime('%Y%m%d-%H%M%S')}.json"
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"Resultados gravados em {output}", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,156 @@
+"""
+Benchmark do tempo de abertura da interface e verificação dos módulos importados na inicialização.
+
+Cada medição roda num interpretador novo e importa o caminho de inicialização
+da interface (o que "python main.py" carrega antes de abrir a janela) ou, para
+comparação, também os módulos de análise que a interface carrega em segundo plano:
+    frio:  sem bytecode em cache (PYTHONPYCACHEPREFIX numa pasta vazia), como na
+           primeira execução após instalar ou atualizar
+    morno: com o bytecode já em cache, como nas execuções seguintes
+
+Com --check nada é medido: o script só confere que a inicialização não importa
+nenhum módulo pesado (HEAVY_MODULES) e termina com código 1 se importar, para
+ser usado como teste na integração contínua.
+
+Exemplos:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --repeat 10 --window --output inicio.json
+    python benchmarks/bench_startup.py --check
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Não podem ser importados antes da janela abrir
+HEAVY_MODULES = ("numpy", "pydub", "ffmpeg", "scipy", "librosa", "numba", "sklearn",
+                 "music_detection", "video_operations", "waveform", "analysis_cache",
+                 "keyframe_index", "journal", "server", "probe", "classifier")
+
+# O que "python main.py" (sem argumentos) importa antes de criar a janela
+STARTUP_IMPORTS = "import main, gui"
+
+# Inicialização mais os módulos carregados em segundo plano (gui.WARMUP_MODULES)
+ANALYSIS_IMPORTS = STARTUP_IMPORTS + "\nfor name in gui.WARMUP_MODULES: __import__(name)"
+
+# Executado no processo filho: mede as importações (e a janela) e lista os módulos pesados
+_CHILD = """
+import sys, time, json
+sys.path.insert(0, {root!r})
+started = time.perf_counter()
+{imports}
+imported = time.perf_counter() - started
+window = None
+if {window!r}:
+    import tkinter
+    try:
+        root = tkinter.Tk()
+    except tkinter.TclError:
+        pass  # Sem display
+    else:
+        gui.MusicExtractorApp(root)
+        root.update()
+        window = time.perf_counter() - started
+        root.destroy()
+heavy = sorted(name for name in {heavy!r} if name in sys.modules)
+print(json.dumps({{"imports": imported, "window": window, "heavy": heavy}}))
+"""
+
+def run_child(imports, cold=False, window=False):
+    """Roda as importações num interpretador novo e retorna as medições."""
+    code = _CHILD.format(root=ROOT, imports=imports, window=window, heavy=HEAVY_MODULES)
+    env = dict(os.environ)
+    with tempfile.TemporaryDirectory(prefix="auto_edit_pycache_") as pycache:
+        if cold:
+            env["PYTHONPYCACHEPREFIX"] = pycache
+        started = time.perf_counter()
+        completed = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env,
+                                   capture_output=True, text=True)
+        total = time.perf_counter() - started
+    if completed.returncode != 0:
+        raise RuntimeError(f"Processo de medição falhou:\n{completed.stderr}")
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result["process"] = total
+    return result
+
+def measure(name, imports, cold, repeat, window=False):
+    """Mediana de repeat execuções de um cenário."""
+    if not cold:
+        run_child(imports)  # Garante o bytecode em cache antes das medições mornas
+    runs = [run_child(imports, cold, window) for _ in range(repeat)]
+    windows = [run["window"] for run in runs if run["window"] is not None]
+    return {
+        "scenario": name,
+        "cache": "frio" if cold else "morno",
+        "repeat": repeat,
+        "imports_seconds": round(statistics.median(run["imports"] for run in runs), 4),
+        "process_seconds": round(statistics.median(run["process"] for run in runs), 4),
+        "window_seconds": round(statistics.median(windows), 4) if windows else None,
+        "heavy_modules": runs[-1]["heavy"],
+    }
+
+def check():
+    """Falha (código 1) se a inicialização da interface importar algum módulo pesado."""
+    heavy = run_child(STARTUP_IMPORTS)["heavy"]
+    if heavy:
+        print(f"FALHOU: a inicialização da interface importa {', '.join(heavy)}", file=sys.stderr)
+        return 1
+    print("ok: nenhum módulo pesado importado na inicialização da interface", file=sys.stderr)
+    return 0
+
+def format_results(results):
+    lines = [f"{'cenário':<10} {'cache':<6} {'importações(ms)':>16} {'processo(ms)':>13} "
+             f"{'janela(ms)':>11}  módulos pesados"]
+    for r in results:
+        window = f"{r['window_seconds'] * 1000:.0f}" if r["window_seconds"] is not None else "-"
+        lines.append(f"{r['scenario']:<10} {r['cache']:<6} {r['imports_seconds'] * 1000:>16.0f} "
+                     f"{r['process_seconds'] * 1000:>13.0f} {window:>11}  "
+                     f"{', '.join(r['heavy_modules']) or '-'}")
+    return "\n".join(lines)
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Mede o tempo de abertura da interface.")
+    parser.add_argument("--repeat", type=int, default=5, help="Execuções por cenário (mediana)")
+    parser.add_argument("--window", action="store_true",
+                        help="Medir também até a janela ser desenhada (requer display)")
+    parser.add_argument("--check", action="store_true",
+                        help="Só verificar que a inicialização não importa módulos pesados")
+    parser.add_argument("--output", help="Gravar os resultados neste arquivo JSON")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.check:
+        return check()
+
+    results = []
+    for name, imports in (("interface", STARTUP_IMPORTS), ("análise", ANALYSIS_IMPORTS)):
+        for cold in (True, False):
+            results.append(measure(name, imports, cold, args.repeat,
+                                   window=args.window and imports is STARTUP_IMPORTS))
+    print(format_results(results))
+
+    if args.output:
+        report = {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "machine": {
+                "platform": platform.platform(),
+                "python": platform.python_version(),
+                "cpus": os.cpu_count(),
+            },
+            "results": results,
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"Resultados gravados em {args.output}", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
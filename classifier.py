@@ -0,0 +1,305 @@
+"""
+Classificação música/não música dos segmentos por características espectrais.
+
+A detecção por silêncio junta numa só parte músicas separadas por fala sem
+pausa (apresentador, plateia). Esta etapa opcional (DETECTION_PARAMS["classify"])
+calcula, numa STFT em blocos sobre o mesmo PCM decodificado para o envelope,
+três características baratas a cada FEATURE_HOP_MS:
+
+    fluxo espectral: quanto o espectro normalizado (soma 1) muda de um quadro para
+        o outro, de 0 (igual) a 1 (sem nenhuma frequência em comum)
+    taxa de cruzamentos por zero (ZCR): alterna entre sílabas sonoras e surdas na fala
+    estabilidade do croma: semelhança entre as classes de altura de quadros vizinhos
+        (harmonia sustentada na música, altura que desliza na fala)
+
+junto com a energia do quadro. Só o resto de um quadro incompleto fica entre
+blocos e as características ocupam 16 bytes por quadro, então a memória não
+depende da duração. Elas são salvas no cache junto com o envelope, e
+music_scores/refine_segments rodam sobre elas sem decodificar de novo (mudar o
+limiar é instantâneo).
+
+A pontuação é heurística (sem modelo treinado): cada janela de
+CLASSIFY_WINDOW_MS recebe uma nota de 0 (fala) a 1 (música) a partir da
+proporção de quadros de baixa energia, da variação do ZCR, da variação do
+fluxo e da estabilidade média do croma. Os três primeiros indicadores são os
+de Scheirer e Slaney, "Construction and evaluation of a robust multifeature
+speech/music discriminator" (ICASSP 1997): porcentagem de quadros abaixo de
+50% da energia média, variância do fluxo espectral e do ZCR (este último já
+em Saunders, "Real-time discrimination of broadcast speech/music", ICASSP
+1996). Os centros e escalas das sigmoides foram escolhidos à mão, não
+treinados; benchmarks/bench_classifier.py mede a separação que eles dão num
+conjunto rotulado (sintético ou com gravações reais) e sugere novos centros.
+"""
+import logging
+import numpy as np
+from config import DETECTION_PARAMS, AUDIO_EXTRACTION_PARAMS
+
+# Intervalo entre quadros da STFT (ms); cada linha de características cobre um quadro
+FEATURE_HOP_MS = 100
+
+# Colunas do array de características
+FEATURE_ENERGY, FEATURE_FLUX, FEATURE_ZCR, FEATURE_CHROMA = range(4)
+FEATURE_NAMES = ("energy", "flux", "zcr", "chroma_stability")
+
+# Janela (ms) avaliada para cada nota e intervalo (ms) entre notas
+CLASSIFY_WINDOW_MS = 3000
+SCORE_STEP_MS = 1000
+
+# Faixa de frequências (Hz) somada nas classes de altura do croma
+CHROMA_MIN_HZ = 55
+CHROMA_MAX_HZ = 5000
+
+# Quadros transformados por vez (limita a memória temporária da FFT)
+_FRAMES_PER_CHUNK = 256
+
+# Chaves de DETECTION_PARAMS usadas pelo classificador (não pela segmentação por silêncio)
+CLASSIFIER_PARAM_KEYS = ("classify", "music_threshold", "min_non_music_len")
+
+# Estatísticas de cada janela avaliadas pela nota (colunas de music_indicators)
+INDICATOR_NAMES = ("low_energy_ratio", "zcr_std", "flux_std", "chroma_stability_mean")
+
+# Centro e escala de cada indicador na nota de música (ver music_scores e, para
+# a origem dos valores, benchmarks/bench_classifier.py)
+_LOW_ENERGY_CENTER, _LOW_ENERGY_SCALE = 0.3, 0.08
+_ZCR_STD_CENTER, _ZCR_STD_SCALE = 0.04, 0.01
+_FLUX_STD_CENTER, _FLUX_STD_SCALE = 0.15, 0.04
+_CHROMA_CENTER, _CHROMA_SCALE = 0.75, 0.07
+
+_EPSILON = 1e-10
+
+class FeatureBuilder:
+    """Converte blocos PCM s16le em características espectrais por quadro (ver o módulo).
+
+    Quadros de n_fft amostras (a primeira potência de 2 acima de 1,25 hop) começam
+    a cada FEATURE_HOP_MS; a linha i descreve o áudio a partir de i * FEATURE_HOP_MS.
+    """
+
+    def __init__(self, sample_rate=None, channels=None):
+        self.sample_rate = sample_rate or AUDIO_EXTRACTION_PARAMS["sample_rate"]
+        self.channels = channels or AUDIO_EXTRACTION_PARAMS["audio_channels"]
+        self.hop = self.sample_rate * FEATURE_HOP_MS // 1000
+        self.n_fft = 1 << int(np.ceil(np.log2(self.hop * 1.25)))
+        self.window = np.hanning(self.n_fft).astype(np.float32)
+
+        # Matriz (bins, 12) que soma a potência de cada bin na sua classe de altura
+        freqs = np.fft.rfftfreq(self.n_fft, 1 / self.sample_rate)
+        self._chroma_bins = np.flatnonzero((freqs >= CHROMA_MIN_HZ) & (freqs <= CHROMA_MAX_HZ))
+        pitch_class = np.round(12 * np.log2(freqs[self._chroma_bins] / 440)).astype(np.int64) % 12
+        self._chroma_map = np.zeros((len(self._chroma_bins), 12), dtype=np.float32)
+        self._chroma_map[np.arange(len(self._chroma_bins)), pitch_class] = 1
+
+        self._buffer = np.empty(0, dtype=np.float32)  # Amostras mono a partir do próximo quadro
+        self._prev_spectrum = None
+        self._prev_chroma = None
+
+    def push(self, block):
+        """Adiciona um bloco e retorna as características dos quadros completados por ele."""
+        samples = np.asarray(block, dtype=np.int16)
+        usable = len(samples) - len(samples) % self.channels
+        mono = samples[:usable].reshape(-1, self.channels).mean(axis=1, dtype=np.float32) / 32768
+        buffer = np.concatenate((self._buffer, mono)) if len(self._buffer) else mono
+
+        parts = []
+        n_frames = (len(buffer) - self.n_fft) // self.hop + 1 if len(buffer) >= self.n_fft else 0
+        if n_frames:
+            frames = np.lib.stride_tricks.sliding_window_view(buffer, self.n_fft)[::self.hop][:n_frames]
+            parts = [self._frame_features(frames[i:i + _FRAMES_PER_CHUNK])
+                     for i in range(0, n_frames, _FRAMES_PER_CHUNK)]
+
+        self._buffer = buffer[n_frames * self.hop:].copy()
+        return np.concatenate(parts) if parts else np.empty((0, len(FEATURE_NAMES)), dtype=np.float32)
+
+    def flush(self):
+        """Descarta o último quadro incompleto (menos de n_fft amostras) e retorna 0 linhas."""
+        self._buffer = np.empty(0, dtype=np.float32)
+        return np.empty((0, len(FEATURE_NAMES)), dtype=np.float32)
+
+    def _frame_features(self, frames):
+        features = np.empty((len(frames), len(FEATURE_NAMES)), dtype=np.float32)
+        features[:, FEATURE_ENERGY] = np.einsum("ij,ij->i", frames, frames) / self.n_fft
+        signs = np.signbit(frames)
+        features[:, FEATURE_ZCR] = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / (self.n_fft - 1)
+
+        spectrum = np.abs(np.fft.rfft(frames * self.window, axis=1)).astype(np.float32)
+        power = spectrum[:, self._chroma_bins] ** 2
+        spectrum /= spectrum.sum(axis=1, keepdims=True) + _EPSILON
+        chroma = power @ self._chroma_map
+        chroma /= np.linalg.norm(chroma, axis=1, keepdims=True) + _EPSILON
+
+        # Cada quadro é comparado com o anterior, inclusive entre pedaços e blocos
+        prev_spectrum = np.concatenate((spectrum[:1] if self._prev_spectrum is None else self._prev_spectrum,
+                                        spectrum[:-1]))
+        prev_chroma = np.concatenate((chroma[:1] if self._prev_chroma is None else self._prev_chroma,
+                                      chroma[:-1]))
+        features[:, FEATURE_FLUX] = np.maximum(spectrum - prev_spectrum, 0).sum(axis=1)
+        features[:, FEATURE_CHROMA] = np.einsum("ij,ij->i", chroma, prev_chroma)
+        self._prev_spectrum = spectrum[-1:].copy()
+        self._prev_chroma = chroma[-1:].copy()
+        return features
+
+class FeatureArray:
+    """Características recebidas aos poucos (ex.: de tap_features), num array que
+    dobra de capacidade quando enche em vez de ser concatenado a cada bloco."""
+
+    def __init__(self, capacity=4096):
+        self._data = np.empty((capacity, len(FEATURE_NAMES)), dtype=np.float32)
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def append(self, values):
+        count = len(values)
+        if self._size + count > len(self._data):
+            grown = np.empty((max(2 * len(self._data), self._size + count), len(FEATURE_NAMES)),
+                             dtype=np.float32)
+            grown[:self._size] = self._data[:self._size]
+            self._data = grown
+        self._data[self._size:self._size + count] = values
+        self._size += count
+
+    @property
+    def values(self):
+        """As linhas recebidas até agora (visão, sem cópia)."""
+        return self._data[:self._size]
+
+def compute_features(blocks, sample_rate=None, channels=None):
+    """Características espectrais de todos os quadros a partir de blocos PCM s16le."""
+    builder = FeatureBuilder(sample_rate, channels)
+    parts = [builder.push(block) for block in blocks]
+    parts.append(builder.flush())
+    return np.concatenate(parts)
+
+def tap_features(blocks, on_features, sample_rate=None, channels=None):
+    """Repassa os blocos PCM e entrega a on_features as características de cada um.
+
+    Permite calcular as características na mesma decodificação do envelope:
+    compute_envelope(tap_features(stream_audio(video), partes.append)).
+    """
+    builder = FeatureBuilder(sample_rate, channels)
+    for block in blocks:
+        on_features(builder.push(block))
+        yield block
+    on_features(builder.flush())
+
+def pop_classifier_params(params):
+    """Retira de params (parâmetros de detecção) as chaves do classificador e as retorna."""
+    return {key: params.pop(key) for key in CLASSIFIER_PARAM_KEYS if key in params}
+
+def _sigmoid(x):
+    return 1 / (1 + np.exp(-np.clip(x, -50, 50)))
+
+def music_indicators(features, first=0, last=None):
+    """Estatísticas de cada janela de nota, em colunas (ver INDICATOR_NAMES).
+
+    Calcula só as notas [first, last) (padrão: todas), lendo apenas as linhas de
+    features que as janelas delas cobrem; o resultado é idêntico ao das mesmas
+    notas no cálculo completo.
+    """
+    step = SCORE_STEP_MS // FEATURE_HOP_MS
+    width = CLASSIFY_WINDOW_MS // FEATURE_HOP_MS
+    n_steps = -(-len(features) // step)
+    last = n_steps if last is None else min(last, n_steps)
+    if first >= last:
+        return np.empty((0, len(INDICATOR_NAMES)), dtype=np.float32)
+
+    # A janela da nota k cobre as linhas [k * step - before, k * step - before + width),
+    # repetindo a primeira/última linha além das pontas do array
+    before = (width - step) // 2
+    low = first * step - before
+    high = (last - 1) * step - before + width
+    rows = np.asarray(features[max(low, 0):min(high, len(features))], dtype=np.float32)
+    padded = np.pad(rows, ((max(-low, 0), max(high - len(features), 0)), (0, 0)), mode="edge")
+    windows = np.lib.stride_tricks.sliding_window_view(padded, width, axis=0)[::step][:last - first]
+
+    energy = windows[:, FEATURE_ENERGY]
+    indicators = np.empty((len(windows), len(INDICATOR_NAMES)), dtype=np.float32)
+    indicators[:, 0] = (energy < 0.5 * energy.mean(axis=1, keepdims=True)).mean(axis=1)
+    indicators[:, 1] = windows[:, FEATURE_ZCR].std(axis=1)
+    indicators[:, 2] = windows[:, FEATURE_FLUX].std(axis=1)
+    indicators[:, 3] = windows[:, FEATURE_CHROMA].mean(axis=1)
+    return indicators
+
+def music_scores(features, first=0, last=None):
+    """Nota de 0 (fala/ruído) a 1 (música) a cada SCORE_STEP_MS.
+
+    A nota k avalia a janela de CLASSIFY_WINDOW_MS centrada no intervalo
+    [k * SCORE_STEP_MS, (k + 1) * SCORE_STEP_MS) e é a média de quatro indicadores:
+    poucos quadros com energia abaixo de metade da média (a fala tem pausas entre
+    sílabas), pouca variação do ZCR e do fluxo, e croma estável. first/last
+    limitam o cálculo às notas [first, last) (ver music_indicators).
+    """
+    indicators = music_indicators(features, first, last)
+    low_energy, zcr_std, flux_std, chroma = indicators.T
+    scores = (
+        _sigmoid((_LOW_ENERGY_CENTER - low_energy) / _LOW_ENERGY_SCALE)
+        + _sigmoid((_ZCR_STD_CENTER - zcr_std) / _ZCR_STD_SCALE)
+        + _sigmoid((_FLUX_STD_CENTER - flux_std) / _FLUX_STD_SCALE)
+        + _sigmoid((chroma - _CHROMA_CENTER) / _CHROMA_SCALE)
+    )
+    return (scores / len(INDICATOR_NAMES)).astype(np.float32)
+
+def music_mask(scores, music_threshold=None, min_non_music_len=None):
+    """Rótulo (True = música) de cada nota; trechos de não música mais curtos que
+    min_non_music_len (ms) voltam a contar como música (ex.: uma fala no meio da faixa)."""
+    music_threshold = music_threshold if music_threshold is not None else DETECTION_PARAMS["music_threshold"]
+    min_non_music_len = min_non_music_len if min_non_music_len is not None else DETECTION_PARAMS["min_non_music_len"]
+
+    mask = np.asarray(scores) >= music_threshold
+    changes = np.flatnonzero(np.diff(np.concatenate(([True], mask, [True])).astype(np.int8)))
+    for start, end in zip(changes[::2], changes[1::2]):
+        if (end - start) * SCORE_STEP_MS < min_non_music_len:
+            mask[start:end] = True
+    return mask
+
+def refine_segments(segments, features, music_threshold=None, min_non_music_len=None,
+                    min_segment_duration=None, classify=None):
+    """Apara e divide os segmentos detectados por silêncio nos trechos de não música.
+
+    Cada segmento perde a não música das pontas e é dividido em cada trecho de
+    não música interno de pelo menos min_non_music_len; partes mais curtas que
+    min_segment_duration são descartadas. Trechos sem características (além do
+    fim do array) contam como música. Com classify False (padrão:
+    DETECTION_PARAMS["classify"]) os segmentos voltam sem alteração.
+    """
+    classify = classify if classify is not None else DETECTION_PARAMS["classify"]
+    if not classify or features is None or not len(segments):
+        return list(segments)
+    min_segment_duration = (min_segment_duration if min_segment_duration is not None
+                            else DETECTION_PARAMS["min_segment_duration"])
+    min_non_music_len = (min_non_music_len if min_non_music_len is not None
+                         else DETECTION_PARAMS["min_non_music_len"])
+
+    # Cada segmento só avalia as próprias notas e uma margem de min_non_music_len
+    # de cada lado: um trecho de não música que passa da margem já é longo demais
+    # para ser ignorado, então os rótulos são os mesmos do arquivo inteiro
+    margin = -(-int(min_non_music_len) // SCORE_STEP_MS)
+    n_steps = -(-len(features) // (SCORE_STEP_MS // FEATURE_HOP_MS))
+    step = SCORE_STEP_MS / 1000
+    refined = []
+    for seg in segments:
+        first = int(seg['start'] // step)
+        last = int(np.ceil(seg['end'] / step))
+        low, high = max(first - margin, 0), min(last + margin, n_steps)
+        mask = music_mask(music_scores(features, low, high), music_threshold, min_non_music_len)
+        labels = np.ones(max(last - first, 0), dtype=bool)
+        known = mask[first - low:last - low]
+        labels[:len(known)] = known
+
+        changes = np.flatnonzero(np.diff(np.concatenate(([False], labels, [False])).astype(np.int8)))
+        pieces = [{'start': float(max(seg['start'], (first + a) * step)),
+                   'end': float(min(seg['end'], (first + b) * step))}
+                  for a, b in zip(changes[::2], changes[1::2])]
+        if len(pieces) == 1 and pieces[0] == {'start': seg['start'], 'end': seg['end']}:
+            refined.append(seg)
+            continue
+
+        for piece in pieces:
+            duration = piece['end'] - piece['start']
+            if duration * 1000 >= min_segment_duration:
+                logging.info(f"Classificador: {seg['start']:.2f}s - {seg['end']:.2f}s -> "
+                             f"{piece['start']:.2f}s - {piece['end']:.2f}s (duração: {duration:.2f}s)")
+                refined.append(dict(seg, **piece))
+        if not pieces:
+            logging.info(f"Classificador: {seg['start']:.2f}s - {seg['end']:.2f}s descartado (sem música)")
+    return refined
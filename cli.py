@@ -0,0 +1,313 @@
+"""
+Linha de comando para processar vídeos em lote, sem interface gráfica.
+
+Exemplos:
+    python main.py gravacoes/ --export-dir cortes/
+    python cli.py "shows/*.mp4" --threshold -50 --workers 4 --manifest-format csv
+"""
+import argparse
+import csv
+import glob
+import json
+import logging
+import os
+import sys
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from config import DETECTION_PARAMS, EXPORT_PARAMS, AUDIO_EXTRACTION_PARAMS, save_config
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv")
+
+# Opções da linha de comando que correspondem a chaves de DETECTION_PARAMS
+_DETECTION_FLAGS = ("threshold", "min_silence_len", "padding_before", "padding_after",
+                    "min_segment_duration", "backend", "classify", "music_threshold", "min_non_music_len")
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Detecta (e opcionalmente exporta) músicas em vídeos, separadas por silêncio."
+    )
+    parser.add_argument("inputs", nargs="+",
+                        help="Arquivos, padrões glob ou diretórios de vídeo")
+    parser.add_argument("-r", "--recursive", action="store_true",
+                        help="Procurar vídeos também nos subdiretórios")
+    parser.add_argument("--config",
+                        help="Arquivo JSON com parâmetros ({\"detection\": {...}, \"export\": {...}, \"audio\": {...}})")
+
+    detection = parser.add_argument_group("detecção (sobrescrevem --config)")
+    detection.add_argument("--threshold", type=int, help="Limiar de silêncio em dB")
+    detection.add_argument("--min-silence-len", type=int, help="Duração mínima de silêncio em ms")
+    detection.add_argument("--padding-before", type=int, help="Padding antes do segmento em ms")
+    detection.add_argument("--padding-after", type=int, help="Padding depois do segmento em ms")
+    detection.add_argument("--min-segment-duration", type=int, help="Duração mínima do segmento em ms")
+    detection.add_argument("--backend", choices=("numpy", "pydub", "ffmpeg"), help="Motor de detecção")
+    detection.add_argument("--classify", action="store_true", default=None,
+                           help="Aparar/dividir os segmentos nos trechos de fala (classificador espectral)")
+    detection.add_argument("--music-threshold", type=float,
+                           help="Nota mínima do classificador para música (0 = fala, 1 = música)")
+    detection.add_argument("--min-non-music-len", type=int,
+                           help="Duração mínima em ms de um trecho de fala para aparar/dividir")
+
+    output = parser.add_argument_group("saída")
+    output.add_argument("--export-dir",
+                        help="Exportar os segmentos para este diretório (um subdiretório por vídeo)")
+    output.add_argument("--manifest-dir",
+                        help="Diretório dos manifestos (padrão: --export-dir ou a pasta de cada vídeo)")
+    output.add_argument("--manifest-format", choices=("json", "csv"), default="json",
+                        help="Formato do manifesto de cada arquivo (padrão: json)")
+    output.add_argument("--no-journal", action="store_true",
+                        help="Não manter o diário de cada vídeo (por padrão uma nova execução do "
+                             "lote pula as detecções e exportações já concluídas)")
+
+    parser.add_argument("-j", "--workers", type=int, default=None,
+                        help="Arquivos processados em paralelo (padrão: número de núcleos)")
+
+    diagnostics = parser.add_argument_group("diagnóstico")
+    diagnostics.add_argument("--trace", metavar="ARQUIVO",
+                             help="Gravar spans e contadores num trace do Chrome (como AUTOEDIT_TRACE)")
+    diagnostics.add_argument("--profile", action="store_true",
+                             help="Com --trace, gravar também o cProfile da detecção de cada arquivo")
+
+    staged = parser.add_argument_group("pipeline em etapas")
+    staged.add_argument("--pipeline", action="store_true",
+                        help="Sobrepor extração, detecção e exportação de arquivos diferentes "
+                             "(threads por etapa em vez de um processo por arquivo)")
+    staged.add_argument("--extract-workers", type=int, help="Threads de extração (PIPELINE_PARAMS)")
+    staged.add_argument("--detect-workers", type=int, help="Threads de detecção (PIPELINE_PARAMS)")
+    staged.add_argument("--export-workers", type=int, help="Threads de exportação (PIPELINE_PARAMS)")
+    return parser
+
+def collect_inputs(patterns, recursive=False):
+    """Expande arquivos, globs e diretórios em uma lista de vídeos sem repetição."""
+    found = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            walker = os.walk(pattern) if recursive else [(pattern, [], os.listdir(pattern))]
+            for root, _, names in walker:
+                found.extend(os.path.join(root, name) for name in sorted(names)
+                             if name.lower().endswith(VIDEO_EXTENSIONS))
+        elif os.path.isfile(pattern):
+            found.append(pattern)
+        else:
+            matches = sorted(glob.glob(pattern, recursive=recursive))
+            if not matches:
+                logging.warning(f"Nenhum arquivo encontrado para: {pattern}")
+            found.extend(path for path in matches if os.path.isfile(path))
+
+    unique = []
+    seen = set()
+    for path in found:
+        key = os.path.abspath(path)
+        if key not in seen:
+            seen.add(key)
+            unique.append(path)
+    return unique
+
+def output_names(paths):
+    """Nome de saída de cada vídeo do lote: subpasta de exportação, manifesto e diário.
+
+    É o nome do arquivo sem extensão. Vídeos com o mesmo nome (ex.: em subpastas
+    diferentes com -r) usam o caminho relativo à pasta comum a eles, e os que
+    diferem só na extensão ganham a extensão no nome, para não sobrescreverem os
+    cortes, manifestos e diários uns dos outros.
+    """
+    def stem(path):
+        return os.path.splitext(os.path.basename(path))[0]
+
+    names = {path: stem(path) for path in paths}
+    counts = Counter(names.values())
+    colliding = [path for path in paths if counts[names[path]] > 1]
+    if colliding:
+        root = os.path.commonpath([os.path.dirname(os.path.abspath(path)) for path in colliding])
+        relative = {path: os.path.splitext(os.path.relpath(os.path.abspath(path), root)) for path in colliding}
+        relative_counts = Counter(name for name, _ in relative.values())
+        for path, (name, ext) in relative.items():
+            names[path] = name if relative_counts[name] == 1 else f"{name}_{ext.lstrip('.')}"
+
+    duplicates = [name for name, count in Counter(names.values()).items() if count > 1]
+    if duplicates:
+        logging.error(f"Vídeos com o mesmo nome de saída: {', '.join(sorted(duplicates))}")
+        raise ValueError(f"Nomes de saída repetidos: {', '.join(sorted(duplicates))}")
+    return names
+
+def manifest_location(video_path, output_name, manifest_dir=None, manifest_format="json"):
+    """Caminho do manifesto de um vídeo: em manifest_dir (com as subpastas do nome de
+    saída) ou, sem ele, na pasta do próprio vídeo. Cria a pasta se necessário."""
+    if manifest_dir:
+        path = os.path.join(manifest_dir, f"{output_name}_segments.{manifest_format}")
+    else:
+        path = os.path.join(os.path.dirname(os.path.abspath(video_path)),
+                            f"{os.path.basename(output_name)}_segments.{manifest_format}")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
+def load_config_file(path):
+    """Lê um arquivo JSON no formato aceito por config.save_config."""
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def build_settings(args):
+    """Configuração completa enviada a cada processo: arquivo --config + opções da linha de comando."""
+    settings = {"detection": {}, "export": {}, "audio": {}}
+    if args.config:
+        for category, params in load_config_file(args.config).items():
+            settings.setdefault(category, {}).update(params)
+
+    for flag in _DETECTION_FLAGS:
+        value = getattr(args, flag)
+        if value is not None:
+            settings["detection"][flag] = value
+
+    # O lote retoma execuções interrompidas pelo diário (EXPORT_PARAMS["journal"], desligado na interface)
+    settings["export"]["journal"] = False if args.no_journal else settings["export"].get("journal", True)
+    return settings
+
+def schedule_longest_first(paths):
+    """Ordena os arquivos da maior para a menor duração, para o lote terminar o quanto antes.
+
+    Os arquivos são inspecionados em paralelo (ver probe.probe_many) e a inspeção
+    fica no cache, então os processos do lote não repetem o ffprobe.
+    """
+    from probe import probe_many
+
+    infos = probe_many(paths)
+    durations = {path: (infos[path].duration if infos[path] else None) or 0.0 for path in paths}
+    return sorted(paths, key=lambda path: durations[path], reverse=True), durations
+
+def process_file(video_path, settings, export_dir=None, manifest_dir=None, manifest_format="json",
+                 output_name=None):
+    """Detecta (e exporta) um arquivo; roda dentro de um processo do pool.
+
+    output_name é o nome de saída do vídeo no lote (ver output_names; padrão: o
+    nome do arquivo sem extensão).
+    """
+    # Processos novos (spawn) não herdam as alterações feitas em config no processo pai
+    save_config(settings)
+    from main import extract_and_detect, export_segments
+    from journal import batch_journal, resume_detection
+
+    output_name = output_name or os.path.splitext(os.path.basename(video_path))[0]
+    # Numa nova execução do lote, detecções e exportações já concluídas são reaproveitadas
+    journal = batch_journal(video_path, export_dir, manifest_dir, output_name)
+    segments = resume_detection(journal, video_path, extract_and_detect)
+
+    outputs = []
+    if export_dir:
+        target_dir = os.path.join(export_dir, output_name)
+        os.makedirs(target_dir, exist_ok=True)
+        outputs = export_segments(video_path, target_dir, segments, journal=journal)
+
+    manifest_path = manifest_location(video_path, output_name, manifest_dir or export_dir, manifest_format)
+    write_manifest(manifest_path, video_path, segments, outputs, manifest_format)
+
+    return {"source": video_path, "segments": len(segments), "manifest": manifest_path}
+
+def write_manifest(manifest_path, video_path, segments, outputs, manifest_format="json"):
+    """Grava a lista de segmentos (e arquivos exportados) de um vídeo em JSON ou CSV."""
+    rows = []
+    for i, seg in enumerate(segments):
+        rows.append({
+            "index": i + 1,
+            "start": seg['start'],
+            "end": seg['end'],
+            "duration": seg['end'] - seg['start'],
+            "output": outputs[i] if i < len(outputs) else None,
+        })
+
+    if manifest_format == "csv":
+        with open(manifest_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=["index", "start", "end", "duration", "output"])
+            writer.writeheader()
+            writer.writerows(rows)
+    else:
+        manifest = {
+            "source": os.path.abspath(video_path),
+            "detection": dict(DETECTION_PARAMS),
+            "audio": dict(AUDIO_EXTRACTION_PARAMS),
+            "export": dict(EXPORT_PARAMS),
+            "segments": rows,
+        }
+        with open(manifest_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2, ensure_ascii=False)
+
+def enable_tracing(path, profile=False):
+    """Ativa a instrumentação aqui e, pelas variáveis de ambiente, nos processos do pool."""
+    import tracing
+    os.environ[tracing.TRACE_ENV] = path
+    if profile:
+        os.environ[tracing.PROFILE_ENV] = "1"
+    tracing.enable(path, profile)
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.trace:
+        enable_tracing(args.trace, args.profile)
+
+    paths = collect_inputs(args.inputs, args.recursive)
+    if not paths:
+        logging.error("Nenhum vídeo para processar")
+        return 2
+
+    try:
+        names = output_names(paths)
+    except ValueError:
+        return 2
+
+    settings = build_settings(args)
+    save_config(settings)
+
+    paths, durations = schedule_longest_first(paths)
+    total = sum(durations.values())
+    logging.info(f"{len(paths)} arquivo(s), {total/3600:.2f} h de mídia no total")
+
+    if args.pipeline:
+        return run_pipeline(args, paths, names)
+
+    failures = 0
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = {
+            executor.submit(process_file, path, settings, args.export_dir,
+                            args.manifest_dir, args.manifest_format, names[path]): path
+            for path in paths
+        }
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                result = future.result()
+                logging.info(f"{path}: {result['segments']} segmento(s) -> {result['manifest']}")
+            except Exception as e:
+                failures += 1
+                logging.error(f"Falha ao processar {path}: {str(e)}")
+
+    logging.info(f"Concluído: {len(paths) - failures} ok, {failures} com erro")
+    return 1 if failures else 0
+
+def run_pipeline(args, paths, names=None):
+    """Processa os arquivos com o pipeline em etapas (ver pipeline.py)."""
+    from pipeline import build_detection_pipeline
+
+    pipeline = build_detection_pipeline(
+        export_dir=args.export_dir,
+        manifest_dir=args.manifest_dir,
+        manifest_format=args.manifest_format,
+        extract_workers=args.extract_workers,
+        detect_workers=args.detect_workers,
+        export_workers=args.export_workers,
+        output_names=names,
+    )
+    jobs = pipeline.run(paths)
+
+    failures = 0
+    for job in jobs:
+        if job.error is not None:
+            failures += 1
+            logging.error(f"Falha ao processar {job.path} (etapa {job.failed_stage}): {str(job.error)}")
+        else:
+            logging.info(f"{job.path}: {job.result['segments']} segmento(s) -> {job.result['manifest']}")
+
+    logging.info("Métricas do pipeline:\n" + pipeline.format_metrics())
+    logging.info(f"Concluído: {len(jobs) - failures} ok, {failures} com erro")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    sys.exit(main())
@@ -18,6 +18,35 @@ DETECTION_PARAMS = {
     
     # Duração mínima de um segmento para ser considerado música (ms)
     "min_segment_duration": 60000,  # 1 minuto por padrão
+    
+    # Motor de detecção de silêncio:
+    #   "numpy" - envelope RMS vetorizado (rápido, padrão)
+    #   "pydub" - pydub.silence.detect_silence (implementação de referência, lenta)
+    #   "ffmpeg" - filtro silencedetect do ffmpeg, sem decodificar áudio no Python
+    #              (mínimo de memória; limites podem variar alguns ms)
+    "backend": "numpy",
+    
+    # Detecção em dois níveis (backend "numpy"): triagem com um envelope grosso
+    # calculado pelo ffmpeg e resolução de milissegundo só perto dos silêncios
+    "coarse_to_fine": False,
+    
+    # Duração de cada janela do envelope grosso (ms)
+    "coarse_window_ms": 100,
+    
+    # Folga (dB) do limiar na triagem grossa, para não perder silêncios no limite
+    "coarse_margin_db": 0.5,
+    
+    # Classificar música/não música por características espectrais (ver classifier.py) e
+    # aparar/dividir os segmentos nos trechos de fala; as características vão para o cache
+    # junto com o envelope, então mudar os dois parâmetros abaixo não decodifica de novo
+    "classify": False,
+    
+    # Nota mínima (0 = fala, 1 = música) para um trecho contar como música
+    "music_threshold": 0.5,
+    
+    # Duração mínima (ms) de um trecho de não música para aparar ou dividir um segmento
+    # (falas mais curtas dentro de uma música são ignoradas)
+    "min_non_music_len": 20000,
 }
 
 # Parâmetros para exportação de vídeo
@@ -25,8 +54,41 @@ EXPORT_PARAMS = {
     # Formato de arquivo de saída
     "format": "mp4",
     
-    # Qualidade de exportação (manter original)
+    # Qualidade de exportação: True = manter original (cópia de codec), False = recodificar,
+    # "auto" = copiar se os quadros-chave da origem forem próximos (ver auto_copy_max_gop);
+    # senão usar a renderização inteligente ou, sem encoder compatível, recodificar
     "copy_codec": True,
+    
+    # Com copy_codec "auto": maior intervalo entre quadros-chave (s) aceito para a cópia
+    # (um corte copiado pode começar até esse tempo antes do pedido)
+    "auto_copy_max_gop": 2.0,
+    
+    # Renderização inteligente: recodifica só o trecho até o primeiro quadro-chave e depois
+    # do último, copiando o resto (corte preciso com velocidade próxima da cópia; ignora copy_codec)
+    "smart_render": False,
+    
+    # Qualidade (CRF) dos trechos recodificados na renderização inteligente
+    "smart_render_crf": 18,
+    
+    # Processos ffmpeg simultâneos na exportação (None = automático, ver main.default_export_workers)
+    "workers": None,
+    
+    # Interromper a exportação no primeiro erro (False = exporta o resto e reporta os erros no final)
+    "stop_on_error": True,
+    
+    # Com cópia de codec, recuar o início ao quadro-chave anterior (índice via ffprobe, salvo no cache)
+    "snap_to_keyframes": True,
+    
+    # Exportar todos os segmentos com uma única execução do ffmpeg (lê a origem uma só vez);
+    # se o ffmpeg falhar, volta para um corte por segmento. Com cópia de codec os inícios
+    # sempre recuam ao quadro-chave anterior (mesmo sem snap_to_keyframes), senão áudio e
+    # vídeo de cada parte começariam em tempos diferentes
+    "single_pass": False,
+    
+    # Manter um diário ({vídeo}.journal.jsonl) na pasta de saída: uma nova exportação pula
+    # os segmentos já exportados e íntegros (conferidos com ffprobe) e refaz só os que faltam.
+    # Desligado na interface; a linha de comando (cli.py) o liga, salvo com --no-journal
+    "journal": False,
 }
 
 # Parâmetros para extração de áudio
@@ -39,6 +101,74 @@ AUDIO_EXTRACTION_PARAMS = {
     
     # Taxa de amostragem para análise
     "sample_rate": 16000,
+    
+    # Faixa de áudio analisada: None = a marcada como padrão no arquivo (ou a primeira),
+    # um número = posição entre as faixas de áudio (0 = primeira), um texto = idioma ("por")
+    "audio_stream": None,
+    
+    # Ler o PCM direto do pipe do ffmpeg em vez de gravar um WAV temporário
+    "streaming": True,
+    
+    # Tamanho de cada bloco lido do pipe (em quadros de áudio; 160000 = 10s a 16 kHz)
+    "block_size": 160000,
+    
+    # Divide a linha do tempo em N trechos decodificados em paralelo, cada um por
+    # um ffmpeg próprio (1 = um único processo). Só vale para arquivos longos.
+    "shards": 1,
+    
+    # Duração mínima de cada trecho em segundos (arquivos curtos usam menos trechos)
+    "min_shard_duration": 300,
+}
+
+# Parâmetros do pipeline de processamento em lote (ver pipeline.py)
+PIPELINE_PARAMS = {
+    # Threads de cada etapa: extração (decodificação), detecção (CPU) e exportação (I/O)
+    "extract_workers": 2,
+    "detect_workers": 1,
+    "export_workers": 1,
+    
+    # Itens aguardando entre duas etapas; quando a fila enche a etapa anterior espera
+    "queue_size": 2,
+}
+
+# Parâmetros do cache de análise (envelope de volume salvo em disco)
+CACHE_PARAMS = {
+    # Reaproveitar análises anteriores do mesmo arquivo
+    "enabled": True,
+    
+    # Pasta do cache (None = ~/.auto_edit_cache)
+    "directory": None,
+    
+    # Tamanho máximo do cache em MB (os itens usados há mais tempo são removidos)
+    "max_size_mb": 1024,
+}
+
+# Servidor local de trabalhos compartilhado por várias interfaces (ver server.py)
+SERVER_PARAMS = {
+    # Endereço do servidor usado pela interface (ex.: "http://nas-edicao:8765");
+    # None = a interface detecta e exporta localmente
+    "url": None,
+    
+    # Endereço e porta em que o servidor escuta (fora de 127.0.0.1/localhost o token é obrigatório)
+    "host": "127.0.0.1",
+    "port": 8765,
+    
+    # Segredo compartilhado: os clientes enviam "Authorization: Bearer <token>"
+    # (None = sem autenticação, só aceito escutando em 127.0.0.1/localhost)
+    "token": None,
+    
+    # Pastas em que o servidor aceita ler vídeos e gravar exportações
+    # (lista vazia = só a pasta em que o servidor foi iniciado)
+    "roots": [],
+    
+    # Processos que executam os trabalhos (None = número de núcleos)
+    "workers": None,
+    
+    # Trabalhos concluídos ficam disponíveis (resultado e deduplicação) por este tempo (s)...
+    "finished_job_ttl": 3600,
+    
+    # ...e no máximo esta quantidade (os mais antigos são descartados antes)
+    "max_finished_jobs": 200,
 }
 
 # Função para salvar configurações atualizadas
@@ -54,9 +184,18 @@ def save_config(updated_params):
             EXPORT_PARAMS.update(params)
         elif category == "audio":
             AUDIO_EXTRACTION_PARAMS.update(params)
+        elif category == "cache":
+            CACHE_PARAMS.update(params)
+        elif category == "pipeline":
+            PIPELINE_PARAMS.update(params)
+        elif category == "server":
+            SERVER_PARAMS.update(params)
     
     return {
         "detection": DETECTION_PARAMS,
         "export": EXPORT_PARAMS,
-        "audio": AUDIO_EXTRACTION_PARAMS
+        "audio": AUDIO_EXTRACTION_PARAMS,
+        "cache": CACHE_PARAMS,
+        "pipeline": PIPELINE_PARAMS,
+        "server": SERVER_PARAMS
     }
@@ -1,21 +1,220 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 from datetime import timedelta
-from main import extract_and_detect
+import importlib
 import logging
+import queue
 import threading
-from config import DETECTION_PARAMS, save_config
+import time
+from config import DETECTION_PARAMS, SERVER_PARAMS, save_config
+
+# A janela abre sem os módulos de análise (numpy, pydub, ffmpeg-python): eles são
+# importados nas funções que os usam e carregados em segundo plano logo após a
+# abertura, para a primeira detecção não esperar (ver benchmarks/bench_startup.py)
+WARMUP_MODULES = ("numpy", "music_detection", "video_operations", "waveform", "classifier", "main")
+WARMUP_DELAY_MS = 200
+
+# Espera após o último movimento de um controle antes de recalcular a pré-visualização
+PREVIEW_DEBOUNCE_MS = 150
+
+# Intervalo com que a thread do Tk aplica as atualizações vindas das threads de trabalho
+# (~30 quadros por segundo, independente de quantas vezes o ffmpeg reporta progresso)
+UI_POLL_MS = 33
+
+# Faixa de volume (dBFS) exibida no painel de forma de onda, de baixo para cima
+WAVEFORM_DB_FLOOR = -80
+# Menor trecho exibido com o zoom máximo (ms)
+WAVEFORM_MIN_VIEW_MS = 200
+# Fator de zoom por passo da roda do mouse
+WAVEFORM_ZOOM_STEP = 1.25
+
+class WaveformPanel(ttk.Frame):
+    """Forma de onda e volume (RMS em dB) do áudio, com os segmentos e o limiar de silêncio.
+    
+    A roda do mouse aproxima/afasta em torno do cursor, arrastar desloca e o
+    duplo clique volta ao arquivo inteiro. Cada redesenho lê da pirâmide
+    (ver waveform.WaveformPyramid) só o nível que cabe na largura do painel.
+    """
+    
+    def __init__(self, parent, height=140):
+        super().__init__(parent)
+        self.canvas = tk.Canvas(self, height=height, background="white", highlightthickness=0)
+        self.canvas.pack(fill=tk.BOTH, expand=True)
+        
+        self.pyramid = None
+        self.segments = []
+        self.threshold = None
+        self.view_start = 0  # Início do trecho visível (ms)
+        self.view_span = 0  # Duração do trecho visível (ms)
+        self._redraw_pending = False
+        self._drag = None
+        
+        self.canvas.bind("<Configure>", lambda event: self.schedule_redraw())
+        self.canvas.bind("<MouseWheel>", self.on_wheel)
+        self.canvas.bind("<Button-4>", lambda event: self.zoom(1 / WAVEFORM_ZOOM_STEP, event.x))
+        self.canvas.bind("<Button-5>", lambda event: self.zoom(WAVEFORM_ZOOM_STEP, event.x))
+        self.canvas.bind("<ButtonPress-1>", self.on_press)
+        self.canvas.bind("<B1-Motion>", self.on_drag)
+        self.canvas.bind("<Double-Button-1>", lambda event: self.reset_view())
+    
+    def set_pyramid(self, pyramid):
+        """Troca o áudio exibido (None limpa o painel) e mostra o arquivo inteiro"""
+        self.pyramid = pyramid
+        self.reset_view()
+    
+    def set_segments(self, segments):
+        self.segments = segments
+        self.schedule_redraw()
+    
+    def set_threshold(self, threshold):
+        self.threshold = threshold
+        self.schedule_redraw()
+    
+    def reset_view(self):
+        self.view_start = 0
+        self.view_span = self.pyramid.duration_ms if self.pyramid else 0
+        self.schedule_redraw()
+    
+    def zoom(self, factor, x):
+        """Multiplica a duração visível por factor mantendo o instante sob x no lugar"""
+        if not self.pyramid or not self.view_span:
+            return
+        width = max(1, self.canvas.winfo_width())
+        anchor = self.view_start + x / width * self.view_span
+        self.view_span = min(self.pyramid.duration_ms,
+                             max(WAVEFORM_MIN_VIEW_MS, self.view_span * factor))
+        self.pan_to(anchor - x / width * self.view_span)
+    
+    def pan_to(self, start):
+        self.view_start = min(max(0, start), self.pyramid.duration_ms - self.view_span)
+        self.schedule_redraw()
+    
+    def on_wheel(self, event):
+        # Windows manda múltiplos de 120; macOS, valores pequenos
+        self.zoom(1 / WAVEFORM_ZOOM_STEP if event.delta > 0 else WAVEFORM_ZOOM_STEP, event.x)
+    
+    def on_press(self, event):
+        self._drag = (event.x, self.view_start)
+    
+    def on_drag(self, event):
+        if not self.pyramid or self._drag is None:
+            return
+        x, start = self._drag
+        width = max(1, self.canvas.winfo_width())
+        self.pan_to(start - (event.x - x) / width * self.view_span)
+    
+    def schedule_redraw(self):
+        """Agrupa vários pedidos de redesenho (ex.: arrasto, novos segmentos) em um só"""
+        if not self._redraw_pending:
+            self._redraw_pending = True
+            self.after_idle(self.redraw)
+    
+    def redraw(self):
+        self._redraw_pending = False
+        canvas = self.canvas
+        canvas.delete("all")
+        width, height = canvas.winfo_width(), canvas.winfo_height()
+        if self.pyramid is None or not self.view_span or width < 2:
+            canvas.create_text(width / 2, height / 2, fill="gray",
+                               text="A forma de onda aparece após a detecção")
+            return
+        
+        import numpy as np
+        from waveform import energy_to_dbfs
+        from music_detection import MAX_AMPLITUDE
+        
+        start, span = self.view_start, self.view_span
+        scale = width / span
+        middle = height / 2
+        
+        # Segmentos detectados ao fundo
+        for seg in self.segments:
+            seg_start, seg_end = seg['start'] * 1000, seg['end'] * 1000
+            if seg_end >= start and seg_start <= start + span:
+                canvas.create_rectangle((seg_start - start) * scale, 0, (seg_end - start) * scale,
+                                        height, fill="#d4f0d4", outline="")
+        
+        edges, mins, maxs, energy = self.pyramid.columns(start, start + span, width)
+        if len(mins):
+            # Forma de onda como um único polígono: máximos da esquerda para a direita,
+            # mínimos de volta, com cada coluna ocupando de uma borda à seguinte
+            xs = (edges - start) * scale
+            left_right = np.repeat(xs, 2)[1:-1]
+            amplitude = middle * 0.95 / MAX_AMPLITUDE
+            top = middle - np.repeat(maxs.astype(np.float64), 2) * amplitude
+            bottom = middle - np.repeat(mins.astype(np.float64), 2) * amplitude
+            outline = np.concatenate((np.column_stack((left_right, top)),
+                                      np.column_stack((left_right[::-1], bottom[::-1]))))
+            canvas.create_polygon(*outline.ravel().tolist(), fill="#6a8caf", outline="#6a8caf")
+            
+            # Volume em dB no centro de cada coluna
+            if len(energy) > 1:
+                db = np.clip(energy_to_dbfs(energy), WAVEFORM_DB_FLOOR, 0)
+                centers = (xs[:-1] + xs[1:]) / 2
+                line = np.column_stack((centers, db / WAVEFORM_DB_FLOOR * height))
+                canvas.create_line(*line.ravel().tolist(), fill="#e08a00")
+        
+        # Limiar de silêncio na mesma escala em dB do volume
+        if self.threshold is not None:
+            y = min(max(self.threshold, WAVEFORM_DB_FLOOR), 0) / WAVEFORM_DB_FLOOR * height
+            canvas.create_line(0, y, width, y, fill="red", dash=(4, 2))
+            canvas.create_text(width - 4, y - 2, anchor=tk.SE, fill="red", text=f"{self.threshold} dB")
+        
+        # Tempos das bordas do trecho visível
+        canvas.create_text(4, height - 2, anchor=tk.SW, text=str(timedelta(seconds=int(start / 1000))))
+        canvas.create_text(width - 4, height - 2, anchor=tk.SE,
+                           text=str(timedelta(seconds=int((start + span) / 1000))))
 
 class MusicExtractorApp:
     def __init__(self, root):
         self.root = root
         self.root.title("Music Extractor")
-        self.root.geometry("800x600")
+        self.root.geometry("800x760")
         
         self.video_path = ""
         self.segments = []
         
+        # Índice de quadros-chave do vídeo atual (cortes ajustados com cópia de codec)
+        self.keyframe_index = None
+        
+        # Inspeção do vídeo atual (duração, streams, GOP; ver probe.py), feita ao escolher o arquivo
+        self.media_info = None
+        
+        # Envelope da última detecção, usado pela pré-visualização ao vivo
+        self.envelope = None
+        self.envelope_cumulative = None
+        # Características espectrais da última detecção (reclassificação na pré-visualização)
+        self.features = None
+        self._preview_after_id = None
+        self._preview_running = False
+        self._preview_pending = False
+        
+        # O Tk só pode ser usado pela thread principal: as threads de trabalho enfileiram
+        # chamadas em ui_queue e o progresso, do qual só importa o valor mais recente,
+        # fica em _pending_progress; poll_ui_queue aplica os dois periodicamente
+        self.ui_queue = queue.Queue()
+        self._pending_progress = None
+        
+        # Sinalizado pelo botão Cancelar; um novo evento por operação
+        self.cancel_event = threading.Event()
+        
         self.create_widgets()
+        self.poll_ui_queue()
+        self.root.after(WARMUP_DELAY_MS, self.start_warmup)
+    
+    def start_warmup(self):
+        """Carrega os módulos de análise numa thread enquanto o usuário escolhe o arquivo"""
+        threading.Thread(target=self.warm_up, name="warmup", daemon=True).start()
+    
+    def warm_up(self):
+        started = time.perf_counter()
+        for name in WARMUP_MODULES:
+            try:
+                importlib.import_module(name)
+            except Exception as e:
+                # O erro reaparece (e é mostrado) quando o módulo for realmente usado
+                logging.warning(f"Erro ao pré-carregar {name}: {str(e)}")
+        logging.debug(f"Módulos de análise carregados em {time.perf_counter() - started:.2f}s")
         
     def create_widgets(self):
         # Frame principal
@@ -31,6 +230,10 @@ class MusicExtractorApp:
         self.file_entry.pack(side=tk.LEFT, padx=5, expand=True, fill=tk.X)
         ttk.Button(file_frame, text="Procurar", command=self.browse_file).pack(side=tk.LEFT)
         
+        # Resumo da inspeção do arquivo escolhido
+        self.media_info_var = tk.StringVar(value="")
+        ttk.Label(main_frame, textvariable=self.media_info_var, anchor=tk.W).pack(fill=tk.X)
+        
         # Adicionar controles de configuração após a seleção de arquivo
         config_frame = ttk.LabelFrame(main_frame, text="Configurações")
         config_frame.pack(fill=tk.X, pady=10, padx=5)
@@ -69,6 +272,14 @@ class MusicExtractorApp:
         self.min_duration_var.trace_add("write", update_duration_label)
         update_duration_label()  # Inicializar o label
         
+        # Pré-visualização: após a primeira detecção, os controles resegmentam na hora
+        self.live_preview_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(
+            basic_tab,
+            text="Pré-visualização ao vivo (recalcula ao mover os controles)",
+            variable=self.live_preview_var
+        ).pack(anchor=tk.W, padx=5, pady=5)
+        
         # Aba de configurações avançadas
         advanced_tab = ttk.Frame(config_notebook)
         config_notebook.add(advanced_tab, text="Avançado")
@@ -170,6 +381,34 @@ class MusicExtractorApp:
         self.padding_after_var.trace_add("write", update_padding_after_label)
         update_padding_after_label()
         
+        # Classificador música/fala (apara e divide os segmentos nos trechos de fala)
+        classify_frame = ttk.Frame(params_frame)
+        classify_frame.pack(fill=tk.X, pady=2)
+        
+        self.classify_var = tk.BooleanVar(value=DETECTION_PARAMS["classify"])
+        ttk.Checkbutton(
+            classify_frame,
+            text="Separar fala (nota mín.):",
+            variable=self.classify_var
+        ).pack(side=tk.LEFT, padx=5)
+        self.music_threshold_var = tk.IntVar(value=round(DETECTION_PARAMS["music_threshold"] * 100))
+        music_threshold_scale = ttk.Scale(
+            classify_frame,
+            from_=0,
+            to=100,
+            variable=self.music_threshold_var,
+            orient=tk.HORIZONTAL
+        )
+        music_threshold_scale.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+        self.music_threshold_label = ttk.Label(classify_frame, width=7)
+        self.music_threshold_label.pack(side=tk.LEFT, padx=5)
+        
+        def update_music_threshold_label(*args):
+            self.music_threshold_label.config(text=f"{self.music_threshold_var.get()}%")
+        
+        self.music_threshold_var.trace_add("write", update_music_threshold_label)
+        update_music_threshold_label()
+        
         # Botão de aplicar configurações
         ttk.Button(
             advanced_tab, 
@@ -203,14 +442,29 @@ class MusicExtractorApp:
         )
         self.progress_step_label.pack(fill=tk.X)
         
+        # Interrompe a detecção ou exportação em andamento
+        self.cancel_btn = ttk.Button(
+            progress_frame,
+            text="Cancelar",
+            command=self.cancel_operation
+        )
+        self.cancel_btn.pack()
+        
         # Esconder inicialmente
         self.progress_bar.pack_forget()
         self.progress_step_label.pack_forget()
+        self.cancel_btn.pack_forget()
+        
+        # Forma de onda com os segmentos e o limiar de silêncio
+        ttk.Label(main_frame, text="Forma de Onda:", font=("Arial", 12, "bold")).pack(anchor=tk.W)
+        self.waveform_panel = WaveformPanel(main_frame)
+        self.waveform_panel.pack(fill=tk.X, pady=5)
+        self.waveform_panel.set_threshold(self.threshold_var.get())
         
         # Tabela de segmentos
         ttk.Label(main_frame, text="Segmentos Detectados:", font=("Arial", 12, "bold")).pack(anchor=tk.W)
         
-        columns = ("#1", "#2")
+        columns = ("#1", "#2", "#3", "#4")
         self.segments_table = ttk.Treeview(
             main_frame, 
             columns=columns, 
@@ -219,8 +473,12 @@ class MusicExtractorApp:
         )
         self.segments_table.heading("#1", text="Início")
         self.segments_table.heading("#2", text="Fim")
+        self.segments_table.heading("#3", text="Corte início")
+        self.segments_table.heading("#4", text="Corte fim")
         self.segments_table.column("#1", width=100, anchor=tk.CENTER)
         self.segments_table.column("#2", width=100, anchor=tk.CENTER)
+        self.segments_table.column("#3", width=100, anchor=tk.CENTER)
+        self.segments_table.column("#4", width=100, anchor=tk.CENTER)
         
         scrollbar = ttk.Scrollbar(main_frame, orient=tk.VERTICAL, command=self.segments_table.yview)
         self.segments_table.configure(yscroll=scrollbar.set)
@@ -241,26 +499,90 @@ class MusicExtractorApp:
         self.status_var = tk.StringVar(value="Pronto")
         status_bar = ttk.Label(main_frame, textvariable=self.status_var, relief=tk.SUNKEN)
         status_bar.pack(side=tk.BOTTOM, fill=tk.X)
+        
+        # Qualquer mudança de parâmetro dispara a pré-visualização ao vivo
+        for var in (self.threshold_var, self.silence_len_var, self.padding_before_var,
+                    self.padding_after_var, self.min_duration_var, self.classify_var,
+                    self.music_threshold_var):
+            var.trace_add("write", self.schedule_preview)
+        self.threshold_var.trace_add(
+            "write", lambda *args: self.waveform_panel.set_threshold(self.threshold_var.get())
+        )
+    
+    def post(self, func, *args):
+        """Agenda func(*args) na thread do Tk (seguro a partir de qualquer thread)"""
+        self.ui_queue.put((func, args))
+    
+    def post_progress(self, value=0, step=None):
+        """Como update_progress, a partir de qualquer thread; atualizações entre dois
+        quadros são agrupadas e só a última é desenhada"""
+        self._pending_progress = (value, step)
+    
+    def poll_ui_queue(self):
+        """Aplica, na thread do Tk, as atualizações enviadas pelas threads de trabalho"""
+        while True:
+            try:
+                func, args = self.ui_queue.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                func(*args)
+            except Exception:
+                logging.exception("Erro ao atualizar a interface")
+        
+        progress, self._pending_progress = self._pending_progress, None
+        if progress is not None:
+            self.update_progress(*progress)
+        
+        self.root.after(UI_POLL_MS, self.poll_ui_queue)
     
     def update_progress(self, value=0, step=None):
-        """Atualiza a barra de progresso e o texto de status"""
+        """Atualiza a barra de progresso e o texto de status (somente na thread do Tk)"""
         self.progress_var.set(value)
         if step:
             self.progress_step_var.set(step)
-        self.root.update()
     
     def show_progress(self):
-        """Exibe a barra de progresso e o rótulo de etapa"""
+        """Exibe a barra de progresso, o rótulo de etapa e o botão de cancelar"""
+        self.progress_started = time.perf_counter()
+        self._pending_progress = None
         self.progress_var.set(0)
         self.progress_bar.pack(fill=tk.X)
         self.progress_step_label.pack(fill=tk.X)
-        self.root.update()
+        self.cancel_btn.config(state=tk.NORMAL)
+        self.cancel_btn.pack()
+    
+    def cancel_operation(self):
+        """Pede a interrupção da operação em andamento (o ffmpeg é encerrado)"""
+        self.cancel_event.set()
+        self.cancel_btn.config(state=tk.DISABLED)
+        self.status_var.set("Cancelando...")
+    
+    def progress_details(self, overall_pct, speed=None, media_seconds=None):
+        """Velocidade (em relação ao tempo real) e tempo restante estimado para o rótulo de etapa
+        
+        media_seconds é a duração da mídia processada pela operação, usada no começo,
+        quando o ritmo medido ainda é instável: o restante sai da velocidade do ffmpeg.
+        """
+        details = []
+        if speed:
+            details.append(f"{speed:.1f}x tempo real")
+        remaining = None
+        if overall_pct >= 2:
+            # Estima pelo ritmo desde o início da operação
+            elapsed = time.perf_counter() - self.progress_started
+            remaining = elapsed * (100 - overall_pct) / overall_pct
+        elif speed and media_seconds:
+            remaining = media_seconds * (100 - overall_pct) / 100 / speed
+        if remaining is not None:
+            details.append(f"restante ~{self.format_time(remaining)}")
+        return f" — {', '.join(details)}" if details else ""
     
     def hide_progress(self):
         """Esconde a barra de progresso e o rótulo de etapa"""
         self.progress_bar.pack_forget()
         self.progress_step_label.pack_forget()
-        self.root.update()
+        self.cancel_btn.pack_forget()
     
     def browse_file(self):
         file_path = filedialog.askopenfilename(
@@ -269,8 +591,28 @@ class MusicExtractorApp:
         )
         if file_path:
             self.video_path = file_path
+            self.keyframe_index = None
+            self.media_info = None
+            self.media_info_var.set("Analisando arquivo...")
+            self.envelope = None
+            self.envelope_cumulative = None
+            self.features = None
+            self.waveform_panel.set_pyramid(None)
             self.file_entry.delete(0, tk.END)
             self.file_entry.insert(0, file_path)
+            threading.Thread(target=self.inspect_media, args=(file_path,), daemon=True).start()
+    
+    def inspect_media(self, video_path):
+        """Inspeciona o arquivo escolhido com o ffprobe (roda fora da thread do Tk)"""
+        from probe import try_probe
+        info = try_probe(video_path)
+        self.post(self.show_media_info, video_path, info)
+    
+    def show_media_info(self, video_path, info):
+        if video_path != self.video_path:
+            return  # Outro arquivo foi escolhido enquanto este era inspecionado
+        self.media_info = info
+        self.media_info_var.set(info.summary() if info else "Não foi possível inspecionar o arquivo")
     
     def detect_music(self):
         if not self.video_path:
@@ -278,73 +620,174 @@ class MusicExtractorApp:
             return
         
         self.status_var.set("Processando...")
+        self.envelope = None
+        self.envelope_cumulative = None
+        self.features = None
         self.export_btn.config(state=tk.DISABLED)
         self.segments_table.delete(*self.segments_table.get_children())
+        self.waveform_panel.set_pyramid(None)
+        self.waveform_panel.set_segments([])
+        self.cancel_event = threading.Event()
         self.show_progress()  # Mostra a barra de progresso
         
         # Executar em thread para não travar a interface
         threading.Thread(
             target=self.run_detection, 
+            args=(self.cancel_event,),
             daemon=True
         ).start()
     
-    def run_detection(self):
+    def run_detection(self, cancel_event):
+        # Roda fora da thread do Tk: toda alteração na interface passa por post/post_progress
+        from main import keyframe_index_for_export
+        from video_operations import OperationCancelled
+        
         try:
             # Etapa 1: Extração de áudio (33% do processo)
-            self.update_progress(0, "Iniciando extração de áudio...")
-            self.root.update()
+            self.post_progress(0, "Iniciando extração de áudio...")
             
             # Obter todos os parâmetros configurados pelo usuário
-            detection_params = {
-                "threshold": self.threshold_var.get(),
-                "min_silence_len": self.silence_len_var.get(),
-                "padding_before": self.padding_before_var.get(),
-                "padding_after": self.padding_after_var.get(),
-                "min_segment_duration": self.min_duration_var.get() * 1000
-            }
+            detection_params = self.current_detection_params()
+            
+            self.segments = []
+            if SERVER_PARAMS["url"]:
+                self.detect_on_server(detection_params, cancel_event)
+            else:
+                self.detect_locally(detection_params, cancel_event)
             
-            # Chama a função unificada com os parâmetros
-            self.segments = extract_and_detect(
-                self.video_path,
-                progress_callback=self.detection_progress_callback,
-                **detection_params
-            )
+            # Mostra onde os cortes com cópia de codec vão realmente cair
+            self.keyframe_index = keyframe_index_for_export(self.video_path)
+            if self.keyframe_index is not None:
+                self.post(self.update_segments_table)
             
             # Finalização
-            self.update_progress(100, "Processamento concluído!")
-            self.update_segments_table()
-            self.export_btn.config(state=tk.NORMAL)
-            self.status_var.set(f"{len(self.segments)} segmentos detectados")
+            self.post_progress(100, "Processamento concluído!")
+            self.post(self.status_var.set, f"{len(self.segments)} segmentos detectados")
+        except OperationCancelled:
+            # Os segmentos já confirmados continuam na tabela e podem ser exportados
+            self.post(self.status_var.set,
+                      f"Detecção cancelada ({len(self.segments)} segmentos detectados)")
         except Exception as e:
-            self.status_var.set("Erro durante o processamento")
-            messagebox.showerror("Erro", str(e))
+            self.post(self.status_var.set, "Erro durante o processamento")
+            self.post(messagebox.showerror, "Erro", str(e))
             logging.exception("Erro na detecção")
         finally:
-            self.hide_progress()  # Esconde a barra ao finalizar
+            self.post(self.hide_progress)  # Esconde a barra ao finalizar
     
-    def detection_progress_callback(self, stage, progress):
+    def detect_locally(self, detection_params, cancel_event):
+        """Detecção neste processo (roda na thread de trabalho)"""
+        import numpy as np
+        from main import iter_extract_and_detect
+        from music_detection import cumulative_energy
+        from waveform import WaveformPyramid
+        
+        # Segmentos aparecem na tabela à medida que são detectados
+        envelope_chunks = []
+        peaks_chunks = []
+        feature_chunks = []
+        for segment in iter_extract_and_detect(
+            self.video_path,
+            progress_callback=self.streaming_progress_callback,
+            on_envelope=envelope_chunks.append,
+            on_peaks=peaks_chunks.append,
+            on_features=feature_chunks.append,
+            cancel_event=cancel_event,
+            **detection_params
+        ):
+            self.segments.append(segment)
+            self.post(self.add_segment_row, segment)
+            self.post(self.export_btn.config, {"state": tk.NORMAL})
+        
+        # Mantém o envelope (e as características) para a pré-visualização ao vivo
+        envelope = np.concatenate(envelope_chunks)
+        self.features = np.concatenate(feature_chunks) if feature_chunks else None
+        self.envelope_cumulative = cumulative_energy(envelope)
+        self.envelope = envelope
+        
+        # Pirâmide da forma de onda, montada aqui para não travar a thread do Tk
+        peaks = np.concatenate(peaks_chunks) if peaks_chunks else None
+        self.post(self.waveform_panel.set_pyramid, WaveformPyramid(envelope, peaks))
+    
+    def detect_on_server(self, detection_params, cancel_event):
+        """Detecção pelo servidor de trabalhos (ver server.py; roda na thread de trabalho).
+        
+        O envelope fica no servidor, então a pré-visualização ao vivo e a forma de
+        onda não ficam disponíveis; os segmentos chegam todos no final.
+        """
+        from server import JobClient
+        
+        segments = JobClient().detect(
+            self.video_path,
+            {"detection": detection_params},
+            on_progress=self.detection_progress_callback,
+            cancel_event=cancel_event
+        )
+        for segment in segments:
+            self.segments.append(segment)
+            self.post(self.add_segment_row, segment)
+        if segments:
+            self.post(self.export_btn.config, {"state": tk.NORMAL})
+    
+    # Etapas da detecção na barra de progresso: nome, início e fim (%)
+    DETECTION_STAGES = {
+        "extract": ("Extraindo áudio", 0, 30),
+        "detect": ("Analisando áudio para detectar músicas", 30, 90),
+        "finalize": ("Finalizando processamento", 90, 100)
+    }
+    
+    # Em streaming (iter_extract_and_detect) a análise acompanha a decodificação e todo o
+    # trabalho é reportado como "extract"; "detect" só marca início e fim e fica de fora
+    STREAMING_STAGES = {
+        "extract": ("Extraindo e analisando áudio", 0, 90),
+        "finalize": ("Finalizando processamento", 90, 100)
+    }
+    
+    def detection_progress_callback(self, stage, progress, speed=None, stages=None):
         """Callback para atualizar o progresso durante a detecção"""
-        stages = {
-            "extract": ("Extraindo áudio", 0, 30),
-            "detect": ("Analisando áudio para detectar músicas", 30, 90),
-            "finalize": ("Finalizando processamento", 90, 100)
-        }
+        stages = stages or self.DETECTION_STAGES
         
         if stage in stages:
             name, start_pct, end_pct = stages[stage]
             current_pct = start_pct + (end_pct - start_pct) * (progress / 100)
-            self.update_progress(current_pct, f"{name} ({int(progress)}%)")
+            media_seconds = self.media_info.duration if self.media_info else None
+            details = self.progress_details(current_pct, speed, media_seconds)
+            self.post_progress(current_pct, f"{name} ({int(progress)}%){details}")
+    
+    def streaming_progress_callback(self, stage, progress, speed=None):
+        """Progresso da detecção local em streaming (ver STREAMING_STAGES)"""
+        self.detection_progress_callback(stage, progress, speed, self.STREAMING_STAGES)
     
     def update_segments_table(self):
-        for item in self.segments_table.get_children():
-            self.segments_table.delete(item)
-        
-        for i, seg in enumerate(self.segments):
-            start_str = self.format_time(seg['start'])
-            end_str = self.format_time(seg['end'])
-            self.segments_table.insert("", "end", values=(start_str, end_str))
+        """Atualiza a tabela reaproveitando as linhas existentes"""
+        items = self.segments_table.get_children()
+        for item, seg in zip(items, self.segments):
+            self.segments_table.item(item, values=self.segment_row_values(seg))
+        
+        if len(items) > len(self.segments):
+            self.segments_table.delete(*items[len(self.segments):])
+        for seg in self.segments[len(items):]:
+            self.add_segment_row(seg)
+        self.waveform_panel.set_segments(self.segments)
+    
+    def add_segment_row(self, seg):
+        """Adiciona um segmento recém-detectado ao final da tabela"""
+        self.segments_table.insert("", "end", values=self.segment_row_values(seg))
+        self.waveform_panel.set_segments(self.segments)
+    
+    def segment_row_values(self, seg):
+        """Valores de uma linha: tempos detectados e, se houver índice, os do corte real"""
+        values = (self.format_time(seg['start']), self.format_time(seg['end']))
+        if self.keyframe_index is None:
+            return values + ("-", "-")
+        snapped = self.keyframe_index.snap_segment(seg)
+        return values + (self.format_time(snapped['start'], precise=True),
+                         self.format_time(snapped['end'], precise=True))
     
-    def format_time(self, seconds):
+    def format_time(self, seconds, precise=False):
+        if precise:
+            # Décimos de segundo: os quadros-chave raramente caem em segundos inteiros
+            whole = int(seconds)
+            return f"{timedelta(seconds=whole)}.{int((seconds - whole) * 10)}"
         return str(timedelta(seconds=round(seconds)))
     
     def export_selected(self):
@@ -355,7 +798,8 @@ class MusicExtractorApp:
         selected_indices = [self.segments_table.index(item) for item in self.segments_table.selection()]
         if not selected_indices:
             messagebox.showinfo("Exportar", "Nenhum segmento selecionado. Exportando todos.")
-            selected_segments = self.segments
+            # Cópia: a detecção pode continuar acrescentando segmentos
+            selected_segments = list(self.segments)
         else:
             selected_segments = [self.segments[i] for i in selected_indices]
         
@@ -364,49 +808,141 @@ class MusicExtractorApp:
             return
         
         self.status_var.set("Exportando segmentos...")
+        self.cancel_event = threading.Event()
         self.show_progress()  # Mostra a barra de progresso
         
         threading.Thread(
             target=self.run_export, 
-            args=(self.video_path, output_dir, selected_segments),
+            args=(self.video_path, output_dir, selected_segments, self.cancel_event),
             daemon=True
         ).start()
     
-    def run_export(self, video_path, output_dir, segments):
+    def run_export(self, video_path, output_dir, segments, cancel_event):
+        # Roda fora da thread do Tk: toda alteração na interface passa por post/post_progress
+        from video_operations import OperationCancelled
+        
         try:
             from main import export_segments
             
             # Configurar acompanhamento de progresso
             total_segments = len(segments)
+            total_duration = sum(seg['end'] - seg['start'] for seg in segments) or 1
+            completed = set()
+            segment_fractions = {}
+            progress_lock = threading.Lock()
             
-            def export_progress(current_segment, segment_progress):
-                segment_pct = (current_segment / total_segments * 100)
-                overall_progress = segment_pct
-                status = f"Exportando segmento {current_segment+1} de {total_segments}"
-                self.update_progress(overall_progress, status)
+            def export_progress(current_segment, segment_progress, speed=None):
+                # Os segmentos são exportados em paralelo: soma o andamento de cada um,
+                # ponderado pela duração
+                with progress_lock:
+                    if segment_progress >= 100:
+                        completed.add(current_segment)
+                    segment_fractions[current_segment] = segment_progress / 100
+                    done = sum((segments[i]['end'] - segments[i]['start']) * fraction
+                               for i, fraction in segment_fractions.items())
+                    overall_progress = min(100, done / total_duration * 100)
+                    status = (f"Exportando segmentos ({len(completed)} de {total_segments} concluídos)"
+                              f"{self.progress_details(overall_progress, speed, total_duration)}")
+                    self.post_progress(overall_progress, status)
             
-            # Chamar a exportação com callback de progresso
-            export_segments(video_path, output_dir, segments, progress_callback=export_progress)
+            # Chamar a exportação com callback de progresso (no servidor, se configurado)
+            if SERVER_PARAMS["url"]:
+                from server import JobClient
+                JobClient().export(video_path, output_dir, segments, on_progress=export_progress,
+                                   cancel_event=cancel_event)
+            else:
+                export_segments(video_path, output_dir, segments, progress_callback=export_progress,
+                                cancel_event=cancel_event)
             
-            self.update_progress(100, "Exportação concluída!")
-            self.status_var.set(f"{len(segments)} segmentos exportados com sucesso!")
-            messagebox.showinfo("Sucesso", f"{len(segments)} segmentos exportados para:\n{output_dir}")
+            self.post_progress(100, "Exportação concluída!")
+            self.post(self.status_var.set, f"{len(segments)} segmentos exportados com sucesso!")
+            self.post(messagebox.showinfo, "Sucesso",
+                      f"{len(segments)} segmentos exportados para:\n{output_dir}")
+        except OperationCancelled:
+            self.post(self.status_var.set, "Exportação cancelada")
         except Exception as e:
-            self.status_var.set("Erro durante a exportação")
-            messagebox.showerror("Erro", str(e))
+            self.post(self.status_var.set, "Erro durante a exportação")
+            self.post(messagebox.showerror, "Erro", str(e))
         finally:
-            self.hide_progress()  # Esconde a barra ao finalizar
+            self.post(self.hide_progress)  # Esconde a barra ao finalizar
+    
+    def current_detection_params(self):
+        """Parâmetros de detecção configurados pelo usuário"""
+        return {
+            "threshold": self.threshold_var.get(),
+            "min_silence_len": self.silence_len_var.get(),
+            "padding_before": self.padding_before_var.get(),
+            "padding_after": self.padding_after_var.get(),
+            "min_segment_duration": self.min_duration_var.get() * 1000,
+            "classify": self.classify_var.get(),
+            "music_threshold": self.music_threshold_var.get() / 100
+        }
+    
+    def schedule_preview(self, *args):
+        """Agenda a resegmentação do envelope em memória (com debounce)"""
+        if self.envelope is None or not self.live_preview_var.get():
+            return
+        if self._preview_after_id:
+            self.root.after_cancel(self._preview_after_id)
+        self._preview_after_id = self.root.after(PREVIEW_DEBOUNCE_MS, self.start_preview)
+    
+    def start_preview(self):
+        """Dispara a resegmentação fora da thread do Tk (uma por vez)"""
+        self._preview_after_id = None
+        if self.envelope is None:
+            return
+        if self._preview_running:
+            # Recalcula de novo quando a execução atual terminar
+            self._preview_pending = True
+            return
+        
+        self._preview_running = True
+        threading.Thread(
+            target=self.run_preview,
+            args=(self.envelope, self.envelope_cumulative, self.features, self.current_detection_params()),
+            daemon=True
+        ).start()
+    
+    def run_preview(self, envelope, cumulative, features, detection_params):
+        from music_detection import segment_envelope
+        from classifier import pop_classifier_params, refine_segments
+        
+        start = time.perf_counter()
+        try:
+            # Sem características (detecção feita sem o classificador) só a segmentação é refeita
+            classifier_params = pop_classifier_params(detection_params)
+            segments = segment_envelope(envelope, cumulative=cumulative, **detection_params)
+            segments = refine_segments(segments, features,
+                                       min_segment_duration=detection_params["min_segment_duration"],
+                                       **classifier_params)
+            error = None
+        except Exception as e:
+            segments, error = None, e
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.post(self.finish_preview, envelope, segments, elapsed_ms, error)
+    
+    def finish_preview(self, envelope, segments, elapsed_ms, error):
+        self._preview_running = False
+        if self._preview_pending:
+            self._preview_pending = False
+            self.start_preview()
+        
+        # Ignora resultados de um envelope que já foi substituído
+        if envelope is not self.envelope:
+            return
+        if error:
+            self.status_var.set(f"Erro na pré-visualização: {error}")
+            return
+        
+        self.segments = segments
+        self.update_segments_table()
+        self.export_btn.config(state=tk.NORMAL if segments else tk.DISABLED)
+        self.status_var.set(f"{len(segments)} segmentos detectados (recalculado em {elapsed_ms:.0f} ms)")
     
     def apply_config(self):
         """Aplica as configurações atuais e salva"""
         updated_config = {
-            "detection": {
-                "threshold": self.threshold_var.get(),
-                "min_silence_len": self.silence_len_var.get(),
-                "padding_before": self.padding_before_var.get(),
-                "padding_after": self.padding_after_var.get(),
-                "min_segment_duration": self.min_duration_var.get() * 1000
-            }
+            "detection": self.current_detection_params()
         }
         
         save_config(updated_config)
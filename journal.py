@@ -0,0 +1,186 @@
+"""
+Diário de trabalhos (JSON-lines) para retomar exportações e detecções interrompidas.
+
+Cada evento é uma linha acrescentada ao arquivo (com fsync), então uma queda
+perde no máximo a linha que estava sendo escrita. Ao abrir, o estado é
+reconstruído lendo todas as linhas:
+
+    {"event": "detected", "key": ..., "source": ..., "segments": [...]}
+    {"event": "planned", "key": ..., "index": 3, "start": ..., "end": ..., "output": ...}
+    {"event": "done", "key": ..., "output": ..., "size": ..., "duration": ...}
+
+As chaves incluem a identidade do arquivo de origem (analysis_cache.file_fingerprint)
+e os parâmetros usados, então mudar o vídeo ou a configuração invalida os
+registros antigos em vez de reaproveitá-los.
+"""
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from analysis_cache import file_fingerprint
+from config import DETECTION_PARAMS, AUDIO_EXTRACTION_PARAMS, EXPORT_PARAMS
+
+# Parâmetros de exportação que alteram o conteúdo dos arquivos gerados
+_EXPORT_PARAM_KEYS = ("format", "copy_codec", "auto_copy_max_gop", "smart_render", "smart_render_crf",
+                      "snap_to_keyframes")
+
+# Diferença aceita entre a duração do arquivo exportado e a do segmento (s);
+# cortes com cópia de codec podem variar até o quadro-chave mais próximo
+DURATION_TOLERANCE = 1.0
+
+def journal_path(directory, video_path, name=None):
+    """Caminho do diário de um vídeo dentro de directory (name: padrão, o nome do vídeo sem extensão)."""
+    base_name = name or os.path.splitext(os.path.basename(video_path))[0]
+    return os.path.join(directory, f"{base_name}.journal.jsonl")
+
+def _digest(payload):
+    return hashlib.sha1(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+def detection_key(fingerprint):
+    """Chave da detecção de um arquivo com os parâmetros de detecção e extração atuais."""
+    return _digest([fingerprint, dict(DETECTION_PARAMS), dict(AUDIO_EXTRACTION_PARAMS)])
+
+def segment_key(fingerprint, seg, output_path):
+    """Chave da exportação de um segmento para output_path com os parâmetros atuais."""
+    params = {k: EXPORT_PARAMS[k] for k in _EXPORT_PARAM_KEYS}
+    return _digest([fingerprint, round(seg['start'], 6), round(seg['end'], 6),
+                    os.path.abspath(output_path), params])
+
+def probe_output(output_path):
+    """Tamanho (bytes) e duração (s, via ffprobe) de um arquivo exportado, ou None se ilegível."""
+    from video_operations import get_media_duration
+
+    try:
+        size = os.path.getsize(output_path)
+        duration = get_media_duration(output_path)
+    except Exception:
+        return None
+    if not size or not duration:
+        return None
+    return size, duration
+
+class JobJournal:
+    """Registro persistente das detecções e dos segmentos exportados de um vídeo."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._detections = {}  # chave -> segmentos
+        self._done = {}  # chave -> evento "done"
+        self._load()
+
+    def _load(self):
+        try:
+            f = open(self.path, encoding="utf-8")
+        except FileNotFoundError:
+            return
+        with f:
+            for line_number, line in enumerate(f, 1):
+                try:
+                    self._apply(json.loads(line))
+                except (ValueError, KeyError):
+                    # Normalmente a última linha, incompleta, de uma execução interrompida
+                    logging.warning(f"Linha {line_number} inválida no diário {self.path}, ignorando")
+
+    def _apply(self, entry):
+        event = entry["event"]
+        if event == "detected":
+            self._detections[entry["key"]] = entry["segments"]
+        elif event == "planned":
+            # Um segmento replanejado só volta a contar como feito após um novo "done"
+            self._done.pop(entry["key"], None)
+        elif event == "done":
+            self._done[entry["key"]] = entry
+
+    def _append(self, event, **fields):
+        entry = {"event": event, "time": time.time(), **fields}
+        line = json.dumps(entry, ensure_ascii=False)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._apply(entry)
+
+    def detection(self, fingerprint):
+        """Segmentos de uma detecção já concluída com os parâmetros atuais, ou None."""
+        with self._lock:
+            return self._detections.get(detection_key(fingerprint))
+
+    def record_detection(self, fingerprint, video_path, segments):
+        self._append("detected", key=detection_key(fingerprint),
+                     source=os.path.abspath(video_path), segments=list(segments))
+
+    def record_planned(self, key, index, seg, output_path):
+        self._append("planned", key=key, index=index, start=seg['start'], end=seg['end'],
+                     output=os.path.abspath(output_path))
+
+    def is_exported(self, key, output_path):
+        """True se o segmento já foi exportado e o arquivo continua íntegro.
+
+        Confere se o arquivo existe com o mesmo tamanho e se o ffprobe ainda lê a
+        mesma duração; arquivos ausentes, truncados ou corrompidos são refeitos.
+        """
+        with self._lock:
+            done = self._done.get(key)
+        if done is None or not os.path.exists(output_path):
+            return False
+        probed = probe_output(output_path)
+        return (probed is not None and probed[0] == done["size"]
+                and abs(probed[1] - done["duration"]) < 0.001)
+
+    def record_done(self, key, seg, output_path):
+        """Verifica o arquivo exportado com o ffprobe e o registra como concluído.
+
+        Returns:
+            False se o arquivo estiver ilegível ou com duração muito diferente do
+            segmento (fica sem registro e será refeito na próxima execução)
+        """
+        probed = probe_output(output_path)
+        expected = seg['end'] - seg['start']
+        if probed is None or abs(probed[1] - expected) > max(DURATION_TOLERANCE, 0.05 * expected):
+            found = f"{probed[1]:.2f}s" if probed else "ilegível"
+            logging.warning(f"Verificação falhou para {output_path}: esperado {expected:.2f}s, "
+                            f"encontrado {found}")
+            return False
+        size, duration = probed
+        self._append("done", key=key, output=os.path.abspath(output_path), size=size, duration=duration)
+        return True
+
+def batch_journal(video_path, export_dir=None, manifest_dir=None, output_name=None):
+    """Diário de um vídeo no modo em lote, na pasta de exportação do vídeo (a mesma
+    usada por export_segments) ou, sem exportação, junto do manifesto.
+
+    output_name é o nome de saída do vídeo no lote (ver cli.output_names; padrão:
+    o nome do arquivo sem extensão). Retorna None se EXPORT_PARAMS["journal"]
+    estiver desativado.
+    """
+    if not EXPORT_PARAMS["journal"]:
+        return None
+    output_name = output_name or os.path.splitext(os.path.basename(video_path))[0]
+    if export_dir:
+        directory = os.path.join(export_dir, output_name)
+    elif manifest_dir:
+        directory = os.path.join(manifest_dir, os.path.dirname(output_name))
+    else:
+        directory = os.path.dirname(os.path.abspath(video_path))
+    os.makedirs(directory, exist_ok=True)
+    return JobJournal(journal_path(directory, video_path, os.path.basename(output_name)))
+
+def resume_detection(journal, video_path, detect):
+    """Segmentos registrados no diário para o arquivo e os parâmetros atuais, ou os de
+    detect(video_path), que são então registrados (journal None apenas detecta)."""
+    if journal is None:
+        return detect(video_path)
+
+    fingerprint = file_fingerprint(video_path)
+    segments = journal.detection(fingerprint)
+    if segments is not None:
+        logging.info(f"Detecção retomada do diário: {video_path} ({len(segments)} segmento(s))")
+        return segments
+
+    segments = detect(video_path)
+    journal.record_detection(fingerprint, video_path, segments)
+    return segments
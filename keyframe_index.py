@@ -0,0 +1,114 @@
+"""
+Índice de quadros-chave (keyframes) do vídeo, usado para cortes com cópia de codec previsíveis.
+"""
+import logging
+import tempfile
+import subprocess
+import numpy as np
+from analysis_cache import get_cache, analysis_key
+
+# Versão do formato salvo no cache; mudar invalida os índices antigos
+_INDEX_VERSION = 2
+
+class KeyframeIndex:
+    """Tempos dos quadros-chave, em segundos relativos ao início do arquivo."""
+
+    def __init__(self, times):
+        self.times = np.sort(np.asarray(times, dtype=np.float64))
+
+    def __len__(self):
+        return len(self.times)
+
+    def snap_before(self, t):
+        """Último quadro-chave em ou antes de t (0 se não houver)."""
+        i = np.searchsorted(self.times, t, side="right") - 1
+        return float(self.times[i]) if i >= 0 else 0.0
+
+    def snap_after(self, t):
+        """Primeiro quadro-chave em ou depois de t (o próprio t se não houver)."""
+        i = np.searchsorted(self.times, t, side="left")
+        return float(self.times[i]) if i < len(self.times) else float(t)
+
+    def snap_segment(self, segment):
+        """Ajusta um segmento ao quadro-chave em que um corte com cópia de codec realmente começa.
+
+        O início recua até o quadro-chave anterior, então o corte contém todo o
+        intervalo pedido e o resultado é sempre o mesmo. O fim fica como está: a
+        cópia para no pacote do fim pedido sem precisar de um quadro-chave.
+        """
+        snapped = dict(segment)
+        snapped['start'] = self.snap_before(segment['start'])
+        return snapped
+
+    def to_array(self):
+        return self.times
+
+    @classmethod
+    def from_array(cls, array):
+        return cls(array)
+
+def build_keyframe_index(video_path, stream="v:0"):
+    """Roda o ffprobe uma vez e monta o índice de quadros-chave do stream de vídeo.
+
+    A saída é lida linha a linha e só os quadros-chave são guardados, então a
+    memória não cresce com o número total de pacotes.
+    """
+    command = [
+        "ffprobe", "-v", "error",
+        "-select_streams", stream,
+        "-show_entries", "packet=pts_time,dts_time,flags:format=start_time",
+        "-of", "compact",
+        video_path
+    ]
+    # O stderr vai para um arquivo temporário: com um pipe lido só no fim, um arquivo
+    # danificado com muitos erros encheria o pipe e travaria o ffprobe
+    with tempfile.TemporaryFile() as stderr_file:
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=stderr_file,
+                                   text=True, encoding="utf-8", errors="replace")
+        times, start_time = _read_keyframes(process.stdout)
+        returncode = process.wait()
+        stderr_file.seek(0)
+        stderr = stderr_file.read().decode("utf-8", errors="replace")
+
+    if returncode != 0:
+        logging.error(f"Erro ao indexar quadros-chave: {stderr}")
+        raise RuntimeError(f"ffprobe falhou ao indexar {video_path}: {stderr.strip()}")
+
+    # Tempos relativos ao início do arquivo, como o -ss do ffmpeg e os segmentos detectados
+    # (arredondados ao microssegundo, a precisão impressa pelo ffprobe)
+    return KeyframeIndex(np.round(np.asarray(times, dtype=np.float64) - start_time, 6))
+
+def _read_keyframes(lines):
+    """Tempos dos quadros-chave e start_time do formato na saída compacta do ffprobe."""
+    times = []
+    start_time = 0.0
+    for line in lines:
+        section, _, fields = line.strip().partition("|")
+        values = dict(field.split("=", 1) for field in fields.split("|") if "=" in field)
+        if section == "packet" and "K" in values.get("flags", ""):
+            pts = values.get("pts_time", "N/A")
+            if pts == "N/A":
+                pts = values.get("dts_time", "N/A")
+            if pts == "N/A":
+                continue
+            times.append(float(pts))
+        elif section == "format" and values.get("start_time", "N/A") != "N/A":
+            start_time = float(values["start_time"])
+    return times, start_time
+
+def get_keyframe_index(video_path):
+    """Índice de quadros-chave do vídeo, salvo no cache de análise junto com o envelope."""
+    cache = get_cache()
+    key = analysis_key(video_path, params={"keyframes": "v:0", "version": _INDEX_VERSION}) if cache else None
+    if cache:
+        array = cache.load(key, kind="keyframes")
+        if array is not None:
+            return KeyframeIndex.from_array(array)
+
+    index = build_keyframe_index(video_path)
+    if cache:
+        try:
+            cache.store(key, index.to_array(), kind="keyframes")
+        except OSError as e:
+            logging.warning(f"Erro ao salvar índice de quadros-chave no cache: {str(e)}")
+    return index
@@ -1,22 +1,550 @@
 import os
-from music_detection import detect_music_segments
-from video_operations import extract_audio, cut_video_segment
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 import logging
-from config import DETECTION_PARAMS
+import tracing
+from config import DETECTION_PARAMS, AUDIO_EXTRACTION_PARAMS, EXPORT_PARAMS
+
+# Os módulos de análise (numpy, pydub, ffmpeg-python) são importados dentro das funções
+# que os usam: "python main.py" abre a interface sem esperar por eles, e a interface os
+# carrega em segundo plano (ver gui.WARMUP_MODULES e benchmarks/bench_startup.py)
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO, 
                     format='%(asctime)s - %(levelname)s - %(message)s')
 
-def extract_and_detect(video_path, progress_callback=None, **detection_params):
-    """Função unificada para extração e detecção com tratamento de temp files e callback de progresso"""
+def stage_progress(progress_callback, stage):
+    """Adapta o progresso do ffmpeg/detecção (fração, velocidade) para progress_callback(etapa, %, velocidade)."""
+    if progress_callback is None:
+        return None
+    
+    def report(fraction, speed=None):
+        if fraction is not None:
+            progress_callback(stage, fraction * 100, speed)
+    return report
+
+def extract_envelope(video_path, progress_callback=None, cancel_event=None):
+    """Retorna o envelope de energia por milissegundo do áudio do vídeo.
+    
+    O envelope é salvo no cache de análise, então uma nova detecção do mesmo
+    arquivo (com outros parâmetros) não precisa decodificar o vídeo de novo.
+    progress_callback(fração, velocidade) recebe o progresso do ffmpeg.
+    Na decodificação em um único processo o mínimo/máximo por milissegundo
+    (forma de onda da interface, ver load_peaks) também vai para o cache, assim
+    como, com DETECTION_PARAMS["classify"], as características espectrais do
+    classificador (ver load_features). Quando cancel_event (threading.Event) é
+    sinalizado, o ffmpeg é encerrado e OperationCancelled é lançada.
+    """
+    import numpy as np
+    from music_detection import compute_envelope
+    from classifier import tap_features
+    from video_operations import stream_audio
+    from analysis_cache import get_cache, analysis_key
+    
+    cache = get_cache()
+    key = analysis_key(video_path) if cache else None
+    if cache:
+        envelope = cache.load(key)
+        if envelope is not None:
+            logging.info(f"Envelope carregado do cache: {video_path}")
+            tracing.count("cache_hits")
+            return envelope
+    
+    # Decodifica em blocos e guarda apenas o envelope de energia por milissegundo
+    peaks = cache.writer(key, np.int16, "peaks") if cache else None
+    features = [] if cache and DETECTION_PARAMS["classify"] else None
+    with tracing.span("extract_envelope"):
+        shards = shard_ranges(video_path)
+        try:
+            if len(shards) > 1:
+                features = None  # Calculadas depois, numa passagem própria (ver load_features)
+                envelope = extract_envelope_sharded(video_path, shards, progress_callback, cancel_event)
+            else:
+                blocks = stream_audio(video_path, progress_callback=progress_callback,
+                                      cancel_event=cancel_event)
+                if features is not None:
+                    blocks = tap_features(blocks, features.append)
+                envelope = compute_envelope(
+                    blocks,
+                    on_peaks=(lambda values: peaks.append(values.ravel())) if peaks else None
+                )
+        except BaseException:
+            if peaks:
+                peaks.discard()
+            raise
+    
+    if cache:
+        try:
+            cache.store(key, envelope)
+        except OSError as e:
+            logging.warning(f"Erro ao salvar envelope no cache: {str(e)}")
+        _commit_peaks(peaks)
+        if features is not None:
+            _store_features(cache, key, np.concatenate(features))
+    return envelope
+
+def _commit_peaks(writer):
+    """Publica no cache o mínimo/máximo gravados (se houver algum)."""
+    if not writer.count:
+        writer.discard()
+        return
+    try:
+        writer.commit()
+    except OSError as e:
+        logging.warning(f"Erro ao salvar forma de onda no cache: {str(e)}")
+
+def load_peaks(video_path):
+    """Mínimo e máximo de cada milissegundo salvos no cache junto com o envelope.
+    
+    Returns:
+        Array int16 de forma (n, 2), ou None se não estiver no cache (cache
+        desativado ou envelope calculado em trechos paralelos)
+    """
+    from analysis_cache import get_cache, analysis_key
+    
+    cache = get_cache()
+    peaks = cache.load(analysis_key(video_path), "peaks") if cache else None
+    return peaks.reshape(-1, 2) if peaks is not None else None
+
+def _store_features(cache, key, features):
+    try:
+        cache.store(key, features, kind="features")
+    except OSError as e:
+        logging.warning(f"Erro ao salvar características espectrais no cache: {str(e)}")
+
+def load_features(video_path, progress_callback=None, cancel_event=None):
+    """Características espectrais do classificador (ver classifier.py), do cache ou calculadas.
+    
+    Normalmente já estão no cache, gravadas na mesma decodificação do envelope;
+    senão (cache desativado, envelope em trechos paralelos ou detecção pelo
+    ffmpeg) o áudio é decodificado uma vez só para elas.
+    """
+    from classifier import compute_features
+    from video_operations import stream_audio
+    from analysis_cache import get_cache, analysis_key
+    
+    cache = get_cache()
+    key = analysis_key(video_path) if cache else None
+    if cache:
+        features = cache.load(key, "features")
+        if features is not None:
+            return features
+    
+    logging.info(f"Calculando características espectrais: {video_path}")
+    with tracing.span("extract_features"):
+        features = compute_features(stream_audio(video_path, progress_callback=progress_callback,
+                                                 cancel_event=cancel_event))
+    if cache:
+        _store_features(cache, key, features)
+    return features
+
+def classify_segments(video_path, segments, features=None, min_segment_duration=None, cancel_event=None,
+                      **classifier_params):
+    """Apara/divide os segmentos nos trechos de não música (ver classifier.refine_segments).
+    
+    classifier_params (classify, music_threshold, min_non_music_len) sobrescrevem
+    DETECTION_PARAMS; sem classificação os segmentos voltam como estão.
+    """
+    from classifier import refine_segments
+    
+    classify = classifier_params.pop("classify", None)
+    classify = DETECTION_PARAMS["classify"] if classify is None else classify
+    if not classify or not segments:
+        return segments
+    if features is None:
+        features = load_features(video_path, cancel_event=cancel_event)
+    with tracing.span("classify", segments=len(segments)):
+        return refine_segments(segments, features, min_segment_duration=min_segment_duration,
+                               classify=True, **classifier_params)
+
+# Áudio decodificado a mais antes e depois de cada trecho e descartado
+# (aquecimento e descarga do decodificador/resampler)
+SHARD_OVERLAP_MS = 1000
+
+def shard_ranges(video_path, shards=None, min_shard_duration=None):
+    """Divide a linha do tempo em trechos [início, fim) em ms para a decodificação paralela.
+    
+    Retorna [(0, None)] (um único trecho até o fim) quando a divisão está
+    desativada ou o arquivo é curto demais. O último trecho sempre vai até o fim
+    do arquivo, então o áudio além da duração informada pelo contêiner não se perde.
+    """
+    from probe import probe
+    
+    shards = shards or AUDIO_EXTRACTION_PARAMS["shards"]
+    min_shard_duration = min_shard_duration or AUDIO_EXTRACTION_PARAMS["min_shard_duration"]
+    if shards <= 1:
+        return [(0, None)]
+    
+    try:
+        duration = probe(video_path).duration
+    except Exception as e:
+        logging.warning(f"Duração desconhecida, decodificando em um único processo: {str(e)}")
+        return [(0, None)]
+    if duration is None:
+        return [(0, None)]
+    
+    # Divisas em segundos inteiros: caem numa amostra exata em qualquer taxa de
+    # amostragem da origem, então o resampler de cada trecho fica na mesma fase
+    count = max(1, min(shards, int(duration // min_shard_duration)))
+    bounds = [int(duration * i / count) * 1000 for i in range(count)] + [None]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+def decode_envelope_range(video_path, start_ms, end_ms=None, progress_callback=None, cancel_event=None):
+    """Envelope por milissegundo de um trecho [início, fim) do áudio (fim None = até o fim do arquivo).
+    
+    A decodificação começa no segundo inteiro anterior (a divisa cai numa amostra
+    exata em qualquer taxa da origem) e com SHARD_OVERLAP_MS a mais em cada ponta,
+    para o decodificador e o resampler estarem estáveis; as sobras são descartadas
+    e o resultado é igual ao mesmo trecho do envelope do arquivo inteiro.
+    """
+    from music_detection import compute_envelope
+    from video_operations import stream_audio
+    
+    decode_start = max(0, start_ms // 1000 * 1000 - SHARD_OVERLAP_MS)
+    skip = start_ms - decode_start
+    duration = (end_ms - decode_start + SHARD_OVERLAP_MS) / 1000 if end_ms is not None else None
+    
+    envelope = compute_envelope(stream_audio(
+        video_path,
+        start=decode_start / 1000,
+        duration=duration,
+        progress_callback=progress_callback,
+        cancel_event=cancel_event
+    ))
+    return envelope[skip:end_ms - decode_start] if end_ms is not None else envelope[skip:]
+
+def extract_envelope_sharded(video_path, shards, progress_callback=None, cancel_event=None):
+    """Calcula o envelope decodificando os trechos em paralelo, um ffmpeg por trecho.
+    
+    Cada trecho começa e termina em milissegundos exatos e seu envelope é
+    ajustado para ter exatamente fim - início valores, então a concatenação é
+    igual ao envelope do arquivo inteiro. A segmentação roda sobre o envelope
+    completo, e silêncios que atravessam a divisa entre trechos se unem normalmente.
+    
+    Args:
+        shards: Lista de (início, fim) em ms, como retornada por shard_ranges
+        progress_callback: Função opcional (fração, velocidade) com o progresso somado dos trechos
+    """
+    import numpy as np
+    
+    fractions = [0.0] * len(shards)
+    speeds = [None] * len(shards)
+    progress_lock = threading.Lock()
+    
+    def decode(i):
+        def report(fraction, speed=None):
+            with progress_lock:
+                if fraction is not None:
+                    fractions[i] = fraction
+                speeds[i] = speed
+                total_speed = sum(s for s in speeds if s) or None
+                progress_callback(sum(fractions) / len(shards), total_speed)
+        
+        start_ms, end_ms = shards[i]
+        return decode_envelope_range(video_path, start_ms, end_ms, report if progress_callback else None,
+                                     cancel_event)
+    
+    logging.info(f"Decodificando {video_path} em {len(shards)} trechos paralelos")
+    with ThreadPoolExecutor(max_workers=len(shards)) as executor:
+        parts = list(executor.map(decode, range(len(shards))))
+    
+    # Um trecho curto seguido de trechos com áudio (lacuna no stream) é completado com
+    # silêncio para os seguintes continuarem alinhados; no fim do áudio, nada é acrescentado
+    for i, (start_ms, end_ms) in enumerate(shards[:-1]):
+        missing = end_ms - start_ms - len(parts[i])
+        if missing > 0 and any(len(part) for part in parts[i + 1:]):
+            logging.warning(f"Trecho {i+1} terminou {missing} ms antes do esperado")
+            parts[i] = np.concatenate((parts[i], np.zeros(missing, dtype=parts[i].dtype)))
+    return np.concatenate(parts)
+
+def extract_and_detect(video_path, progress_callback=None, cancel_event=None, **detection_params):
+    """Função unificada para extração e detecção com callback de progresso.
+    
+    Por padrão o áudio é lido direto do pipe do ffmpeg em blocos; com
+    AUDIO_EXTRACTION_PARAMS["streaming"] desativado usa um WAV temporário.
+    O backend "ffmpeg" não decodifica nada no Python (ver detect_with_ffmpeg).
+    Com DETECTION_PARAMS["classify"] (ou classify=True) os segmentos passam
+    ainda pelo classificador música/não música (ver classify_segments).
+    Quando cancel_event (threading.Event) é sinalizado, o ffmpeg em andamento é
+    encerrado e OperationCancelled é lançada.
+    """
+    from classifier import pop_classifier_params
+    
+    classifier_params = pop_classifier_params(detection_params)
+    with tracing.span("extract_and_detect"), tracing.profile("detect"):
+        segments = _extract_and_detect(video_path, progress_callback, cancel_event, **detection_params)
+        return classify_segments(video_path, segments,
+                                 min_segment_duration=detection_params.get("min_segment_duration"),
+                                 cancel_event=cancel_event, **classifier_params)
+
+def envelope_detection(video_path, backend=None):
+    """Se a detecção (ver _extract_and_detect) segmenta o envelope completo do arquivo.
+    
+    Vale para o backend "numpy" lendo o áudio do pipe, sem a triagem em dois
+    níveis (ou com o envelope já no cache): extract_envelope seguido de
+    segment_envelope dá o mesmo resultado e permite separar decodificação e
+    detecção (ex.: nas etapas do pipeline.py). Os demais casos só passam por
+    extract_and_detect.
+    """
+    backend = backend or DETECTION_PARAMS["backend"]
+    return (backend == "numpy" and AUDIO_EXTRACTION_PARAMS["streaming"]
+            and not (DETECTION_PARAMS["coarse_to_fine"] and not _envelope_cached(video_path)))
+
+def _extract_and_detect(video_path, progress_callback=None, cancel_event=None, **detection_params):
+    from music_detection import detect_music_segments, segment_envelope
+    from video_operations import stream_audio
+    
+    backend = detection_params.pop("backend", None) or DETECTION_PARAMS["backend"]
+    if backend == "ffmpeg":
+        return detect_with_ffmpeg(video_path, progress_callback, cancel_event=cancel_event, **detection_params)
+    
+    if not AUDIO_EXTRACTION_PARAMS["streaming"]:
+        return _extract_and_detect_temp_file(video_path, progress_callback, cancel_event, backend=backend,
+                                             **detection_params)
+    
+    if progress_callback:
+        progress_callback("extract", 0)
+    
+    if envelope_detection(video_path, backend):
+        envelope = extract_envelope(video_path, stage_progress(progress_callback, "extract"), cancel_event)
+        
+        if progress_callback:
+            progress_callback("extract", 100)
+            progress_callback("detect", 0)
+        
+        segments = segment_envelope(envelope, **detection_params)
+    elif backend == "numpy":
+        segments = detect_coarse_to_fine(video_path, progress_callback, cancel_event=cancel_event,
+                                         **detection_params)
+    else:
+        # Backend de referência: precisa de todo o áudio em memória
+        segments = detect_music_segments(
+            stream_audio(video_path, progress_callback=stage_progress(progress_callback, "extract"),
+                         cancel_event=cancel_event),
+            backend=backend,
+            **detection_params
+        )
+        
+        if progress_callback:
+            progress_callback("extract", 100)
+            progress_callback("detect", 0)
+    
+    if progress_callback:
+        progress_callback("detect", 100)
+        progress_callback("finalize", 0)
+        progress_callback("finalize", 100)
+    
+    return segments
+
+def _envelope_cached(video_path):
+    from analysis_cache import get_cache, analysis_key
+    
+    cache = get_cache()
+    return cache is not None and os.path.exists(cache.path(analysis_key(video_path)))
+
+def detect_coarse_to_fine(video_path, progress_callback=None, threshold=None, min_silence_len=None,
+                          padding_before=None, padding_after=None, min_segment_duration=None,
+                          cancel_event=None):
+    """Detecção em dois níveis (DETECTION_PARAMS["coarse_to_fine"]).
+    
+    O ffmpeg calcula um envelope grosso (uma energia a cada coarse_window_ms) e
+    só os trechos que podem conter silêncio são decodificados em resolução de
+    milissegundo (ver detect_silence_coarse_to_fine). O resultado é o mesmo do
+    backend "numpy", mas o Python só toca nas amostras perto dos silêncios.
+    """
+    from music_detection import detect_silence_coarse_to_fine, segments_from_silence
+    from video_operations import coarse_energy_ffmpeg
+    
+    threshold = threshold if threshold is not None else DETECTION_PARAMS["threshold"]
+    min_silence_len = min_silence_len if min_silence_len is not None else DETECTION_PARAMS["min_silence_len"]
+    window_ms = DETECTION_PARAMS["coarse_window_ms"]
+    
+    coarse, audio_len = coarse_energy_ffmpeg(video_path, window_ms, stage_progress(progress_callback, "extract"),
+                                             cancel_event)
+    if progress_callback:
+        progress_callback("extract", 100)
+        progress_callback("detect", 0)
+    
+    silence_ranges, analysed = detect_silence_coarse_to_fine(
+        coarse, window_ms, audio_len,
+        lambda start, end: decode_envelope_range(video_path, start, end, cancel_event=cancel_event),
+        min_silence_len, threshold, DETECTION_PARAMS["coarse_margin_db"]
+    )
+    logging.info(f"Refinamento: {analysed/1000:.1f}s de {audio_len/1000:.1f}s analisados em resolução total")
+    
+    return segments_from_silence(silence_ranges, audio_len, padding_before, padding_after,
+                                 min_segment_duration)
+
+def detect_with_ffmpeg(video_path, progress_callback=None, threshold=None, min_silence_len=None,
+                       padding_before=None, padding_after=None, min_segment_duration=None,
+                       cancel_event=None):
+    """Detecção com o filtro silencedetect do ffmpeg (backend "ffmpeg").
+    
+    O ffmpeg decodifica e analisa o áudio sozinho e só os intervalos de silêncio
+    chegam ao Python, então a detecção roda na velocidade do decodificador com
+    memória mínima. O silencedetect compara cada amostra com o limiar em vez da
+    energia por janela, então os limites podem diferir alguns milissegundos dos
+    backends "numpy"/"pydub". O threshold precisa ser explícito (não há volume
+    médio para a estimativa automática).
+    """
+    from music_detection import segments_from_silence
+    from video_operations import detect_silence_ffmpeg
+    
+    threshold = threshold if threshold is not None else DETECTION_PARAMS["threshold"]
+    min_silence_len = min_silence_len if min_silence_len is not None else DETECTION_PARAMS["min_silence_len"]
+    
+    if progress_callback:
+        progress_callback("extract", 0)
+        progress_callback("detect", 0)
+    
+    # Extração e detecção acontecem no mesmo processo ffmpeg
+    report = stage_progress(progress_callback, "detect")
+    silence_ranges, audio_len = detect_silence_ffmpeg(video_path, threshold, min_silence_len, report,
+                                                      cancel_event)
+    segments = segments_from_silence(silence_ranges, audio_len, padding_before, padding_after,
+                                     min_segment_duration)
+    
+    if progress_callback:
+        progress_callback("extract", 100)
+        progress_callback("detect", 100)
+        progress_callback("finalize", 0)
+        progress_callback("finalize", 100)
+    
+    return segments
+
+def iter_extract_and_detect(video_path, progress_callback=None, on_envelope=None, cancel_event=None,
+                            on_peaks=None, on_features=None, **detection_params):
+    """Variante em streaming de extract_and_detect: gera cada segmento assim que é confirmado.
+    
+    A memória usada é constante, e o consumidor pode exibir ou exportar os
+    segmentos (ex.: export_segments(video, pasta, iter_extract_and_detect(video)))
+    enquanto a análise ainda está em andamento. on_envelope, se informado,
+    recebe os pedaços do envelope (ex.: para uma pré-visualização ao vivo), e
+    on_peaks, o mínimo/máximo de cada milissegundo (ex.: para a forma de onda).
+    Com o classificador ativo (ver classify_segments) cada segmento já sai
+    aparado/dividido e on_features recebe as características espectrais (ex.:
+    para a pré-visualização reclassificar sem decodificar de novo).
+    Quando cancel_event (threading.Event) é sinalizado, o ffmpeg é encerrado e
+    OperationCancelled é lançada.
+    """
+    import numpy as np
+    from music_detection import iter_music_segments, segment_envelope
+    from video_operations import stream_audio, OperationCancelled
+    from analysis_cache import get_cache, analysis_key
+    from classifier import FeatureArray, pop_classifier_params, tap_features
+    
+    detection_params.pop("backend", None)  # O modo streaming sempre usa o envelope NumPy
+    classifier_params = pop_classifier_params(detection_params)
+    classify = classifier_params.get("classify")
+    classifier_params["classify"] = DETECTION_PARAMS["classify"] if classify is None else classify
+    min_segment_duration = detection_params.get("min_segment_duration")
+    
+    if progress_callback:
+        progress_callback("extract", 0)
+        progress_callback("detect", 0)
+    
+    cache = get_cache()
+    key = analysis_key(video_path) if cache else None
+    envelope = cache.load(key) if cache else None
+    
+    # Com decodificação em trechos paralelos os segmentos só saem com o envelope completo
+    if envelope is None and AUDIO_EXTRACTION_PARAMS["shards"] > 1 and len(shard_ranges(video_path)) > 1:
+        envelope = extract_envelope(video_path, stage_progress(progress_callback, "extract"), cancel_event)
+    
+    if cancel_event is not None and cancel_event.is_set():
+        raise OperationCancelled()
+    
+    if envelope is not None:
+        # Envelope já analisado: a segmentação é instantânea
+        if on_envelope:
+            on_envelope(envelope)
+        if on_peaks:
+            peaks = load_peaks(video_path)
+            if peaks is not None:
+                on_peaks(peaks)
+        features = (load_features(video_path, cancel_event=cancel_event) if classifier_params["classify"]
+                    else None)
+        if features is not None and on_features:
+            on_features(features)
+        yield from classify_segments(video_path, segment_envelope(envelope, **detection_params), features,
+                                     min_segment_duration, cancel_event=cancel_event, **classifier_params)
+    else:
+        # Grava o envelope no cache enquanto detecta, sem mantê-lo em memória
+        writer = cache.writer(key) if cache else None
+        peaks_writer = cache.writer(key, np.int16, "peaks") if cache else None
+        
+        def handle_envelope(energies):
+            if writer:
+                writer.append(energies)
+            if on_envelope:
+                on_envelope(energies)
+        
+        def handle_peaks(peaks):
+            if peaks_writer:
+                peaks_writer.append(peaks.ravel())
+            if on_peaks:
+                on_peaks(peaks)
+        
+        # Características do classificador, calculadas na mesma decodificação (poucos KB por minuto)
+        features = FeatureArray()
+        
+        def handle_features(values):
+            features.append(values)
+            if on_features:
+                on_features(values)
+        
+        try:
+            # Extração e detecção andam juntas: o progresso do ffmpeg vale para as duas
+            report = stage_progress(progress_callback, "extract")
+            blocks = stream_audio(video_path, progress_callback=report, cancel_event=cancel_event)
+            if classifier_params["classify"]:
+                blocks = tap_features(blocks, handle_features)
+            for segment in iter_music_segments(
+                blocks,
+                on_envelope=handle_envelope,
+                on_peaks=handle_peaks,
+                **detection_params
+            ):
+                # O segmento só é confirmado depois do seu fim, então as características já o cobrem
+                if classifier_params["classify"]:
+                    yield from classify_segments(video_path, [segment], features.values,
+                                                 min_segment_duration, cancel_event=cancel_event,
+                                                 **classifier_params)
+                else:
+                    yield segment
+        except BaseException:
+            if writer:
+                writer.discard()
+                peaks_writer.discard()
+            raise
+        if writer:
+            try:
+                writer.commit()
+            except OSError as e:
+                logging.warning(f"Erro ao salvar envelope no cache: {str(e)}")
+            _commit_peaks(peaks_writer)
+            if classifier_params["classify"]:
+                _store_features(cache, key, features.values)
+    
+    if progress_callback:
+        progress_callback("extract", 100)
+        progress_callback("detect", 100)
+        progress_callback("finalize", 0)
+        progress_callback("finalize", 100)
+
+def _extract_and_detect_temp_file(video_path, progress_callback=None, cancel_event=None, **detection_params):
+    """Extração via WAV temporário com tratamento de temp files e callback de progresso"""
+    from music_detection import detect_music_segments
+    from video_operations import extract_audio
+    
     audio_path = None
     try:
         # Reportar início da extração
         if progress_callback:
             progress_callback("extract", 0)
             
-        audio_path = extract_audio(video_path)
+        audio_path = extract_audio(video_path, progress_callback=stage_progress(progress_callback, "extract"),
+                                   cancel_event=cancel_event)
         
         # Reportar conclusão da extração e início da detecção
         if progress_callback:
@@ -24,7 +552,11 @@ def extract_and_detect(video_path, progress_callback=None, **detection_params):
             progress_callback("detect", 0)
         
         # Permite sobrescrever parâmetros específicos, mantendo os padrões para o resto
-        segments = detect_music_segments(audio_path, **detection_params)
+        segments = detect_music_segments(
+            audio_path,
+            progress_callback=stage_progress(progress_callback, "detect"),
+            **detection_params
+        )
         
         # Reportar finalização
         if progress_callback:
@@ -41,32 +573,280 @@ def extract_and_detect(video_path, progress_callback=None, **detection_params):
             except Exception as e:
                 logging.warning(f"Erro ao remover temp file: {str(e)}")
 
-def export_segments(video_path, output_dir, segments, progress_callback=None):
-    """Exporta segmentos de vídeo com suporte a acompanhamento de progresso"""
+class ExportError(Exception):
+    """Falha em um ou mais segmentos de uma exportação que continuou após erros."""
+    
+    def __init__(self, errors):
+        self.errors = errors  # Lista de (índice do segmento, exceção)
+        details = "; ".join(f"parte {i+1}: {e}" for i, e in errors)
+        super().__init__(f"{len(errors)} segmento(s) falharam na exportação: {details}")
+
+def default_export_workers(copy_codec=None):
+    """Concorrência padrão da exportação.
+    
+    Com cópia de codec cada ffmpeg só lê e escreve dados, então o limite é o
+    disco: alguns processos simultâneos bastam para manter a fila de I/O cheia.
+    Recodificando, cada ffmpeg já usa várias threads, então poucos processos
+    bastam para ocupar os núcleos.
+    """
+    copy_codec = EXPORT_PARAMS["copy_codec"] if copy_codec is None else copy_codec
+    cpus = os.cpu_count() or 1
+    if copy_codec:
+        return max(1, min(4, cpus))
+    return max(1, min(2, cpus // 4))
+
+def keyframe_index_for_export(video_path, mode=None, snap=None):
+    """Índice de quadros-chave usado para ajustar os cortes, ou None se o ajuste não se aplica.
+    
+    O ajuste só vale para cópia de codec (mode, padrão video_operations.export_mode)
+    com EXPORT_PARAMS["snap_to_keyframes"] (ou snap=True; a renderização inteligente
+    já corta no quadro exato); se o ffprobe falhar, a exportação segue sem ajuste.
+    """
+    from keyframe_index import get_keyframe_index
+    from video_operations import export_mode
+    
+    snap = EXPORT_PARAMS["snap_to_keyframes"] if snap is None else snap
+    if not snap or (mode or export_mode(video_path)) != "copy":
+        return None
+    try:
+        return get_keyframe_index(video_path)
+    except Exception as e:
+        logging.warning(f"Índice de quadros-chave indisponível, cortes sem ajuste: {str(e)}")
+        return None
+
+def export_segments(video_path, output_dir, segments, progress_callback=None,
+                    workers=None, stop_on_error=None, cancel_event=None, journal=None):
+    """Exporta segmentos de vídeo com suporte a acompanhamento de progresso
+    
+    Os cortes rodam em paralelo com até `workers` processos ffmpeg
+    (padrão: EXPORT_PARAMS["workers"]). progress_callback(i, 0) e
+    progress_callback(i, 100) são chamados no início e no fim de cada segmento,
+    e progress_callback(i, %, velocidade) com o progresso real do ffmpeg entre
+    eles, possivelmente fora de ordem e a partir de outras threads. Com cópia de codec
+    os limites são ajustados aos quadros-chave (ver keyframe_index_for_export).
+    
+    segments pode ser uma lista ou um gerador (ex.: iter_extract_and_detect).
+    
+    Quando cancel_event (threading.Event) é sinalizado, nenhum novo corte é
+    iniciado, os ffmpeg em andamento são encerrados, os arquivos incompletos são
+    removidos e OperationCancelled é lançada.
+    
+    Com EXPORT_PARAMS["journal"] (ou um JobJournal em journal), cada segmento
+    planejado e cada arquivo concluído (verificado com ffprobe) é registrado;
+    numa nova execução, os arquivos já exportados e íntegros são pulados.
+    
+    Returns:
+        Lista com os caminhos dos arquivos exportados, na ordem dos segmentos
+    """
+    import ffmpeg
+    from video_operations import cut_video_segment, export_mode, OperationCancelled
+    from analysis_cache import file_fingerprint
+    from journal import JobJournal, journal_path, segment_key
+    
     base_name = os.path.splitext(os.path.basename(video_path))[0]
+    # Cópia, renderização inteligente ou recodificação (com copy_codec "auto", conforme a origem)
+    mode = export_mode(video_path)
+    if EXPORT_PARAMS["copy_codec"] == "auto":
+        logging.info(f"Modo de exportação escolhido para {video_path}: {mode}")
+    workers = workers or EXPORT_PARAMS["workers"] or default_export_workers(mode == "copy")
+    stop_on_error = EXPORT_PARAMS["stop_on_error"] if stop_on_error is None else stop_on_error
+    if journal is None and EXPORT_PARAMS["journal"]:
+        journal = JobJournal(journal_path(output_dir, video_path))
+    fingerprint = file_fingerprint(video_path) if journal else None
     
-    for i, seg in enumerate(segments):
+    def segment_output_path(i):
+        return os.path.join(
+            output_dir, 
+            f"{base_name}_part{i+1}.mp4"
+        )
+    
+    def cancelled():
+        return cancel_event is not None and cancel_event.is_set()
+    
+    if cancelled():
+        raise OperationCancelled()
+    
+    # A passagem única não combina com a renderização inteligente (várias etapas por segmento)
+    single_pass = EXPORT_PARAMS["single_pass"] and mode != "smart"
+    
+    # Ajusta os limites aos quadros-chave para cortes determinísticos. Na passagem única
+    # com cópia o ajuste é obrigatório: o -ss de saída começa o vídeo no quadro-chave
+    # seguinte e o áudio no próprio -ss, e só com inícios em quadros-chave as faixas
+    # ficam alinhadas
+    keyframes = keyframe_index_for_export(video_path, mode, snap=True if single_pass else None)
+    if single_pass and mode == "copy" and keyframes is None:
+        logging.warning("Sem índice de quadros-chave; cortando segmento a segmento em vez da passagem única")
+        single_pass = False
+    if keyframes is not None:
+        segments = (keyframes.snap_segment(seg) for seg in segments)
+    
+    if single_pass:
+        segments = list(segments)
+        try:
+            return _export_single_pass(video_path, segments, segment_output_path, progress_callback,
+                                       journal, fingerprint, mode, cancel_event)
+        except ffmpeg.Error:
+            logging.warning("Exportação em passagem única falhou; cortando segmento a segmento")
+    
+    def segment_progress(i):
+        def report(fraction, speed=None):
+            if fraction is not None:
+                progress_callback(i, fraction * 100, speed)
+        return report
+    
+    def export_one(i, seg):
         # Reportar progresso
         if progress_callback:
             progress_callback(i, 0)
             
-        output_path = os.path.join(
-            output_dir, 
-            f"{base_name}_part{i+1}.mp4"
-        )
+        output_path = segment_output_path(i)
         
-        cut_video_segment(
-            video_path,
-            output_path,
-            seg['start'],
-            seg['end']
-        )
+        key = segment_key(fingerprint, seg, output_path) if journal else None
+        if journal:
+            if journal.is_exported(key, output_path):
+                logging.info(f"Parte {i+1} já exportada, pulando: {output_path}")
+                tracing.count("segments_skipped")
+                if progress_callback:
+                    progress_callback(i, 100)
+                return output_path
+            journal.record_planned(key, i, seg, output_path)
+        
+        with tracing.span("export_segment", index=i, duration=seg['end'] - seg['start']):
+            try:
+                cut_video_segment(
+                    video_path,
+                    output_path,
+                    seg['start'],
+                    seg['end'],
+                    progress_callback=segment_progress(i) if progress_callback else None,
+                    cancel_event=cancel_event,
+                    mode=mode
+                )
+            except OperationCancelled:
+                # Não deixa um arquivo cortado pela metade na pasta de saída
+                if os.path.exists(output_path):
+                    os.remove(output_path)
+                raise
+        
+        if journal:
+            journal.record_done(key, seg, output_path)
         
         # Reportar conclusão deste segmento
         if progress_callback:
             progress_callback(i, 100)
+        return output_path
+    
+    outputs = {}
+    errors = []
+    
+    def collect(done):
+        for future in done:
+            i = running.pop(future)
+            try:
+                outputs[i] = future.result()
+            except OperationCancelled:
+                pass
+            except Exception as e:
+                logging.error(f"Erro ao exportar parte {i+1}: {str(e)}")
+                errors.append((i, e))
+    
+    running = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # Submete aos poucos para consumir geradores de segmentos sob demanda
+        for i, seg in enumerate(segments):
+            if len(running) >= workers:
+                collect(wait(running, return_when=FIRST_COMPLETED).done)
+            if (errors and stop_on_error) or cancelled():
+                break
+            running[executor.submit(export_one, i, seg)] = i
+        collect(wait(running).done)
+    
+    if cancelled():
+        raise OperationCancelled()
+    
+    if errors:
+        errors.sort(key=lambda error: error[0])
+        if stop_on_error:
+            raise errors[0][1]
+        raise ExportError(errors)
+    
+    return [outputs[i] for i in sorted(outputs)]
+
+def _export_single_pass(video_path, segments, segment_output_path, progress_callback=None,
+                        journal=None, fingerprint=None, mode=None, cancel_event=None):
+    """Exporta todos os segmentos com uma execução do ffmpeg (ver cut_video_segments)
+    
+    O progresso de cada segmento sai da posição de leitura do ffmpeg em relação
+    ao seu início e fim. Com cancel_event sinalizado, o ffmpeg é encerrado, as
+    partes incompletas são removidas e OperationCancelled é lançada.
+    """
+    from video_operations import cut_video_segments, OperationCancelled
+    from journal import segment_key
+    
+    if not segments:
+        return []
+    
+    if progress_callback:
+        for i in range(len(segments)):
+            progress_callback(i, 0)
+    
+    outputs = [segment_output_path(i) for i in range(len(segments))]
+    keys = [segment_key(fingerprint, seg, output_path) if journal else None
+            for seg, output_path in zip(segments, outputs)]
+    
+    # Só os segmentos que ainda não estão exportados (e íntegros) entram no ffmpeg
+    pending = [i for i in range(len(segments))
+               if not (journal and journal.is_exported(keys[i], outputs[i]))]
+    if len(pending) < len(segments):
+        logging.info(f"{len(segments) - len(pending)} parte(s) já exportada(s), pulando")
+    
+    if pending:
+        if journal:
+            for i in pending:
+                journal.record_planned(keys[i], i, segments[i], outputs[i])
+        last_end = max(segments[i]['end'] for i in pending)
+        reported = dict.fromkeys(pending, 0)
+        
+        def report(fraction, speed=None):
+            if fraction is None:
+                return
+            position = fraction * last_end
+            for i in pending:
+                seg = segments[i]
+                pct = min(100, max(0, (position - seg['start']) / (seg['end'] - seg['start']) * 100))
+                if pct > reported[i]:
+                    reported[i] = pct
+                    progress_callback(i, pct, speed)
+        
+        try:
+            cut_video_segments(video_path, [(outputs[i], segments[i]['start'], segments[i]['end'])
+                                            for i in pending], mode,
+                               progress_callback=report if progress_callback else None,
+                               cancel_event=cancel_event)
+        except OperationCancelled:
+            # Não deixa arquivos cortados pela metade na pasta de saída
+            for i in pending:
+                if os.path.exists(outputs[i]):
+                    os.remove(outputs[i])
+            raise
+        if journal:
+            for i in pending:
+                journal.record_done(keys[i], segments[i], outputs[i])
+    
+    if progress_callback:
+        for i in range(len(segments)):
+            progress_callback(i, 100)
+    
+    return outputs
 
 if __name__ == '__main__':
+    import sys
+    
+    # Com argumentos, roda em lote pela linha de comando (ver cli.py); sem, abre a interface
+    if len(sys.argv) > 1:
+        from cli import main as cli_main
+        sys.exit(cli_main())
+    
     import tkinter as tk
     from gui import MusicExtractorApp
     root = tk.Tk()
@@ -2,75 +2,598 @@ import numpy as np
 from pydub import AudioSegment, silence
 import logging
 import os
-from config import DETECTION_PARAMS
+import tracing
+from config import DETECTION_PARAMS, AUDIO_EXTRACTION_PARAMS
 
-def detect_music_segments(audio_path, threshold=None, min_silence_len=None, 
-                          padding_before=None, padding_after=None, min_segment_duration=None):
+# Amplitude máxima de PCM 16 bits (mesma referência de dBFS usada pelo pydub)
+MAX_AMPLITUDE = 32768
+
+class EnvelopeBuilder:
+    """Converte blocos PCM s16le na energia média (média dos quadrados) de cada milissegundo.
+
+    Só o resto de um milissegundo incompleto é guardado entre blocos, então os
+    blocos podem vir de um pipe sem que o áudio inteiro fique em memória.
+    on_peaks, se informado, recebe também a amostra mínima e a máxima de cada
+    milissegundo (array int16 de forma (n, 2)), usadas na forma de onda da interface.
+    """
+
+    def __init__(self, sample_rate=None, channels=None, on_peaks=None):
+        self.sample_rate = sample_rate or AUDIO_EXTRACTION_PARAMS["sample_rate"]
+        self.channels = channels or AUDIO_EXTRACTION_PARAMS["audio_channels"]
+        if self.sample_rate % 1000:
+            raise ValueError(f"Taxa de amostragem deve ser múltipla de 1000 Hz: {self.sample_rate}")
+
+        # Amostras (de todos os canais) que formam um milissegundo
+        self.samples_per_ms = self.sample_rate // 1000 * self.channels
+        self._remainder = np.empty(0, dtype=np.int16)
+        self._ms_count = 0  # Milissegundos completos já entregues
+        self.on_peaks = on_peaks
+
+    def push(self, block):
+        """Adiciona um bloco e retorna a energia dos milissegundos completados por ele."""
+        samples = np.asarray(block, dtype=np.int16)
+        tracing.count("samples_processed", len(samples))
+        if len(self._remainder):
+            samples = np.concatenate((self._remainder, samples))
+
+        n_ms = len(samples) // self.samples_per_ms
+        used = n_ms * self.samples_per_ms
+        self._remainder = samples[used:].copy()
+        self._ms_count += n_ms
+
+        frames = samples[:used].reshape(n_ms, self.samples_per_ms)
+        if self.on_peaks:
+            self.on_peaks(np.stack((frames.min(axis=1), frames.max(axis=1)), axis=1))
+        frames = frames.astype(np.float64)
+        return (np.einsum("ij,ij->i", frames, frames) / self.samples_per_ms).astype(np.float32)
+
+    def flush(self):
+        """Retorna o último milissegundo incompleto, completado com silêncio como no pydub."""
+        remainder, self._remainder = self._remainder, np.empty(0, dtype=np.int16)
+        # Mesma duração do pydub (len(AudioSegment)): round() do Python, que leva o
+        # meio milissegundo exato para o número par
+        frames = self._ms_count * (self.samples_per_ms // self.channels) + len(remainder) // self.channels
+        if round(1000 * (frames / self.sample_rate)) <= self._ms_count:
+            return np.empty(0, dtype=np.float32)
+        self._ms_count += 1
+        if self.on_peaks:
+            self.on_peaks(np.array([[min(remainder.min(), 0), max(remainder.max(), 0)]], dtype=np.int16))
+        tail = remainder.astype(np.float64)
+        return np.array([np.dot(tail, tail) / self.samples_per_ms], dtype=np.float32)
+
+def compute_envelope(blocks, sample_rate=None, channels=None, progress_callback=None, total_ms=None,
+                     on_peaks=None):
+    """Calcula o envelope de energia por milissegundo a partir de blocos PCM s16le.
+
+    Args:
+        blocks: Iterável de arrays int16 (ex.: video_operations.stream_audio)
+        sample_rate: Taxa de amostragem dos blocos (padrão: AUDIO_EXTRACTION_PARAMS)
+        channels: Número de canais intercalados (padrão: AUDIO_EXTRACTION_PARAMS)
+        progress_callback: Função opcional chamada com a fração (0 a 1) do áudio já processada
+        total_ms: Duração total do áudio em ms, necessária para o progresso parcial
+        on_peaks: Função opcional chamada com o mínimo e o máximo de cada milissegundo
+            (ver EnvelopeBuilder)
+    """
+    builder = EnvelopeBuilder(sample_rate, channels, on_peaks)
+    parts = []
+    processed_ms = 0
+    with tracing.span("envelope"):
+        for block in blocks:
+            parts.append(builder.push(block))
+            processed_ms += len(parts[-1])
+            if progress_callback and total_ms:
+                progress_callback(min(1.0, processed_ms / total_ms))
+        parts.append(builder.flush())
+    if progress_callback:
+        progress_callback(1.0)
+    return np.concatenate(parts)
+
+def cumulative_energy(envelope):
+    """Soma acumulada do envelope (float64, começando em zero).
+
+    É a parte cara da segmentação e não depende dos parâmetros, então pode ser
+    calculada uma vez e reaproveitada a cada nova segmentação do mesmo envelope.
+    """
+    cumulative = np.empty(len(envelope) + 1, dtype=np.float64)
+    cumulative[0] = 0.0
+    np.cumsum(envelope, dtype=np.float64, out=cumulative[1:])
+    return cumulative
+
+def _silent_energy_limit(silence_thresh, min_silence_len):
+    """Soma de energia abaixo da qual uma janela é silenciosa.
+
+    Mesma conversão do pydub (dBFS -> amplitude, comparada com o RMS truncado
+    para inteiro): floor(sqrt(e)) <= limiar  <=>  e < (floor(limiar) + 1) ** 2
+    """
+    amplitude = 10 ** (silence_thresh / 20) * MAX_AMPLITUDE
+    return (np.floor(amplitude) + 1) ** 2 * min_silence_len
+
+def detect_silence_envelope(envelope, min_silence_len, silence_thresh, cumulative=None):
+    """Equivalente de pydub.silence.detect_silence operando sobre o envelope por milissegundo.
+
+    Retorna a lista de intervalos [início, fim] de silêncio em milissegundos.
+    cumulative pode trazer o resultado de cumulative_energy(envelope) já calculado.
+    """
+    seg_len = len(envelope)
+    if seg_len < min_silence_len:
+        return []
+
+    # Energia de cada janela de min_silence_len ms (uma janela por milissegundo)
+    if cumulative is None:
+        cumulative = cumulative_energy(envelope)
+    window_energy = cumulative[min_silence_len:] - cumulative[:-min_silence_len]
+
+    silence_starts = np.flatnonzero(window_energy < _silent_energy_limit(silence_thresh, min_silence_len))
+    if not len(silence_starts):
+        return []
+
+    # Janelas silenciosas que se sobrepõem ou se tocam formam um único intervalo
+    breaks = np.flatnonzero(np.diff(silence_starts) > min_silence_len)
+    range_starts = silence_starts[np.concatenate(([0], breaks + 1))]
+    range_ends = silence_starts[np.concatenate((breaks, [len(silence_starts) - 1]))] + min_silence_len
+
+    return [[int(start), int(end)] for start, end in zip(range_starts, range_ends)]
+
+def detect_silence_coarse_to_fine(coarse, window_ms, audio_len, read_range, min_silence_len,
+                                  silence_thresh, margin_db=0.5):
+    """Detecção de silêncio em dois níveis com o mesmo resultado de detect_silence_envelope.
+
+    Toda janela silenciosa de min_silence_len ms contém por inteiro pelo menos
+    k = min_silence_len // window_ms - 1 janelas grossas, e a energia dessas k
+    janelas não passa da energia da janela silenciosa. Então só sequências de k
+    janelas grossas abaixo do limite (com margin_db de folga para diferenças de
+    arredondamento) podem conter silêncio, e só os trechos ao redor delas são
+    analisados em resolução de milissegundo.
+
+    Args:
+        coarse: Energia média de cada janela de window_ms (ver coarse_energy_ffmpeg)
+        window_ms: Duração de cada janela grossa em ms
+        audio_len: Duração do áudio em ms
+        read_range: Função (início, fim) -> envelope por milissegundo desse trecho
+        min_silence_len: Duração mínima de silêncio em ms
+        silence_thresh: Limiar de silêncio em dBFS
+        margin_db: Folga do limiar usada na triagem grossa
+
+    Returns:
+        Tupla (intervalos de silêncio [início, fim] em ms, milissegundos analisados em resolução total)
+    """
+    k = min_silence_len // window_ms - 1
+    if k < 1:
+        # Silêncio mínimo curto demais para a triagem: analisa tudo
+        envelope = read_range(0, audio_len)
+        return detect_silence_envelope(envelope, min_silence_len, silence_thresh), audio_len
+
+    limit = _silent_energy_limit(silence_thresh, min_silence_len) * 10 ** (margin_db / 10)
+    cumulative = cumulative_energy(np.asarray(coarse, dtype=np.float64) * window_ms)
+    candidates = np.flatnonzero(cumulative[k:] - cumulative[:-k] < limit)
+
+    # Uma janela silenciosa que contém as janelas grossas b..b+k-1 está dentro de
+    # [window_ms*(b+k) - min_silence_len, window_ms*b + min_silence_len)
+    regions = [(max(0, window_ms * (b + k) - min_silence_len), min(audio_len, window_ms * b + min_silence_len))
+               for b in candidates]
+    # A última janela grossa pode ser incompleta: o final do áudio é sempre analisado
+    regions.append((max(0, audio_len - min_silence_len - window_ms), audio_len))
+
+    merged = []
+    for start, end in sorted(regions):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+
+    silence_ranges = []
+    analysed = 0
+    for start, end in merged:
+        envelope = read_range(start, end)
+        analysed += end - start
+        tracing.count("refined_ms", end - start)
+        for range_start, range_end in detect_silence_envelope(envelope, min_silence_len, silence_thresh):
+            range_start, range_end = range_start + start, range_end + start
+            # Mesma regra de união da detecção completa: início a até min_silence_len do anterior
+            if silence_ranges and range_start <= silence_ranges[-1][1]:
+                silence_ranges[-1][1] = max(silence_ranges[-1][1], range_end)
+            else:
+                silence_ranges.append([range_start, range_end])
+
+    return silence_ranges, analysed
+
+def _build_segments(silence_ranges, audio_len, padding_before, padding_after, min_segment_duration):
+    """Transforma os intervalos de silêncio em segmentos de música com padding e duração mínima."""
+    segments = []
+    prev_end = 0
+
+    for start, end in silence_ranges:
+        segment_duration = start - prev_end
+        if segment_duration > 5000:  # Filtro inicial para segmentos muito curtos
+            segments.append((
+                max(0, prev_end - padding_before),
+                min(audio_len, start + padding_after)
+            ))
+        prev_end = end
+
+    # Adiciona último segmento
+    if audio_len - prev_end > 5000:
+        segments.append((
+            max(0, prev_end - padding_before),
+            audio_len
+        ))
+
+    # Filtra segmentos com base na duração mínima
+    filtered_segments = [(start, end) for start, end in segments
+                         if _accept_segment(start, end, min_segment_duration)]
+
+    return [{'start': s[0]/1000, 'end': s[1]/1000} for s in filtered_segments]
+
+def segments_from_silence(silence_ranges, audio_len, padding_before=None, padding_after=None,
+                          min_segment_duration=None):
+    """Segmentos de música a partir de intervalos de silêncio obtidos fora do Python.
+
+    Usado pelo backend "ffmpeg" (silencedetect): aplica o mesmo padding, filtro
+    e duração mínima de detect_music_segments aos intervalos [início, fim] em ms.
+    """
+    _, _, padding_before, padding_after, min_segment_duration = _resolve_params(
+        None, None, padding_before, padding_after, min_segment_duration
+    )
+    return _build_segments(silence_ranges, audio_len, padding_before, padding_after, min_segment_duration)
+
+def _accept_segment(start, end, min_segment_duration):
+    """Verifica (e registra no log) se o segmento atinge a duração mínima."""
+    duration = end - start
+    if duration >= min_segment_duration:
+        logging.info(f"Segmento detectado: {start/1000:.2f}s - {end/1000:.2f}s (duração: {duration/1000:.2f}s)")
+        return True
+    logging.info(f"Segmento ignorado por ser muito curto: {start/1000:.2f}s - {end/1000:.2f}s (duração: {duration/1000:.2f}s)")
+    return False
+
+class StreamingSegmenter:
+    """Versão incremental de detect_silence_envelope + _build_segments.
+
+    Recebe o envelope em pedaços e devolve cada segmento assim que o silêncio que
+    o encerra é confirmado (e o padding posterior já foi lido). Entre pedaços só
+    guarda as últimas min_silence_len - 1 energias e o estado do intervalo de
+    silêncio aberto, então a memória não cresce com a duração do áudio.
+    """
+
+    def __init__(self, threshold=None, min_silence_len=None, padding_before=None,
+                 padding_after=None, min_segment_duration=None):
+        (self.threshold, self.min_silence_len, self.padding_before,
+         self.padding_after, self.min_segment_duration) = _resolve_params(
+            threshold, min_silence_len, padding_before, padding_after, min_segment_duration
+        )
+        self._energy_limit = _silent_energy_limit(self.threshold, self.min_silence_len)
+
+        self.position = 0  # Milissegundos de envelope já recebidos
+        self._window = np.empty(0, dtype=np.float32)  # Envelope a partir da próxima janela
+        self._next_start = 0
+        self._prev_i = None  # Início da última janela silenciosa
+        self._prev_end = 0  # Fim do último intervalo de silêncio fechado
+        self._pending = []  # Segmentos aguardando o padding posterior
+
+    def push(self, energies):
+        """Adiciona energias do envelope e retorna os segmentos que ficaram prontos."""
+        self.position += len(energies)
+        window = np.concatenate((self._window, energies))
+
+        n_windows = len(window) - self.min_silence_len + 1
+        if n_windows > 0:
+            cumulative = cumulative_energy(window)
+            window_energy = cumulative[self.min_silence_len:] - cumulative[:-self.min_silence_len]
+            self._add_silence_starts(np.flatnonzero(window_energy < self._energy_limit) + self._next_start)
+
+            window = window[n_windows:]
+            self._next_start += n_windows
+
+        self._window = window.copy()
+        return self._pop_ready(self.position)
+
+    def finish(self, energies=None):
+        """Processa o final do áudio e retorna os segmentos restantes."""
+        ready = self.push(energies if energies is not None else np.empty(0, dtype=np.float32))
+        audio_len = self.position
+
+        # O intervalo de silêncio ainda aberto termina junto com o áudio
+        if self._prev_i is not None:
+            self._prev_end = self._prev_i + self.min_silence_len
+        ready += self._pop_ready(None, audio_len)
+
+        # Adiciona último segmento
+        if audio_len - self._prev_end > 5000:
+            start = max(0, self._prev_end - self.padding_before)
+            if _accept_segment(start, audio_len, self.min_segment_duration):
+                ready.append({'start': start/1000, 'end': audio_len/1000})
+        return ready
+
+    def _add_silence_starts(self, starts):
+        if not len(starts):
+            return
+
+        # Janelas silenciosas separadas por mais de min_silence_len abrem um novo intervalo
+        previous = starts[0] - 1 if self._prev_i is None else self._prev_i
+        gaps = np.diff(np.concatenate(([previous], starts)))
+        new_ranges = np.flatnonzero(gaps > self.min_silence_len)
+        if self._prev_i is None:
+            new_ranges = np.concatenate(([0], new_ranges))
+
+        for k in new_ranges:
+            if k > 0:
+                self._prev_end = int(starts[k - 1]) + self.min_silence_len
+            elif self._prev_i is not None:
+                self._prev_end = self._prev_i + self.min_silence_len
+            self._open_range(int(starts[k]))
+
+        self._prev_i = int(starts[-1])
+
+    def _open_range(self, start):
+        # O segmento anterior termina onde este silêncio começa
+        if start - self._prev_end > 5000:  # Filtro inicial para segmentos muito curtos
+            self._pending.append((max(0, self._prev_end - self.padding_before), start + self.padding_after))
+
+    def _pop_ready(self, position, audio_len=None):
+        ready = []
+        while self._pending and (position is None or self._pending[0][1] <= position):
+            start, end = self._pending.pop(0)
+            if audio_len is not None:
+                end = min(audio_len, end)
+            if _accept_segment(start, end, self.min_segment_duration):
+                ready.append({'start': start/1000, 'end': end/1000})
+        return ready
+
+def iter_music_segments(blocks, threshold=None, min_silence_len=None, padding_before=None,
+                        padding_after=None, min_segment_duration=None, sample_rate=None, channels=None,
+                        on_envelope=None, on_peaks=None):
+    """Gerador que detecta segmentos de música enquanto os blocos PCM são lidos.
+
+    Produz os mesmos segmentos de detect_music_segments, mas cada um é entregue
+    assim que confirmado, com memória constante independente da duração.
+
+    Args:
+        blocks: Iterável de arrays int16 (ex.: video_operations.stream_audio)
+        sample_rate: Taxa de amostragem dos blocos (padrão: AUDIO_EXTRACTION_PARAMS)
+        channels: Número de canais intercalados (padrão: AUDIO_EXTRACTION_PARAMS)
+        on_envelope: Função opcional chamada com cada pedaço do envelope calculado
+        on_peaks: Função opcional chamada com o mínimo e o máximo de cada milissegundo
+        Demais parâmetros: ver detect_music_segments
+    """
+    builder = EnvelopeBuilder(sample_rate, channels, on_peaks)
+    segmenter = StreamingSegmenter(threshold, min_silence_len, padding_before,
+                                   padding_after, min_segment_duration)
+    for block in blocks:
+        energies = builder.push(block)
+        if on_envelope:
+            on_envelope(energies)
+        yield from segmenter.push(energies)
+
+    energies = builder.flush()
+    if on_envelope:
+        on_envelope(energies)
+    yield from segmenter.finish(energies)
+
+def _resolve_params(threshold, min_silence_len, padding_before, padding_after, min_segment_duration):
+    """Completa os parâmetros não especificados com os valores padrão do config.py."""
+    return (
+        threshold if threshold is not None else DETECTION_PARAMS["threshold"],
+        min_silence_len if min_silence_len is not None else DETECTION_PARAMS["min_silence_len"],
+        padding_before if padding_before is not None else DETECTION_PARAMS["padding_before"],
+        padding_after if padding_after is not None else DETECTION_PARAMS["padding_after"],
+        min_segment_duration if min_segment_duration is not None else DETECTION_PARAMS["min_segment_duration"],
+    )
+
+# Códigos de formato do chunk "fmt " (PCM inteiro e o cabeçalho estendido)
+_WAVE_FORMAT_PCM = 0x0001
+_WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+def open_wav_memmap(audio_path):
+    """Mapeia em memória as amostras de um WAV PCM 16 bits, sem lê-las.
+
+    O cabeçalho RIFF é percorrido até o chunk "data" e as amostras viram um
+    np.memmap int16 (canais intercalados): as páginas do arquivo são carregadas
+    pelo sistema operacional conforme o acesso, então a memória do processo
+    não cresce com o tamanho do arquivo. WAVs maiores que 4 GB em RF64 usam o
+    tamanho do chunk "ds64"; um tamanho de chunk "data" inválido (gravação
+    interrompida) vale até o fim do arquivo.
+
+    Returns:
+        Tupla (amostras, sample_rate, channels), ou None se não for um WAV PCM 16 bits
+    """
+    file_size = os.path.getsize(audio_path)
+    fmt = None
+    ds64_data_size = None
+    with open(audio_path, "rb") as f:
+        header = f.read(12)
+        if len(header) < 12 or header[:4] not in (b"RIFF", b"RF64") or header[8:12] != b"WAVE":
+            return None
+
+        while True:
+            chunk = f.read(8)
+            if len(chunk) < 8:
+                return None
+            chunk_id, chunk_size = chunk[:4], int.from_bytes(chunk[4:], "little")
+
+            if chunk_id == b"ds64":
+                ds64 = f.read(chunk_size)
+                ds64_data_size = int.from_bytes(ds64[8:16], "little")
+                if chunk_size % 2:
+                    f.read(1)
+            elif chunk_id == b"fmt ":
+                fmt = f.read(chunk_size)
+                if chunk_size % 2:
+                    f.read(1)
+            elif chunk_id == b"data":
+                data_offset = f.tell()
+                break
+            else:
+                # Chunks têm tamanho par (byte de preenchimento quando ímpar)
+                f.seek(chunk_size + chunk_size % 2, os.SEEK_CUR)
+
+    if fmt is None or len(fmt) < 16:
+        return None
+    format_tag = int.from_bytes(fmt[0:2], "little")
+    channels = int.from_bytes(fmt[2:4], "little")
+    sample_rate = int.from_bytes(fmt[4:8], "little")
+    bits = int.from_bytes(fmt[14:16], "little")
+    if format_tag == _WAVE_FORMAT_EXTENSIBLE and len(fmt) >= 26:
+        format_tag = int.from_bytes(fmt[24:26], "little")  # Subformato (GUID começa pelo código)
+    if format_tag != _WAVE_FORMAT_PCM or bits != 16 or not channels:
+        return None
+
+    available = file_size - data_offset
+    if chunk_size == 0xFFFFFFFF and ds64_data_size is not None:
+        chunk_size = ds64_data_size
+    data_size = chunk_size if 0 < chunk_size <= available else available
+    frame_bytes = 2 * channels
+    n_samples = data_size // frame_bytes * channels
+    if n_samples == 0:
+        return np.empty(0, dtype=np.int16), sample_rate, channels
+
+    samples = np.memmap(audio_path, dtype="<i2", mode="r", offset=data_offset, shape=(n_samples,))
+    return samples, sample_rate, channels
+
+def read_audio_blocks(audio_path, block_size=None):
+    """Lê um arquivo de áudio em blocos int16.
+
+    WAVs PCM 16 bits são mapeados em memória (ver open_wav_memmap) e entregues
+    como fatias do mapa, sem cópia; outros formatos são decodificados pelo pydub.
+
+    Returns:
+        Tupla (blocos, sample_rate, channels), onde blocos é um gerador de arrays int16
+    """
+    block_size = block_size or AUDIO_EXTRACTION_PARAMS["block_size"]
+
+    mapped = open_wav_memmap(audio_path)
+    if mapped is not None:
+        samples, sample_rate, channels = mapped
+    else:
+        audio = AudioSegment.from_file(audio_path).set_sample_width(2)
+        samples = np.frombuffer(audio.raw_data, dtype=np.int16)
+        sample_rate, channels = audio.frame_rate, audio.channels
+
+    step = block_size * channels
+    blocks = (samples[i:i + step] for i in range(0, len(samples), step))
+    return blocks, sample_rate, channels
+
+def _wav_duration_ms(audio_path):
+    """Duração de um WAV em ms pelo cabeçalho (None se não for um WAV PCM 16 bits)."""
+    mapped = open_wav_memmap(audio_path)
+    if mapped is None:
+        return None
+    samples, sample_rate, channels = mapped
+    return len(samples) // channels * 1000 // sample_rate
+
+def segment_envelope(envelope, threshold=None, min_silence_len=None,
+                     padding_before=None, padding_after=None, min_segment_duration=None,
+                     cumulative=None):
+    """Detecta segmentos de música a partir de um envelope já calculado (ver compute_envelope).
+
+    Aceita os mesmos parâmetros de detect_music_segments; cumulative pode trazer
+    cumulative_energy(envelope) para resegmentações repetidas ficarem mais rápidas.
+    """
+    try:
+        # Usar valores padrão do config.py se não especificados
+        threshold, min_silence_len, padding_before, padding_after, min_segment_duration = _resolve_params(
+            threshold, min_silence_len, padding_before, padding_after, min_segment_duration
+        )
+
+        if len(envelope) == 0:
+            raise ValueError("Envelope de áudio vazio")
+
+        with tracing.span("segmentation", envelope_ms=len(envelope)):
+            silence_ranges = detect_silence_envelope(envelope, min_silence_len, threshold, cumulative)
+
+        return _build_segments(silence_ranges, len(envelope), padding_before, padding_after, min_segment_duration)
+
+    except Exception as e:
+        logging.error(f"Erro na detecção de músicas: {str(e)}")
+        raise
+
+def detect_music_segments(audio, threshold=None, min_silence_len=None,
+                          padding_before=None, padding_after=None, min_segment_duration=None,
+                          backend=None, progress_callback=None):
     """Detecta segmentos de música no áudio com silêncio como separador.
-    
+
     Args:
-        audio_path: Caminho para o arquivo de áudio
+        audio: Caminho para o arquivo de áudio, array int16 com todas as amostras
+            (ex.: o mapa de open_wav_memmap, no formato de AUDIO_EXTRACTION_PARAMS)
+            ou iterável de blocos PCM s16le (ex.: video_operations.stream_audio)
         threshold: Limiar de detecção de silêncio em dB
         min_silence_len: Duração mínima de silêncio em ms
         padding_before: Padding antes do segmento em ms
         padding_after: Padding depois do segmento em ms
         min_segment_duration: Duração mínima do segmento em ms (padrão: 60000 = 1 minuto)
+        backend: "numpy" ou "pydub" (padrão: DETECTION_PARAMS["backend"]); com taxa de
+            amostragem que não é múltipla de 1000 Hz (ex.: 44,1 kHz) o "numpy" usa o pydub
+        progress_callback: Função opcional chamada com a fração (0 a 1) do áudio já
+            processada (no backend pydub só ao final)
     """
+    backend = backend or DETECTION_PARAMS["backend"]
+    is_path = isinstance(audio, (str, os.PathLike))
+
+    if isinstance(audio, np.ndarray):
+        # Array inteiro (possivelmente um np.memmap): percorre em fatias, sem cópia
+        step = AUDIO_EXTRACTION_PARAMS["block_size"] * AUDIO_EXTRACTION_PARAMS["audio_channels"]
+        samples = audio
+        audio = (samples[i:i + step] for i in range(0, len(samples), step))
+
     try:
-        # Usar valores padrão do config.py se não especificados
-        threshold = threshold if threshold is not None else DETECTION_PARAMS["threshold"]
-        min_silence_len = min_silence_len if min_silence_len is not None else DETECTION_PARAMS["min_silence_len"]
-        padding_before = padding_before if padding_before is not None else DETECTION_PARAMS["padding_before"]
-        padding_after = padding_after if padding_after is not None else DETECTION_PARAMS["padding_after"]
-        min_segment_duration = min_segment_duration if min_segment_duration is not None else DETECTION_PARAMS["min_segment_duration"]
-        
+        if backend not in ("numpy", "pydub"):
+            raise ValueError(f"Backend de detecção desconhecido: {backend}")
+
         # Verifica se o arquivo existe e tem tamanho adequado
-        if not os.path.exists(audio_path) or os.path.getsize(audio_path) < 1024:
-            raise ValueError(f"Arquivo de áudio inválido: {audio_path}")
-        
-        audio = AudioSegment.from_file(audio_path)
-        
+        if is_path and (not os.path.exists(audio) or os.path.getsize(audio) < 1024):
+            raise ValueError(f"Arquivo de áudio inválido: {audio}")
+
+        if backend == "numpy":
+            if is_path:
+                blocks, sample_rate, channels = read_audio_blocks(audio)
+            else:
+                blocks, sample_rate, channels = audio, AUDIO_EXTRACTION_PARAMS["sample_rate"], None
+            # O envelope soma milissegundos de amostras inteiras; em taxas como 44,1 kHz
+            # só o pydub (que fatia milissegundos em amostras fracionárias) dá o mesmo resultado
+            if sample_rate % 1000:
+                logging.info(f"Taxa de amostragem de {sample_rate} Hz não é múltipla de 1000 Hz: "
+                             f"usando o backend pydub")
+                backend = "pydub"
+
+        if backend == "numpy":
+            envelope = compute_envelope(blocks, sample_rate, channels, progress_callback,
+                                        _wav_duration_ms(audio) if is_path else None)
+            return segment_envelope(
+                envelope,
+                threshold=threshold,
+                min_silence_len=min_silence_len,
+                padding_before=padding_before,
+                padding_after=padding_after,
+                min_segment_duration=min_segment_duration
+            )
+
+        # Implementação de referência com pydub
+        threshold, min_silence_len, padding_before, padding_after, min_segment_duration = _resolve_params(
+            threshold, min_silence_len, padding_before, padding_after, min_segment_duration
+        )
+
+        if is_path:
+            audio = AudioSegment.from_file(audio)
+        else:
+            audio = AudioSegment(
+                data=np.concatenate(list(audio)).astype(np.int16).tobytes(),
+                sample_width=2,
+                frame_rate=AUDIO_EXTRACTION_PARAMS["sample_rate"],
+                channels=AUDIO_EXTRACTION_PARAMS["audio_channels"]
+            )
+
         # Ajusta o limiar de silêncio baseado no volume médio se não for especificado
         if threshold is None:
             threshold = audio.dBFS - 14
-        
+
         silence_ranges = silence.detect_silence(
-            audio, 
-            min_silence_len=min_silence_len, 
+            audio,
+            min_silence_len=min_silence_len,
             silence_thresh=threshold
         )
-        
-        segments = []
-        prev_end = 0
-        
-        for start, end in silence_ranges:
-            segment_duration = start - prev_end
-            if segment_duration > 5000:  # Filtro inicial para segmentos muito curtos
-                segments.append((
-                    max(0, prev_end - padding_before),
-                    min(len(audio), start + padding_after)
-                ))
-            prev_end = end
-        
-        # Adiciona último segmento
-        if len(audio) - prev_end > 5000:
-            segments.append((
-                max(0, prev_end - padding_before),
-                len(audio)
-            ))
-        
-        # Filtra segmentos com base na duração mínima
-        filtered_segments = []
-        for start, end in segments:
-            duration = end - start
-            if duration >= min_segment_duration:
-                filtered_segments.append((start, end))
-                logging.info(f"Segmento detectado: {start/1000:.2f}s - {end/1000:.2f}s (duração: {duration/1000:.2f}s)")
-            else:
-                logging.info(f"Segmento ignorado por ser muito curto: {start/1000:.2f}s - {end/1000:.2f}s (duração: {duration/1000:.2f}s)")
-        
-        return [{'start': s[0]/1000, 'end': s[1]/1000} for s in filtered_segments]
-    
+        if progress_callback:
+            progress_callback(1.0)
+
+        return _build_segments(silence_ranges, len(audio), padding_before, padding_after, min_segment_duration)
+
     except Exception as e:
         logging.error(f"Erro na detecção de músicas: {str(e)}")
         raise
\ No newline at end of file
@@ -0,0 +1,256 @@
+"""
+Pipeline em etapas para processar vários arquivos sobrepondo extração, detecção e exportação.
+
+Enquanto o arquivo N é analisado, o N+1 já está sendo decodificado e o N-1
+exportado. Cada etapa tem seu próprio grupo de threads e as etapas são ligadas
+por filas limitadas: quando uma etapa fica para trás, a anterior espera
+(backpressure) em vez de acumular envelopes em memória.
+"""
+import os
+import queue
+import threading
+import time
+import logging
+from config import PIPELINE_PARAMS, DETECTION_PARAMS
+
+# Marca de fim da fila de uma etapa
+_END = object()
+
+class StageMetrics:
+    """Contadores de uma etapa do pipeline."""
+
+    def __init__(self, name, workers):
+        self.name = name
+        self.workers = workers
+        self.processed = 0
+        self.failed = 0
+        self.skipped = 0  # Itens que já chegaram com erro de uma etapa anterior
+        self.busy_seconds = 0.0  # Tempo executando a etapa
+        self.blocked_seconds = 0.0  # Tempo esperando vaga na fila seguinte (backpressure)
+        self.started = None
+        self.finished = None
+        self._lock = threading.Lock()
+
+    def record(self, busy, blocked, failed, skipped=False):
+        with self._lock:
+            if skipped:
+                self.skipped += 1
+            else:
+                self.processed += 1
+                self.failed += int(failed)
+            self.busy_seconds += busy
+            self.blocked_seconds += blocked
+
+    @property
+    def wall_seconds(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.perf_counter()) - self.started
+
+    @property
+    def throughput(self):
+        """Arquivos por minuto."""
+        wall = self.wall_seconds
+        return self.processed / wall * 60 if wall else 0.0
+
+    @property
+    def utilization(self):
+        """Fração do tempo em que as threads da etapa estiveram trabalhando."""
+        wall = self.wall_seconds
+        return self.busy_seconds / (wall * self.workers) if wall else 0.0
+
+    def as_dict(self):
+        return {
+            "stage": self.name,
+            "workers": self.workers,
+            "processed": self.processed,
+            "failed": self.failed,
+            "skipped": self.skipped,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "blocked_seconds": round(self.blocked_seconds, 3),
+            "wall_seconds": round(self.wall_seconds, 3),
+            "files_per_minute": round(self.throughput, 2),
+            "utilization": round(self.utilization, 3),
+        }
+
+class Stage:
+    """Uma etapa: fila de entrada limitada e threads que aplicam func a cada item."""
+
+    def __init__(self, name, func, workers, queue_size):
+        self.name = name
+        self.func = func
+        self.workers = max(1, workers)
+        self.input = queue.Queue(maxsize=max(1, queue_size))
+        self.output = None  # Fila da próxima etapa (None na última)
+        self.metrics = StageMetrics(name, self.workers)
+        self._threads = []
+
+    def start(self):
+        self.metrics.started = time.perf_counter()
+        self._threads = [
+            threading.Thread(target=self._run, name=f"pipeline-{self.name}-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def close(self):
+        """Sinaliza o fim da entrada e espera as threads terminarem."""
+        for _ in self._threads:
+            self.input.put(_END)
+        for thread in self._threads:
+            thread.join()
+        self.metrics.finished = time.perf_counter()
+
+    def _run(self):
+        while True:
+            job = self.input.get()
+            if job is _END:
+                return
+
+            skipped = job.error is not None
+            failed = False
+            begin = time.perf_counter()
+            if not skipped:
+                try:
+                    self.func(job)
+                except Exception as e:
+                    logging.error(f"Erro na etapa '{self.name}' de {job.path}: {str(e)}")
+                    job.error = e
+                    job.failed_stage = self.name
+                    failed = True
+            busy = time.perf_counter() - begin
+
+            # Itens com erro seguem adiante (sem processamento) para serem reportados no final
+            blocked = 0.0
+            if self.output is not None:
+                begin = time.perf_counter()
+                self.output.put(job)
+                blocked = time.perf_counter() - begin
+            self.metrics.record(busy, blocked, failed, skipped)
+
+class PipelineJob:
+    """Estado de um arquivo ao longo do pipeline."""
+
+    def __init__(self, path):
+        self.path = path
+        self.envelope = None
+        self.features = None  # Características do classificador (DETECTION_PARAMS["classify"])
+        self.segments = None
+        self.outputs = []
+        self.journal = None
+        self.fingerprint = None
+        self.result = None
+        self.error = None
+        self.failed_stage = None
+
+class Pipeline:
+    """Encadeia etapas com filas limitadas e tamanhos de grupo independentes."""
+
+    def __init__(self, stages):
+        self.stages = stages
+        for current, following in zip(stages, stages[1:]):
+            current.output = following.input
+        self.done = []
+
+    def run(self, paths):
+        """Processa os arquivos na ordem dada e retorna a lista de PipelineJob concluídos."""
+        last = self.stages[-1]
+        results = queue.Queue()
+        last.output = results
+
+        for stage in self.stages:
+            stage.start()
+
+        # O último estágio entrega numa fila sem limite lida aqui ao final
+        for path in paths:
+            self.stages[0].input.put(PipelineJob(path))
+
+        for stage in self.stages:
+            stage.close()
+
+        self.done = []
+        while not results.empty():
+            self.done.append(results.get())
+        return self.done
+
+    def metrics(self):
+        return [stage.metrics.as_dict() for stage in self.stages]
+
+    def format_metrics(self):
+        """Tabela de métricas por etapa para o log."""
+        lines = [f"{'etapa':<10} {'thr':>3} {'ok':>4} {'erro':>4} {'ocupado(s)':>11} "
+                 f"{'espera(s)':>10} {'arq/min':>8} {'uso':>6}"]
+        for m in self.metrics():
+            lines.append(f"{m['stage']:<10} {m['workers']:>3} {m['processed'] - m['failed']:>4} "
+                         f"{m['failed']:>4} {m['busy_seconds']:>11.1f} {m['blocked_seconds']:>10.1f} "
+                         f"{m['files_per_minute']:>8.2f} {m['utilization']:>6.0%}")
+        return "\n".join(lines)
+
+def build_detection_pipeline(export_dir=None, manifest_dir=None, manifest_format="json",
+                             extract_workers=None, detect_workers=None, export_workers=None,
+                             queue_size=None, output_names=None):
+    """Monta o pipeline extração -> detecção -> exportação/manifesto usado pelo modo em lote.
+    
+    output_names mapeia cada caminho ao seu nome de saída (ver cli.output_names);
+    arquivos fora dele usam o nome sem extensão.
+    
+    A detecção segue a mesma configuração do modo sem pipeline: com o envelope
+    completo (ver main.envelope_detection) a decodificação fica na etapa de
+    extração e a segmentação na de detecção; com os outros motores e modos
+    (ffmpeg, pydub, coarse_to_fine, WAV temporário) main.extract_and_detect roda
+    inteiro na etapa de extração, que é onde o áudio é decodificado.
+    """
+    from main import (extract_envelope, extract_and_detect, envelope_detection, load_features,
+                      classify_segments, export_segments)
+    from music_detection import segment_envelope
+    from cli import write_manifest, manifest_location
+    from analysis_cache import file_fingerprint
+    from journal import batch_journal
+
+    def output_name(job):
+        return (output_names or {}).get(job.path) or os.path.splitext(os.path.basename(job.path))[0]
+
+    def extract(job):
+        # Arquivos já detectados numa execução anterior (ver journal.py) pulam extração e detecção
+        job.journal = batch_journal(job.path, export_dir, manifest_dir, output_name(job))
+        if job.journal:
+            job.fingerprint = file_fingerprint(job.path)
+            job.segments = job.journal.detection(job.fingerprint)
+            if job.segments is not None:
+                logging.info(f"Detecção retomada do diário: {job.path}")
+                return
+        if not envelope_detection(job.path):
+            job.segments = extract_and_detect(job.path)
+            if job.journal:
+                job.journal.record_detection(job.fingerprint, job.path, job.segments)
+            return
+        job.envelope = extract_envelope(job.path)
+        if DETECTION_PARAMS["classify"]:
+            job.features = load_features(job.path)
+
+    def detect(job):
+        if job.segments is not None:
+            return
+        job.segments = classify_segments(job.path, segment_envelope(job.envelope), job.features)
+        job.envelope = job.features = None  # Libera a memória antes de seguir para a exportação
+        if job.journal:
+            job.journal.record_detection(job.fingerprint, job.path, job.segments)
+
+    def export(job):
+        name = output_name(job)
+        if export_dir:
+            target_dir = os.path.join(export_dir, name)
+            os.makedirs(target_dir, exist_ok=True)
+            job.outputs = export_segments(job.path, target_dir, job.segments, journal=job.journal)
+
+        manifest_path = manifest_location(job.path, name, manifest_dir or export_dir, manifest_format)
+        write_manifest(manifest_path, job.path, job.segments, job.outputs, manifest_format)
+        job.result = {"source": job.path, "segments": len(job.segments), "manifest": manifest_path}
+
+    queue_size = queue_size or PIPELINE_PARAMS["queue_size"]
+    return Pipeline([
+        Stage("extract", extract, extract_workers or PIPELINE_PARAMS["extract_workers"], queue_size),
+        Stage("detect", detect, detect_workers or PIPELINE_PARAMS["detect_workers"], queue_size),
+        Stage("export", export, export_workers or PIPELINE_PARAMS["export_workers"], queue_size),
+    ])
@@ -0,0 +1,257 @@
+"""
+Inspeção da mídia com o ffprobe: duração, streams, codecs, taxa de bits e GOP.
+
+Cada arquivo é inspecionado por uma única execução do ffprobe e o resultado
+fica no cache de análise (chave = identidade do arquivo, ver
+analysis_cache.file_fingerprint) e em memória (os PROBE_MEMO_SIZE arquivos
+usados mais recentemente), então a estimativa de tempo, o escalonamento do
+lote, a escolha entre cópia e recodificação na exportação e a seleção da faixa
+de áudio consultam a mesma informação sem repetir o ffprobe.
+
+As estatísticas de GOP (intervalo entre quadros-chave) vêm só dos primeiros
+GOP_SAMPLE_SECONDS do vídeo, para a inspeção não ler o arquivo inteiro; o
+índice completo de quadros-chave continua em keyframe_index.py.
+"""
+import os
+import json
+import logging
+import threading
+import subprocess
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import tracing
+from analysis_cache import get_cache, analysis_key
+from config import AUDIO_EXTRACTION_PARAMS
+
+# Trecho inicial (s) cujos pacotes de vídeo são lidos para as estatísticas de GOP
+GOP_SAMPLE_SECONDS = 60
+
+# Versão do formato salvo no cache; mudar invalida as inspeções antigas
+_PROBE_VERSION = 2
+
+# Campos do stream de vídeo guardados (nomes do ffprobe, usados também pela renderização inteligente)
+_VIDEO_FIELDS = ("index", "codec_name", "profile", "level", "width", "height", "pix_fmt",
+                 "avg_frame_rate", "time_base", "bit_rate")
+
+# Inspeções já feitas neste processo: (caminho, tamanho, mtime) -> MediaInfo, das
+# menos às mais recentemente usadas; além de PROBE_MEMO_SIZE as mais antigas saem
+# (continuam no cache em disco, se ativo)
+PROBE_MEMO_SIZE = 256
+_probed = OrderedDict()
+_probed_lock = threading.Lock()
+
+def _number(value, kind=float):
+    """Converte um valor do ffprobe ("N/A", ausente ou texto) em número, ou None."""
+    try:
+        return kind(value)
+    except (TypeError, ValueError):
+        return None
+
+def _frame_rate(rate):
+    """Taxa de quadros a partir de uma fração do ffprobe ("30000/1001"), ou None."""
+    num, _, den = str(rate or "").partition("/")
+    num, den = _number(num), _number(den or 1)
+    return num / den if num and den else None
+
+def run_ffprobe(video_path):
+    """Executa o ffprobe uma vez: formato, streams e os pacotes do início do arquivo."""
+    command = [
+        "ffprobe", "-v", "error",
+        "-read_intervals", f"%+{GOP_SAMPLE_SECONDS}",
+        "-show_format", "-show_streams",
+        "-show_entries", "packet=stream_index,pts_time,dts_time,flags",
+        "-of", "json",
+        video_path
+    ]
+    with tracing.span("ffprobe"):
+        completed = subprocess.run(command, capture_output=True, text=True,
+                                   encoding="utf-8", errors="replace")
+    if completed.returncode != 0:
+        logging.error(f"Erro ao analisar mídia: {completed.stderr}")
+        raise RuntimeError(f"ffprobe falhou ao analisar {video_path}: {completed.stderr.strip()}")
+    return json.loads(completed.stdout or "{}")
+
+def gop_stats(packets, stream_index):
+    """Quadros-chave e intervalo médio/máximo entre eles (s) nos pacotes lidos do stream.
+
+    O trecho depois do último quadro-chave também conta no máximo: um vídeo com
+    um único quadro-chave na amostra tem GOP de pelo menos a amostra inteira.
+    """
+    keyframes, last_time = [], None
+    for packet in packets:
+        if packet.get("stream_index") != stream_index:
+            continue
+        t = _number(packet.get("pts_time"))
+        if t is None:
+            t = _number(packet.get("dts_time"))
+        if t is None:
+            continue
+        last_time = t if last_time is None else max(last_time, t)
+        if "K" in packet.get("flags", ""):
+            keyframes.append(t)
+    if not keyframes:
+        return None
+
+    keyframes.sort()
+    gaps = [b - a for a, b in zip(keyframes, keyframes[1:])]
+    mean = sum(gaps) / len(gaps) if gaps else None
+    gaps.append(last_time - keyframes[-1])
+    return {
+        "keyframes": len(keyframes),
+        "mean": round(mean, 6) if mean is not None else None,
+        "max": round(max(gaps), 6),
+        "sampled": round(last_time - keyframes[0], 6),
+    }
+
+def describe(data):
+    """Resume a saída JSON do ffprobe no dicionário guardado em MediaInfo e no cache."""
+    fmt = data.get("format", {})
+    streams = data.get("streams", [])
+
+    video = next((s for s in streams if s.get("codec_type") == "video"
+                  and not s.get("disposition", {}).get("attached_pic")), None)
+    audio = []
+    for position, stream in enumerate(s for s in streams if s.get("codec_type") == "audio"):
+        audio.append({
+            "index": stream.get("index"),
+            "position": position,  # Número da faixa entre as de áudio (-map 0:a:N)
+            "codec_name": stream.get("codec_name"),
+            "channels": _number(stream.get("channels"), int),
+            "sample_rate": _number(stream.get("sample_rate"), int),
+            "bit_rate": _number(stream.get("bit_rate"), int),
+            "language": stream.get("tags", {}).get("language"),
+            "default": bool(stream.get("disposition", {}).get("default")),
+        })
+
+    if video is not None:
+        gop = gop_stats(data.get("packets", []), video.get("index"))
+        video = {field: video.get(field) for field in _VIDEO_FIELDS}
+        video["fps"] = _frame_rate(video["avg_frame_rate"])
+        video["bit_rate"] = _number(video["bit_rate"], int)
+    else:
+        gop = None
+
+    return {
+        "duration": _number(fmt.get("duration")),
+        "size": _number(fmt.get("size"), int),
+        "format_name": fmt.get("format_name"),
+        "bit_rate": _number(fmt.get("bit_rate"), int),
+        "video": video,
+        "audio": audio,
+        "gop": gop,
+    }
+
+class MediaInfo:
+    """Resultado da inspeção de um arquivo (ver describe para os campos)."""
+
+    def __init__(self, path, data):
+        self.path = path
+        self.data = data
+        self.duration = data["duration"]
+        self.size = data["size"]
+        self.format_name = data["format_name"]
+        self.bit_rate = data["bit_rate"]
+        self.video = data["video"]
+        self.audio = data["audio"]
+        self.gop = data["gop"]
+
+    @property
+    def max_gop(self):
+        """Maior intervalo entre quadros-chave na amostra (s), ou None se desconhecido."""
+        return self.gop["max"] if self.gop else None
+
+    def audio_position(self, selection=None):
+        """Faixa de áudio a analisar (posição entre as faixas de áudio, para -map 0:a:N).
+
+        Args:
+            selection: Posição da faixa (int), código de idioma ("por") ou None
+                (padrão: AUDIO_EXTRACTION_PARAMS["audio_stream"]); None escolhe a
+                faixa marcada como padrão no arquivo ou, sem marcação, a primeira
+
+        Raises:
+            ValueError: Se o arquivo não tiver áudio ou a faixa pedida não existir
+        """
+        selection = AUDIO_EXTRACTION_PARAMS["audio_stream"] if selection is None else selection
+        if not self.audio:
+            raise ValueError(f"{self.path} não tem faixa de áudio")
+        if selection is None:
+            return next((a["position"] for a in self.audio if a["default"]), 0)
+        if isinstance(selection, int):
+            if not 0 <= selection < len(self.audio):
+                raise ValueError(f"Faixa de áudio {selection} não existe em {self.path} "
+                                 f"({len(self.audio)} faixa(s))")
+            return selection
+        for track in self.audio:
+            if (track["language"] or "").lower() == str(selection).lower():
+                return track["position"]
+        raise ValueError(f"Nenhuma faixa de áudio com idioma '{selection}' em {self.path}")
+
+    def summary(self):
+        """Descrição curta para a interface: duração, vídeo, áudio e GOP."""
+        parts = []
+        if self.duration is not None:
+            hours, rest = divmod(int(self.duration), 3600)
+            parts.append(f"{hours}:{rest // 60:02d}:{rest % 60:02d}")
+        if self.video:
+            parts.append(f"{self.video['codec_name']} {self.video['width']}x{self.video['height']}")
+        if self.audio:
+            parts.append(f"{len(self.audio)} faixa(s) de áudio")
+        if self.max_gop is not None:
+            parts.append(f"GOP até {self.max_gop:.1f}s")
+        return " · ".join(parts)
+
+def probe(video_path):
+    """Inspeção do arquivo, do cache em memória, do cache em disco ou de um novo ffprobe."""
+    stat = os.stat(video_path)
+    memo_key = (os.path.abspath(video_path), stat.st_size, stat.st_mtime_ns)
+    with _probed_lock:
+        info = _probed.get(memo_key)
+        if info is not None:
+            _probed.move_to_end(memo_key)
+    if info is not None:
+        return info
+
+    cache = get_cache()
+    key = analysis_key(video_path, params={"probe": _PROBE_VERSION, "gop_sample": GOP_SAMPLE_SECONDS}) if cache else None
+    data = cache.load_json(key, kind="probe") if cache else None
+    if data is None:
+        data = describe(run_ffprobe(video_path))
+        tracing.count("media_probes")
+        if cache:
+            try:
+                cache.store_json(key, data, kind="probe")
+            except OSError as e:
+                logging.warning(f"Erro ao salvar inspeção da mídia no cache: {str(e)}")
+
+    info = MediaInfo(video_path, data)
+    with _probed_lock:
+        _probed[memo_key] = info
+        _probed.move_to_end(memo_key)
+        while len(_probed) > PROBE_MEMO_SIZE:
+            _probed.popitem(last=False)
+    return info
+
+def try_probe(video_path):
+    """Como probe, mas registra um aviso e retorna None se a inspeção falhar."""
+    try:
+        return probe(video_path)
+    except Exception as e:
+        logging.warning(f"Não foi possível inspecionar {video_path}: {str(e)}")
+        return None
+
+def default_probe_workers():
+    """ffprobe passa a maior parte do tempo esperando o disco: alguns a mais que os núcleos."""
+    return min(16, (os.cpu_count() or 1) + 4)
+
+def probe_many(paths, workers=None):
+    """Inspeciona vários arquivos em paralelo (arquivos já no cache não rodam o ffprobe).
+
+    Returns:
+        Dicionário caminho -> MediaInfo (None para os arquivos que falharam)
+    """
+    paths = list(dict.fromkeys(paths))
+    if not paths:
+        return {}
+    workers = min(workers or default_probe_workers(), len(paths))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return dict(zip(paths, executor.map(try_probe, paths)))
@@ -0,0 +1,570 @@
+"""
+Servidor local de trabalhos: várias interfaces (ou scripts) compartilham a detecção e a exportação.
+
+    python server.py --port 8765 --workers 4 --root /mnt/nas/gravacoes
+
+Os trabalhos rodam num grupo limitado de processos. Pedidos de detecção do
+mesmo arquivo com os mesmos parâmetros (mesmo que de clientes diferentes)
+viram um único trabalho, e o resultado fica disponível para os pedidos
+seguintes; o envelope também vai para o cache de análise do servidor. Os
+caminhos enviados precisam ser válidos na máquina do servidor (ex.: o mesmo
+compartilhamento do NAS montado no mesmo lugar) e ficar dentro das pastas
+permitidas (SERVER_PARAMS["roots"] ou --root; por padrão, a pasta em que o
+servidor foi iniciado).
+
+Por padrão o servidor só escuta em 127.0.0.1. Para atender outras máquinas,
+defina SERVER_PARAMS["host"] e um SERVER_PARAMS["token"] (ex.: no arquivo de
+--config, seção "server"); os clientes enviam "Authorization: Bearer <token>".
+
+API (JSON):
+    POST   /jobs              {"type": "detect", "path": ..., "settings": {...}}
+                              {"type": "export", "path": ..., "output_dir": ..., "segments": [...]}
+    GET    /jobs/<id>         estado, progresso e resultado do trabalho
+    GET    /jobs/<id>/events  uma linha JSON por atualização, até o trabalho terminar
+    DELETE /jobs/<id>         desiste do trabalho (cancelado quando nenhum cliente o quer mais)
+
+settings segue o formato de config.save_config ({"detection": {...}, "export": {...}}),
+restrito às chaves de _CLIENT_SETTINGS.
+"""
+import os
+import sys
+import copy
+import hmac
+import json
+import time
+import uuid
+import hashlib
+import ipaddress
+import logging
+import argparse
+import threading
+import multiprocessing
+import urllib.error
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from config import (DETECTION_PARAMS, EXPORT_PARAMS, AUDIO_EXTRACTION_PARAMS, CACHE_PARAMS,
+                    SERVER_PARAMS, save_config)
+
+# Intervalo mínimo entre duas atualizações enviadas a um cliente (s)
+EVENT_INTERVAL = 0.1
+
+# Sem atualizações, o estado é reenviado após este tempo (s); mantém a conexão e deixa
+# o cliente verificar se o usuário cancelou mesmo enquanto o trabalho está na fila
+EVENT_KEEPALIVE = 1
+
+# Categorias de configuração enviadas aos processos com cada trabalho
+_SETTING_CATEGORIES = {
+    "detection": DETECTION_PARAMS,
+    "export": EXPORT_PARAMS,
+    "audio": AUDIO_EXTRACTION_PARAMS,
+    "cache": CACHE_PARAMS,
+}
+
+# Configurações que um cliente pode alterar em cada trabalho; o resto (processos,
+# diário, cache, trechos paralelos...) é decidido só pela configuração do servidor
+_CLIENT_SETTINGS = {
+    "detection": set(DETECTION_PARAMS),
+    "export": {"copy_codec", "auto_copy_max_gop", "smart_render", "smart_render_crf",
+               "snap_to_keyframes", "single_pass", "stop_on_error"},
+    "audio": {"audio_stream"},
+}
+
+def allowed_roots():
+    """Pastas (caminhos reais) em que o servidor lê vídeos e grava exportações."""
+    return [os.path.realpath(root) for root in (SERVER_PARAMS["roots"] or [os.getcwd()])]
+
+def resolve_allowed_path(path, description):
+    """Caminho real de path, se estiver dentro de uma das pastas permitidas.
+
+    Raises:
+        PermissionError: Se o caminho (já resolvidos os links simbólicos) sair das pastas permitidas
+    """
+    real = os.path.realpath(path)
+    for root in allowed_roots():
+        try:
+            if os.path.commonpath([real, root]) == root:
+                return real
+        except ValueError:
+            continue  # Outra unidade (Windows)
+    raise PermissionError(f"{description} fora das pastas permitidas no servidor: {path}")
+
+def _is_loopback(host):
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+def _valid_segments(segments):
+    return isinstance(segments, list) and all(
+        isinstance(seg, dict)
+        and all(isinstance(seg.get(k), (int, float)) and not isinstance(seg.get(k), bool)
+                for k in ("start", "end"))
+        and 0 <= seg["start"] < seg["end"]
+        for seg in segments
+    )
+
+def _run_job(job_id, kind, payload, settings, progress_queue, cancel_event):
+    """Executa um trabalho dentro de um processo do grupo."""
+    # Os processos são reaproveitados entre trabalhos: a configuração completa vem com cada um
+    save_config(settings)
+    from main import extract_and_detect, export_segments
+    from video_operations import OperationCancelled
+
+    progress_queue.put((job_id, None, None))  # Marca o início da execução
+    try:
+        if kind == "detect":
+            def detect_progress(stage, progress, speed=None):
+                progress_queue.put((job_id, stage, [stage, progress, speed]))
+
+            segments = extract_and_detect(payload["path"], progress_callback=detect_progress,
+                                          cancel_event=cancel_event)
+            return {"segments": segments}
+
+        def export_progress(i, progress, speed=None):
+            progress_queue.put((job_id, str(i), [i, progress, speed]))
+
+        os.makedirs(payload["output_dir"], exist_ok=True)
+        outputs = export_segments(payload["path"], payload["output_dir"], payload["segments"],
+                                  progress_callback=export_progress, cancel_event=cancel_event)
+        return {"outputs": outputs}
+    except OperationCancelled:
+        raise
+    except Exception as e:
+        # Nem toda exceção (ex.: ffmpeg.Error) volta intacta do processo filho
+        raise RuntimeError(str(e)) from None
+
+class Job:
+    """Um trabalho e seu progresso, compartilhado por todos os clientes que o pediram."""
+
+    def __init__(self, kind, key, payload, cancel_event):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.key = key
+        self.payload = payload
+        self.cancel_event = cancel_event
+        self.status = "queued"  # queued, running, done, error, cancelled
+        self.progress = {}  # etapa ou segmento -> argumentos do último progress_callback
+        self.result = None
+        self.error = None
+        self.clients = 1
+        self.created = time.time()
+        self.finished_at = None  # Usado para descartar trabalhos antigos (ver JobManager._evict_finished)
+        self.version = 0  # Incrementada a cada mudança; os fluxos de eventos esperam por ela
+        self.future = None
+
+    @property
+    def finished(self):
+        return self.status in ("done", "error", "cancelled")
+
+    def snapshot(self):
+        """Cópia do estado para enviar ao cliente (chamar com JobManager._changed; ver JobManager.snapshot)."""
+        return {
+            "id": self.id,
+            "type": self.kind,
+            "path": self.payload["path"],
+            "status": self.status,
+            "progress": dict(self.progress),
+            "result": copy.deepcopy(self.result),
+            "error": self.error,
+            "clients": self.clients,
+        }
+
+class JobManager:
+    """Recebe trabalhos, elimina duplicados e acompanha a execução no grupo de processos."""
+
+    def __init__(self, workers=None):
+        workers = workers or SERVER_PARAMS["workers"] or os.cpu_count()
+        self.executor = ProcessPoolExecutor(max_workers=workers)
+        # Fila e eventos do Manager podem ser passados aos processos do grupo
+        self._manager = multiprocessing.Manager()
+        self.progress_queue = self._manager.Queue()
+        self.jobs = {}
+        self._by_key = {}
+        self._changed = threading.Condition()
+        threading.Thread(target=self._drain_progress, name="server-progress", daemon=True).start()
+
+    def job_key(self, kind, payload, settings):
+        """Trabalhos com a mesma chave compartilham a execução e o resultado."""
+        from analysis_cache import file_fingerprint
+
+        fingerprint = file_fingerprint(payload["path"])
+        if kind == "detect":
+            identity = [fingerprint, settings["detection"], settings["audio"]]
+        else:
+            identity = [fingerprint, os.path.abspath(payload["output_dir"]), payload["segments"],
+                        settings["export"]]
+        return hashlib.sha1(json.dumps([kind, identity], sort_keys=True).encode("utf-8")).hexdigest()
+
+    def submit(self, kind, payload, overrides=None):
+        """Agenda um trabalho (ou reaproveita um igual) e retorna (Job, reaproveitado)."""
+        if kind not in ("detect", "export"):
+            raise ValueError(f"Tipo de trabalho desconhecido: {kind}")
+        if not isinstance(payload.get("path"), str):
+            raise ValueError("Trabalho sem path")
+        payload = dict(payload, path=resolve_allowed_path(payload["path"], "Arquivo"))
+        if not os.path.isfile(payload["path"]):
+            raise ValueError(f"Arquivo não encontrado no servidor: {payload['path']}")
+        if kind == "export":
+            if not (isinstance(payload.get("output_dir"), str) and "segments" in payload):
+                raise ValueError("Exportação requer output_dir e segments")
+            if not _valid_segments(payload["segments"]):
+                raise ValueError("segments deve ser uma lista de {\"start\": s, \"end\": s} com início < fim")
+            payload["output_dir"] = resolve_allowed_path(payload["output_dir"], "Pasta de saída")
+
+        # Configuração do servidor com as alterações pedidas pelo cliente
+        settings = {category: dict(params) for category, params in _SETTING_CATEGORIES.items()}
+        for category, params in (overrides or {}).items():
+            allowed = _CLIENT_SETTINGS.get(category)
+            if allowed is None or not isinstance(params, dict):
+                raise ValueError(f"Categoria de configuração não permitida: {category}")
+            rejected = sorted(set(params) - allowed)
+            if rejected:
+                raise ValueError(f"Configurações não permitidas em {category}: {', '.join(rejected)}")
+            settings[category].update(params)
+
+        key = self.job_key(kind, payload, settings)
+        with self._changed:
+            job = self._by_key.get(key)
+            # Trabalhos com erro ou cancelados são refeitos num novo pedido
+            if job is not None and job.status not in ("error", "cancelled"):
+                job.clients += 1
+                job.version += 1
+                self._changed.notify_all()
+                return job, True
+
+            job = Job(kind, key, payload, self._manager.Event())
+            self.jobs[job.id] = job
+            self._by_key[key] = job
+            self._evict_finished()
+
+        job.future = self.executor.submit(_run_job, job.id, kind, payload, settings,
+                                          self.progress_queue, job.cancel_event)
+        job.future.add_done_callback(lambda future: self._finish(job, future))
+        logging.info(f"Trabalho {job.id} ({kind}) agendado: {payload['path']}")
+        return job, False
+
+    def cancel(self, job):
+        """Retira um cliente do trabalho; ele só é cancelado quando não resta nenhum."""
+        with self._changed:
+            if job.finished:
+                return
+            job.clients = max(0, job.clients - 1)
+            job.version += 1
+            self._changed.notify_all()
+            if job.clients:
+                return
+            if job.future is not None and job.future.cancel():
+                job.status = "cancelled"
+                job.finished_at = time.time()
+                job.version += 1
+                self._changed.notify_all()
+                return
+        # Já em execução: o processo encerra o ffmpeg ao ver o evento (detecção ou exportação)
+        job.cancel_event.set()
+
+    def _finish(self, job, future):
+        from video_operations import OperationCancelled
+
+        with self._changed:
+            if future.cancelled():
+                job.status = "cancelled"
+            else:
+                try:
+                    job.result = future.result()
+                    job.status = "done"
+                except OperationCancelled:
+                    job.status = "cancelled"
+                except Exception as e:
+                    job.status = "error"
+                    job.error = str(e)
+                    logging.error(f"Trabalho {job.id} falhou: {str(e)}")
+            job.finished_at = time.time()
+            job.version += 1
+            self._evict_finished()
+            self._changed.notify_all()
+
+    def _evict_finished(self):
+        """Descarta os trabalhos concluídos há mais de SERVER_PARAMS["finished_job_ttl"] e,
+        acima de SERVER_PARAMS["max_finished_jobs"], os mais antigos (chamar com self._changed).
+
+        Clientes ainda acompanhando um trabalho descartado recebem o estado final
+        normalmente; só GET /jobs/<id> passa a responder 404.
+        """
+        finished = sorted((job for job in self.jobs.values() if job.finished),
+                          key=lambda job: job.finished_at or 0)
+        expired = time.time() - SERVER_PARAMS["finished_job_ttl"]
+        excess = len(finished) - SERVER_PARAMS["max_finished_jobs"]
+        for i, job in enumerate(finished):
+            if i < excess or (job.finished_at or 0) < expired:
+                del self.jobs[job.id]
+                if self._by_key.get(job.key) is job:
+                    del self._by_key[job.key]
+
+    def _drain_progress(self):
+        while True:
+            try:
+                job_id, key, args = self.progress_queue.get()
+            except (EOFError, OSError):
+                return  # Manager encerrado
+            with self._changed:
+                job = self.jobs.get(job_id)
+                if job is None or job.finished:
+                    continue
+                if key is None:
+                    job.status = "running"
+                else:
+                    job.progress[key] = args
+                job.version += 1
+                self._changed.notify_all()
+
+    def snapshot(self, job):
+        """Estado do trabalho copiado com o lock, já que _drain_progress altera job.progress."""
+        with self._changed:
+            return job.snapshot()
+
+    def snapshots(self):
+        """Estado de todos os trabalhos conhecidos (GET /jobs)."""
+        with self._changed:
+            return [job.snapshot() for job in self.jobs.values()]
+
+    def wait_for_change(self, job, version, timeout):
+        """Espera o trabalho mudar desde version; retorna a versão atual."""
+        with self._changed:
+            self._changed.wait_for(lambda: job.version != version or job.finished, timeout)
+            return job.version
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self._manager.shutdown()
+
+class JobRequestHandler(BaseHTTPRequestHandler):
+    """Rotas HTTP da API descrita no início do módulo."""
+
+    manager = None  # JobManager, definido por serve()
+
+    def log_message(self, format, *args):
+        logging.debug(f"{self.address_string()} - {format % args}")
+
+    def _send_json(self, status, body):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _authorized(self):
+        """Confere o token (SERVER_PARAMS["token"]); sem token configurado, tudo é aceito."""
+        token = SERVER_PARAMS["token"]
+        if not token:
+            return True
+        sent = self.headers.get("Authorization", "")
+        if hmac.compare_digest(sent.encode("utf-8"), f"Bearer {token}".encode("utf-8")):
+            return True
+        self._send_json(401, {"error": "Token ausente ou inválido"})
+        return False
+
+    def _job_from_path(self):
+        parts = self.path.strip("/").split("/")
+        if len(parts) < 2 or parts[0] != "jobs":
+            return None, parts
+        return self.manager.jobs.get(parts[1]), parts
+
+    def do_POST(self):
+        if not self._authorized():
+            return
+        if self.path.rstrip("/") != "/jobs":
+            return self._send_json(404, {"error": "Rota desconhecida"})
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            payload = {k: request[k] for k in ("path", "output_dir", "segments") if k in request}
+            job, reused = self.manager.submit(request.get("type"), payload, request.get("settings"))
+        except PermissionError as e:
+            return self._send_json(403, {"error": str(e)})
+        except (ValueError, OSError) as e:
+            return self._send_json(400, {"error": str(e)})
+        self._send_json(200 if reused else 202, dict(self.manager.snapshot(job), deduplicated=reused))
+
+    def do_GET(self):
+        if not self._authorized():
+            return
+        if self.path.rstrip("/") == "/jobs":
+            return self._send_json(200, self.manager.snapshots())
+        job, parts = self._job_from_path()
+        if job is None:
+            return self._send_json(404, {"error": "Trabalho não encontrado"})
+        if len(parts) == 3 and parts[2] == "events":
+            return self._stream_events(job)
+        self._send_json(200, self.manager.snapshot(job))
+
+    def do_DELETE(self):
+        if not self._authorized():
+            return
+        job, _ = self._job_from_path()
+        if job is None:
+            return self._send_json(404, {"error": "Trabalho não encontrado"})
+        self.manager.cancel(job)
+        self._send_json(202, self.manager.snapshot(job))
+
+    def _stream_events(self, job):
+        """Envia o estado do trabalho a cada mudança (no máximo a cada EVENT_INTERVAL)
+        até ele terminar; progressos intermediários entre dois envios são agrupados."""
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson; charset=utf-8")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        self.close_connection = True
+
+        version = None
+        try:
+            while True:
+                version = self.manager.wait_for_change(job, version, EVENT_KEEPALIVE)
+                snapshot = self.manager.snapshot(job)
+                line = json.dumps(snapshot, ensure_ascii=False) + "\n"
+                self.wfile.write(line.encode("utf-8"))
+                self.wfile.flush()
+                if snapshot["status"] in ("done", "error", "cancelled"):
+                    return
+                time.sleep(EVENT_INTERVAL)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # Cliente desconectou; o trabalho continua para os demais
+
+def serve(host=None, port=None, workers=None):
+    """Inicia o servidor e atende até ser interrompido (Ctrl+C).
+
+    Raises:
+        ValueError: Se o endereço não for local e SERVER_PARAMS["token"] não estiver definido
+    """
+    host = host or SERVER_PARAMS["host"]
+    port = port or SERVER_PARAMS["port"]
+    if not SERVER_PARAMS["token"] and not _is_loopback(host):
+        raise ValueError(f"Escutar em {host} requer SERVER_PARAMS['token']: sem ele qualquer máquina "
+                         f"da rede poderia ler e gravar arquivos no servidor")
+    JobRequestHandler.manager = JobManager(workers)
+    httpd = ThreadingHTTPServer((host, port), JobRequestHandler)
+    httpd.daemon_threads = True
+    logging.info(f"Servidor de trabalhos em http://{host}:{port} "
+                 f"(pastas permitidas: {', '.join(allowed_roots())})")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+        JobRequestHandler.manager.shutdown()
+
+class JobClient:
+    """Cliente do servidor de trabalhos (usado pela interface quando SERVER_PARAMS["url"] está definido)."""
+
+    def __init__(self, url=None, timeout=30, token=None):
+        self.url = (url or SERVER_PARAMS["url"]).rstrip("/")
+        self.timeout = timeout
+        self.token = token or SERVER_PARAMS["token"]
+
+    def _request(self, method, path, body=None, timeout=None):
+        data = json.dumps(body).encode("utf-8") if body is not None else None
+        headers = {"Content-Type": "application/json"}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        request = urllib.request.Request(f"{self.url}{path}", data=data, method=method, headers=headers)
+        return urllib.request.urlopen(request, timeout=timeout or self.timeout)
+
+    def submit(self, kind, path, settings=None, **payload):
+        """Envia um trabalho e retorna o estado inicial (com "id" e "deduplicated")."""
+        body = dict(payload, type=kind, path=os.path.abspath(path), settings=settings or {})
+        if "output_dir" in body:
+            body["output_dir"] = os.path.abspath(body["output_dir"])
+        try:
+            with self._request("POST", "/jobs", body) as response:
+                return json.load(response)
+        except urllib.error.HTTPError as e:
+            raise RuntimeError(json.load(e).get("error", str(e))) from None
+
+    def status(self, job_id):
+        with self._request("GET", f"/jobs/{job_id}") as response:
+            return json.load(response)
+
+    def cancel(self, job_id):
+        with self._request("DELETE", f"/jobs/{job_id}") as response:
+            return json.load(response)
+
+    def events(self, job_id):
+        """Gera o estado do trabalho a cada atualização até ele terminar."""
+        with self._request("GET", f"/jobs/{job_id}/events", timeout=EVENT_KEEPALIVE * 2) as response:
+            for line in response:
+                if line.strip():
+                    yield json.loads(line)
+
+    def run(self, kind, path, settings=None, on_progress=None, cancel_event=None, **payload):
+        """Envia um trabalho e espera o resultado, repassando o progresso.
+
+        on_progress recebe os argumentos do progress_callback original: (etapa, %, velocidade)
+        na detecção e (segmento, %, velocidade) na exportação. Se cancel_event
+        for sinalizado, o cliente desiste do trabalho (ver JobManager.cancel) e
+        OperationCancelled é lançada.
+        """
+        from video_operations import OperationCancelled
+
+        job = self.submit(kind, path, settings, **payload)
+        if job["deduplicated"]:
+            logging.info(f"Trabalho já existente no servidor reaproveitado: {job['id']}")
+
+        for job in self.events(job["id"]):
+            if cancel_event is not None and cancel_event.is_set():
+                self.cancel(job["id"])
+                raise OperationCancelled()
+            if on_progress:
+                for args in job["progress"].values():
+                    on_progress(*args)
+            if job["status"] in ("done", "error", "cancelled"):
+                break
+        else:
+            raise RuntimeError("Conexão com o servidor encerrada antes do fim do trabalho")
+
+        if job["status"] == "cancelled":
+            raise OperationCancelled()
+        if job["status"] == "error":
+            raise RuntimeError(job["error"])
+        return job["result"]
+
+    def detect(self, path, settings=None, on_progress=None, cancel_event=None):
+        """Segmentos detectados pelo servidor (como main.extract_and_detect)."""
+        return self.run("detect", path, settings, on_progress, cancel_event)["segments"]
+
+    def export(self, path, output_dir, segments, settings=None, on_progress=None, cancel_event=None):
+        """Arquivos exportados pelo servidor (como main.export_segments)."""
+        return self.run("export", path, settings, on_progress, cancel_event,
+                        output_dir=output_dir, segments=segments)["outputs"]
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Servidor local de trabalhos de detecção e exportação.")
+    parser.add_argument("--host", help=f"Endereço (padrão: {SERVER_PARAMS['host']})")
+    parser.add_argument("--port", type=int, help=f"Porta (padrão: {SERVER_PARAMS['port']})")
+    parser.add_argument("-j", "--workers", type=int, help="Processos de trabalho (padrão: núcleos)")
+    parser.add_argument("--root", action="append",
+                        help="Pasta em que os clientes podem ler vídeos e gravar exportações "
+                             "(repetível; padrão: SERVER_PARAMS['roots'] ou a pasta atual)")
+    parser.add_argument("--config", help="Arquivo JSON com parâmetros (mesmo formato do cli.py)")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.config:
+        from cli import load_config_file
+        save_config(load_config_file(args.config))
+    if args.root:
+        save_config({"server": {"roots": args.root}})
+    try:
+        serve(args.host, args.port, args.workers)
+    except ValueError as e:
+        logging.error(str(e))
+        return 2
+    return 0
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    sys.exit(main())
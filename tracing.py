@@ -0,0 +1,241 @@
+"""
+Instrumentação leve: intervalos cronometrados (spans), contadores e pico de memória.
+
+Desativada por padrão e sem custo nesse caso: span() devolve um contexto vazio
+compartilhado e count() retorna na primeira linha. Para ativar:
+
+    AUTOEDIT_TRACE=trace.json python main.py video.mp4     (ou --trace trace.json no cli.py)
+    AUTOEDIT_PROFILE=1 ...                                 (também grava o cProfile da detecção)
+
+Ao final do processo o trace é gravado no formato de eventos do Chrome
+(abrir em chrome://tracing ou https://ui.perfetto.dev) e um resumo por etapa
+vai para o log. Processos filhos (ex.: o pool do modo em lote) gravam num
+arquivo próprio, com o PID no nome.
+"""
+import os
+import sys
+import json
+import time
+import atexit
+import logging
+import threading
+import contextlib
+import multiprocessing
+import multiprocessing.util
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+TRACE_ENV = "AUTOEDIT_TRACE"
+PROFILE_ENV = "AUTOEDIT_PROFILE"
+
+# Contexto vazio devolvido por span() com a instrumentação desativada
+_NULL_SPAN = contextlib.nullcontext()
+
+_tracer = None
+
+def peak_rss_mb():
+    """Pico de memória residente do processo em MB (None onde não há resource)."""
+    if resource is None:
+        return None
+    # ru_maxrss vem em KB no Linux e em bytes no macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+def children_cpu_seconds():
+    """CPU (usuário + sistema) já consumida pelos processos filhos encerrados."""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+class Tracer:
+    """Acumula spans e contadores de um processo."""
+
+    def __init__(self, path, profile=False):
+        self.path = path
+        self.profile_enabled = profile
+        self.pid = os.getpid()
+        self.started = time.perf_counter()
+        self.events = []
+        self.counters = {}
+        self.spans = {}  # nome -> [quantidade, total, máximo] em segundos
+        self._lock = threading.Lock()
+
+    def _now_us(self):
+        return (time.perf_counter() - self.started) * 1_000_000
+
+    @contextlib.contextmanager
+    def span(self, name, **args):
+        begin = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - begin
+            event = {
+                "name": name, "ph": "X", "pid": self.pid, "tid": threading.get_ident(),
+                "ts": (begin - self.started) * 1_000_000, "dur": elapsed * 1_000_000,
+            }
+            if args:
+                event["args"] = args
+            rss = peak_rss_mb()
+            with self._lock:
+                self.events.append(event)
+                if rss is not None:
+                    self.events.append({"name": "peak_rss_mb", "ph": "C", "pid": self.pid,
+                                        "ts": event["ts"] + event["dur"], "args": {"MB": round(rss, 1)}})
+                stats = self.spans.setdefault(name, [0, 0.0, 0.0])
+                stats[0] += 1
+                stats[1] += elapsed
+                stats[2] = max(stats[2], elapsed)
+
+    @contextlib.contextmanager
+    def process_span(self, name, **args):
+        # A CPU de um filho só entra em RUSAGE_CHILDREN quando ele é coletado (wait), então
+        # a diferença é exata com um ffmpeg por vez e aproximada com vários em paralelo
+        cpu = children_cpu_seconds()
+        begin = time.perf_counter()
+        try:
+            with self.span(name, **args):
+                yield
+        finally:
+            self.count("ffmpeg_runs")
+            self.count("ffmpeg_wall_seconds", time.perf_counter() - begin)
+            if cpu is not None:
+                self.count("ffmpeg_cpu_seconds", children_cpu_seconds() - cpu)
+
+    def count(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def chrome_trace(self):
+        """Eventos no formato JSON de trace do Chrome."""
+        with self._lock:
+            events = list(self.events)
+            counters = dict(self.counters)
+        end = self._now_us()
+        events.append({"name": "counters", "ph": "C", "pid": self.pid, "ts": end,
+                       "args": {name: value for name, value in counters.items()}})
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def summary_table(self):
+        """Tabela com tempo por etapa, contadores e pico de memória para o log."""
+        lines = [f"{'etapa':<24} {'vezes':>6} {'total(s)':>10} {'média(ms)':>10} {'máx(ms)':>10}"]
+        with self._lock:
+            spans = sorted(self.spans.items(), key=lambda item: item[1][1], reverse=True)
+            counters = sorted(self.counters.items())
+        for name, (calls, total, longest) in spans:
+            lines.append(f"{name:<24} {calls:>6} {total:>10.3f} {total / calls * 1000:>10.1f} "
+                         f"{longest * 1000:>10.1f}")
+        for name, value in counters:
+            value = f"{value:.3f}" if isinstance(value, float) else f"{value:,}"
+            lines.append(f"{name:<24} {value:>39}")
+        rss = peak_rss_mb()
+        if rss is not None:
+            lines.append(f"{'pico de memória (MB)':<24} {rss:>39.1f}")
+        return "\n".join(lines)
+
+    def output_path(self):
+        """Caminho do trace; processos filhos acrescentam o PID para não sobrescrever o do pai."""
+        if multiprocessing.parent_process() is None:
+            return self.path
+        root, ext = os.path.splitext(self.path)
+        return f"{root}-{self.pid}{ext or '.json'}"
+
+    def write(self, path=None):
+        path = path or self.output_path()
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.chrome_trace(), f)
+        return path
+
+def enabled():
+    return _tracer is not None
+
+_finished = False
+
+def enable(path="trace.json", profile=False):
+    """Ativa a instrumentação neste processo e grava o trace ao sair."""
+    global _tracer, _finished
+    if _tracer is None:
+        atexit.register(finish)
+        # Processos do multiprocessing saem com os._exit (sem atexit) e limpam os
+        # finalizadores ao iniciar; este gancho registra o finalizador de novo em cada um
+        _register_finalizer()
+        multiprocessing.util.register_after_fork(sys.modules[__name__], _after_process_start)
+    _tracer = Tracer(path, profile)
+    _finished = False
+    return _tracer
+
+def _register_finalizer():
+    multiprocessing.util.Finalize(None, finish, exitpriority=0)
+
+def _after_process_start(_module):
+    """Processos filhos começam um trace vazio (sem os eventos herdados do pai)."""
+    global _tracer, _finished
+    if _tracer is not None:
+        _tracer = Tracer(_tracer.path, _tracer.profile_enabled)
+        _finished = False
+        _register_finalizer()
+
+def span(name, **args):
+    """Contexto que cronometra um trecho: with tracing.span("decode"): ..."""
+    if _tracer is None:
+        return _NULL_SPAN
+    return _tracer.span(name, **args)
+
+def process_span(name, **args):
+    """Como span(), para trechos que executam um processo ffmpeg: soma também o tempo
+    de parede e de CPU dos ffmpeg nos contadores."""
+    if _tracer is None:
+        return _NULL_SPAN
+    return _tracer.process_span(name, **args)
+
+def count(name, value=1):
+    """Soma value ao contador name."""
+    if _tracer is None:
+        return
+    _tracer.count(name, value)
+
+@contextlib.contextmanager
+def _profiled(name):
+    import cProfile
+    import pstats
+    import io
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        root, _ = os.path.splitext(_tracer.output_path())
+        profile_path = f"{root}.{name}.prof"
+        profiler.dump_stats(profile_path)
+        report = io.StringIO()
+        pstats.Stats(profiler, stream=report).sort_stats("cumulative").print_stats(20)
+        logging.info(f"Perfil de '{name}' gravado em {profile_path}:\n{report.getvalue()}")
+
+def profile(name):
+    """Contexto que captura um cProfile do trecho quando o modo de perfil está ativo."""
+    if _tracer is None or not _tracer.profile_enabled:
+        return _NULL_SPAN
+    return _profiled(name)
+
+def finish():
+    """Grava o trace e registra o resumo no log (chamado automaticamente ao sair)."""
+    global _finished
+    if _tracer is None or _finished:
+        return
+    _finished = True
+    try:
+        path = _tracer.write()
+        logging.info(f"Trace gravado em {path}\n{_tracer.summary_table()}")
+    except OSError as e:
+        logging.warning(f"Erro ao gravar o trace: {str(e)}")
+
+# Ativação pela variável de ambiente (herdada pelos processos filhos)
+if os.environ.get(TRACE_ENV):
+    enable(os.environ[TRACE_ENV] if os.environ[TRACE_ENV] != "1" else "trace.json",
+           profile=os.environ.get(PROFILE_ENV, "") not in ("", "0"))
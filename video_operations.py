@@ -2,27 +2,205 @@ import os
 import ffmpeg
 import logging
 import tempfile
+import subprocess
+import threading
+import numpy as np
+import tracing
 from config import AUDIO_EXTRACTION_PARAMS, EXPORT_PARAMS
+from keyframe_index import get_keyframe_index
+from probe import probe, try_probe
 
-def extract_audio(video_path, audio_output=None):
-    """Extrai áudio do vídeo para processamento."""
+class OperationCancelled(Exception):
+    """A operação foi interrompida pelo usuário (ver o parâmetro cancel_event)."""
+
+# Intervalo para verificar o pedido de cancelamento enquanto um ffmpeg roda (s)
+CANCEL_POLL_SECONDS = 0.1
+
+def _wait_process(process, cancel_event=None):
+    """Espera o processo terminar; se cancel_event for sinalizado antes, mata o ffmpeg."""
+    if cancel_event is None:
+        return process.wait()
+    while True:
+        try:
+            return process.wait(timeout=CANCEL_POLL_SECONDS)
+        except subprocess.TimeoutExpired:
+            if cancel_event.is_set():
+                process.kill()
+                process.wait()
+                raise OperationCancelled()
+
+def _kill_on_cancel(process, cancel_event):
+    """Encerra o ffmpeg se cancel_event for sinalizado enquanto ele roda.
+
+    Para leituras bloqueantes do stdout (ex.: linhas do ametadata, que podem
+    demorar a chegar): o laço de leitura termina com o fim do pipe e quem chamou
+    verifica o evento para lançar OperationCancelled.
+    """
+    if cancel_event is None:
+        return
+
+    def watch():
+        while process.poll() is None:
+            if cancel_event.wait(CANCEL_POLL_SECONDS):
+                process.kill()
+                return
+
+    threading.Thread(target=watch, daemon=True).start()
+
+# Chaves emitidas pelo ffmpeg com -progress (o resto do stderr são mensagens de erro)
+_PROGRESS_KEYS = {
+    "frame", "fps", "bitrate", "total_size", "out_time_us", "out_time_ms", "out_time",
+    "dup_frames", "drop_frames", "speed", "progress",
+}
+
+class FFmpegProgress:
+    """Lê o stderr de um ffmpeg rodando com -progress pipe:2 numa thread própria.
+
+    A cada bloco de progresso chama callback(fração, velocidade), onde fração vai
+    de 0 a 1 (None se a duração for desconhecida) e velocidade é o fator em
+    relação ao tempo real (ex.: 35.2 = 35x mais rápido que a reprodução).
+    As demais linhas do stderr são guardadas para mensagens de erro.
+    """
+
+    def __init__(self, stream, duration=None, callback=None):
+        self.duration = duration
+        self.callback = callback
+        self.out_time = 0.0
+        self.speed = None
+        self._stream = stream
+        self._errors = []
+        self._thread = threading.Thread(target=self._read, daemon=True)
+        self._thread.start()
+
+    @property
+    def fraction(self):
+        if not self.duration:
+            return None
+        return min(1.0, max(0.0, self.out_time / self.duration))
+
+    @property
+    def stderr(self):
+        """Mensagens do ffmpeg (sem as linhas de progresso), em bytes como em ffmpeg.Error."""
+        return "\n".join(self._errors).encode("utf-8")
+
+    def join(self):
+        self._thread.join()
+
+    def _read(self):
+        for raw in iter(self._stream.readline, b""):
+            line = raw.decode("utf-8", errors="replace").strip()
+            key, sep, value = line.partition("=")
+            if not sep or key not in _PROGRESS_KEYS:
+                if line:
+                    self._errors.append(line)
+                continue
+
+            # out_time_ms também vem em microssegundos, apesar do nome; é a única
+            # chave de tempo numérica nas versões do ffmpeg anteriores à 4.3
+            if key in ("out_time_us", "out_time_ms") and value.isdigit():
+                self.out_time = int(value) / 1_000_000
+            elif key == "speed" and value.endswith("x"):
+                try:
+                    self.speed = float(value[:-1])
+                except ValueError:
+                    pass
+            elif key == "progress" and self.callback:
+                # "progress" fecha cada bloco de estatísticas
+                self.callback(1.0 if value == "end" else self.fraction, self.speed)
+
+def _run_with_progress(stream_spec, duration=None, progress_callback=None, trace_name="ffmpeg",
+                       cancel_event=None):
+    """Executa um comando ffmpeg-python; com callback, repassa o progresso do -progress.
+
+    Com cancel_event, o ffmpeg é encerrado e OperationCancelled é lançada se o
+    evento for sinalizado durante a execução.
+    """
+    with tracing.process_span(trace_name):
+        if progress_callback is None and cancel_event is None:
+            return stream_spec.run(capture_stdout=True, capture_stderr=True, quiet=True)
+        _run_async_with_progress(stream_spec, duration, progress_callback, cancel_event)
+
+def _run_async_with_progress(stream_spec, duration, progress_callback, cancel_event=None):
+    process = (
+        stream_spec
+        .global_args("-nostdin", "-nostats", "-loglevel", "error", "-progress", "pipe:2")
+        .run_async(pipe_stderr=True)
+    )
+    progress = FFmpegProgress(process.stderr, duration, progress_callback)
+    _wait_process(process, cancel_event)
+    progress.join()
+    if process.returncode != 0:
+        raise ffmpeg.Error("ffmpeg", b"", progress.stderr)
+
+# Encoders usados pela renderização inteligente para recodificar trechos no mesmo codec da origem
+SMART_RENDER_ENCODERS = {
+    "h264": "libx264",
+    "hevc": "libx265",
+}
+
+def export_mode(video_path):
+    """Como os segmentos do vídeo são cortados: "copy", "smart" ou "reencode".
+
+    Com EXPORT_PARAMS["copy_codec"] = "auto" a escolha usa a inspeção da origem
+    (ver probe.py): cópia de codec se os quadros-chave forem próximos o bastante
+    (EXPORT_PARAMS["auto_copy_max_gop"]); com GOPs longos, renderização
+    inteligente se houver encoder para o codec, senão recodificação completa.
+    """
+    if EXPORT_PARAMS["smart_render"]:
+        return "smart"
+    if EXPORT_PARAMS["copy_codec"] != "auto":
+        return "copy" if EXPORT_PARAMS["copy_codec"] else "reencode"
+
+    info = try_probe(video_path)
+    if info is None or info.video is None or info.max_gop is None:
+        # Sem vídeo (ou sem informação de GOP) a cópia continua sendo a escolha padrão
+        return "copy"
+    if info.max_gop <= EXPORT_PARAMS["auto_copy_max_gop"]:
+        return "copy"
+    if info.video["codec_name"] in SMART_RENDER_ENCODERS:
+        return "smart"
+    return "reencode"
+
+def _audio_input(video_path, **input_options):
+    """Faixa de áudio a analisar como entrada do ffmpeg (ver MediaInfo.audio_position).
+
+    A faixa é escolhida explicitamente (-map 0:a:N) segundo
+    AUDIO_EXTRACTION_PARAMS["audio_stream"]; se a inspeção falhar, fica a
+    escolha automática do ffmpeg.
+    """
+    source = ffmpeg.input(video_path, **input_options)
+    info = try_probe(video_path)
+    if info is None:
+        return source.audio
+    return source[f"a:{info.audio_position()}"]
+
+def extract_audio(video_path, audio_output=None, progress_callback=None, cancel_event=None):
+    """Extrai áudio do vídeo para processamento.
+    
+    progress_callback(fração, velocidade), se informado, recebe o progresso do ffmpeg.
+    cancel_event (threading.Event), se sinalizado, encerra o ffmpeg e lança OperationCancelled.
+    """
     try:
         if audio_output is None:
-            # Cria um arquivo temporário em um local com permissão garantida
-            temp_dir = tempfile.gettempdir()
-            audio_output = os.path.join(temp_dir, f"audio_{os.getpid()}.wav")
+            # Cria um arquivo temporário com nome único (extrações simultâneas no
+            # mesmo processo não podem compartilhar o arquivo)
+            fd, audio_output = tempfile.mkstemp(prefix="audio_", suffix=".wav")
+            os.close(fd)
         
-        (
-            ffmpeg
-            .input(video_path)
+        duration = _duration_for_progress(video_path) if progress_callback else None
+        _run_with_progress(
+            _audio_input(video_path)
             .output(
                 audio_output, 
                 acodec=AUDIO_EXTRACTION_PARAMS["audio_codec"], 
                 ac=AUDIO_EXTRACTION_PARAMS["audio_channels"], 
                 ar=str(AUDIO_EXTRACTION_PARAMS["sample_rate"])
             )
-            .overwrite_output()
-            .run(capture_stdout=True, capture_stderr=True, quiet=True)
+            .overwrite_output(),
+            duration,
+            progress_callback,
+            trace_name="ffmpeg.extract_audio",
+            cancel_event=cancel_event
         )
         return audio_output
     except ffmpeg.Error as e:
@@ -32,23 +210,524 @@ def extract_audio(video_path, audio_output=None):
         logging.error(f"Erro inesperado: {str(e)}")
         raise
 
-def cut_video_segment(video_path, output_path, start, end):
-    """Corta um segmento de vídeo mantendo as características originais."""
+def get_media_duration(video_path):
+    """Duração do arquivo em segundos segundo o ffprobe (None se desconhecida)."""
+    try:
+        info = ffmpeg.probe(video_path)
+    except ffmpeg.Error as e:
+        logging.error(f"Erro ao analisar mídia: {e.stderr.decode('utf-8', errors='replace')}")
+        raise
+    duration = info.get("format", {}).get("duration")
+    return float(duration) if duration not in (None, "N/A") else None
+
+def _decoded_length_ms(progress, video_path):
+    """Duração em ms do áudio decodificado com -f null: o último out_time do -progress
+    ou, se o ffmpeg não o informou, a duração do arquivo segundo o ffprobe."""
+    if progress.out_time > 0:
+        return round(progress.out_time * 1000)
+    logging.warning(f"O ffmpeg não informou o tempo decodificado; usando a duração do ffprobe: {video_path}")
+    duration = get_media_duration(video_path)
+    return round(duration * 1000) if duration else 0
+
+def _duration_for_progress(video_path):
+    """Duração usada para calcular a fração de progresso (None se o ffprobe falhar)."""
+    try:
+        return probe(video_path).duration
+    except Exception:
+        return None
+
+def stream_audio(video_path, block_size=None, progress_callback=None, start=None, duration=None,
+                 cancel_event=None):
+    """Decodifica o áudio do vídeo e entrega blocos PCM s16le como arrays NumPy.
+
+    O ffmpeg escreve o PCM bruto no stdout e os blocos são lidos com tamanho fixo,
+    então nenhum arquivo temporário é criado e a memória usada não depende da
+    duração do vídeo.
+
+    Args:
+        video_path: Caminho para o arquivo de vídeo
+        block_size: Quadros de áudio por bloco (padrão: AUDIO_EXTRACTION_PARAMS["block_size"])
+        progress_callback: Função opcional (fração, velocidade) com o progresso do ffmpeg
+        start: Início do trecho a decodificar em segundos (padrão: início do arquivo)
+        duration: Duração do trecho em segundos (padrão: até o fim do arquivo)
+        cancel_event: threading.Event opcional; se sinalizado, encerra o ffmpeg e
+            lança OperationCancelled no próximo bloco
+    """
+    block_size = block_size or AUDIO_EXTRACTION_PARAMS["block_size"]
+    channels = AUDIO_EXTRACTION_PARAMS["audio_channels"]
+    block_bytes = block_size * channels * 2  # s16le = 2 bytes por amostra
+
+    # -ss na entrada busca direto no trecho e o ffmpeg descarta as amostras antes de start
+    input_options = {}
+    if start:
+        input_options["ss"] = start
+    if duration is not None:
+        input_options["t"] = duration
+
+    process = (
+        _audio_input(video_path, **input_options)
+        .output(
+            "pipe:",
+            format="s16le",
+            acodec="pcm_s16le",
+            ac=channels,
+            ar=str(AUDIO_EXTRACTION_PARAMS["sample_rate"])
+        )
+        .global_args("-nostdin", "-nostats", "-loglevel", "error", "-progress", "pipe:2")
+        .run_async(pipe_stdout=True, pipe_stderr=True)
+    )
+
+    # Consome o stderr em paralelo para o ffmpeg nunca bloquear com o pipe cheio
+    if duration is None and progress_callback:
+        duration = _duration_for_progress(video_path)
+        if duration is not None and start:
+            duration -= start
+    progress = FFmpegProgress(process.stderr, duration, progress_callback)
+
+    with tracing.process_span("ffmpeg.decode_audio"):
+        try:
+            while True:
+                if cancel_event is not None and cancel_event.is_set():
+                    raise OperationCancelled()
+                data = process.stdout.read(block_bytes)
+                if not data:
+                    break
+                # Descarta um byte solto caso o último bloco venha truncado
+                usable = len(data) - len(data) % (2 * channels)
+                tracing.count("audio_bytes_read", usable)
+                yield np.frombuffer(data[:usable], dtype=np.int16)
+
+            process.wait()
+            progress.join()
+            if process.returncode != 0:
+                raise ffmpeg.Error("ffmpeg", None, progress.stderr)
+        except ffmpeg.Error as e:
+            logging.error(f"Erro ao extrair áudio: {e.stderr.decode('utf-8', errors='replace')}")
+            raise
+        finally:
+            # Encerra o ffmpeg se o consumidor parar antes do fim do arquivo
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+            process.stdout.close()
+
+def detect_silence_ffmpeg(video_path, silence_thresh, min_silence_len, progress_callback=None,
+                          cancel_event=None):
+    """Detecta os intervalos de silêncio com o filtro silencedetect do próprio ffmpeg.
+
+    Nenhum PCM passa pelo Python: o ffmpeg decodifica e analisa o áudio e só os
+    eventos de silêncio (impressos pelo ametadata na saída padrão) são lidos,
+    linha a linha, enquanto o processo roda.
+
+    Args:
+        video_path: Caminho para o arquivo de vídeo (ou áudio)
+        silence_thresh: Limiar de silêncio em dBFS
+        min_silence_len: Duração mínima de silêncio em ms
+        progress_callback: Função opcional (fração, velocidade) com o progresso do ffmpeg
+        cancel_event: threading.Event opcional; se sinalizado, encerra o ffmpeg e
+            lança OperationCancelled
+
+    Returns:
+        Tupla (intervalos, duração), com os intervalos [início, fim] e a duração do áudio em ms
+    """
+    process = (
+        _audio_input(video_path)
+        .filter(
+            "aformat",
+            sample_rates=str(AUDIO_EXTRACTION_PARAMS["sample_rate"]),
+            channel_layouts="mono" if AUDIO_EXTRACTION_PARAMS["audio_channels"] == 1 else "stereo"
+        )
+        .filter("silencedetect", noise=f"{silence_thresh}dB", d=min_silence_len / 1000)
+        .filter("ametadata", mode="print", file="pipe:1")
+        .output("-", format="null")
+        .global_args("-nostdin", "-nostats", "-loglevel", "error", "-progress", "pipe:2")
+        .run_async(pipe_stdout=True, pipe_stderr=True)
+    )
+
+    duration = _duration_for_progress(video_path) if progress_callback else None
+    progress = FFmpegProgress(process.stderr, duration, progress_callback)
+    _kill_on_cancel(process, cancel_event)
+
+    silence_ranges = []
+    silence_start = None
+    with tracing.process_span("ffmpeg.silencedetect"):
+        try:
+            for raw in iter(process.stdout.readline, b""):
+                key, _, value = raw.decode("utf-8", errors="replace").strip().partition("=")
+                if key == "lavfi.silence_start":
+                    silence_start = max(0, round(float(value) * 1000))
+                elif key == "lavfi.silence_end" and silence_start is not None:
+                    silence_ranges.append([silence_start, round(float(value) * 1000)])
+                    silence_start = None
+
+            process.wait()
+            progress.join()
+            if cancel_event is not None and cancel_event.is_set():
+                raise OperationCancelled()
+            if process.returncode != 0:
+                raise ffmpeg.Error("ffmpeg", None, progress.stderr)
+        except ffmpeg.Error as e:
+            logging.error(f"Erro ao detectar silêncio com o ffmpeg: {e.stderr.decode('utf-8')}")
+            raise
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+
+    audio_len = _decoded_length_ms(progress, video_path)
+    if silence_start is not None:
+        # Versões antigas do ffmpeg não fecham o silêncio que vai até o fim do arquivo
+        silence_ranges.append([silence_start, audio_len])
+    return silence_ranges, audio_len
+
+def coarse_energy_ffmpeg(video_path, window_ms=100, progress_callback=None, cancel_event=None):
+    """Energia média por janela de window_ms calculada pelo filtro astats do ffmpeg.
+
+    O áudio é convertido para o formato de análise (AUDIO_EXTRACTION_PARAMS) e
+    agrupado em janelas fixas; só o nível RMS de cada janela chega ao Python,
+    já na mesma escala do envelope por milissegundo (média dos quadrados de
+    amostras int16). cancel_event funciona como em detect_silence_ffmpeg.
+
+    Returns:
+        Tupla (energias, duração), com um float32 por janela e a duração do áudio em ms
+    """
+    sample_rate = AUDIO_EXTRACTION_PARAMS["sample_rate"]
+    process = (
+        _audio_input(video_path)
+        .filter(
+            "aformat",
+            sample_fmts="s16",
+            sample_rates=str(sample_rate),
+            channel_layouts="mono" if AUDIO_EXTRACTION_PARAMS["audio_channels"] == 1 else "stereo"
+        )
+        .filter("asetnsamples", n=sample_rate * window_ms // 1000, p=0)
+        .filter("astats", metadata=1, reset=1, measure_perchannel="none", measure_overall="RMS_level")
+        .filter("ametadata", mode="print", key="lavfi.astats.Overall.RMS_level", file="pipe:1")
+        .output("-", format="null")
+        .global_args("-nostdin", "-nostats", "-loglevel", "error", "-progress", "pipe:2")
+        .run_async(pipe_stdout=True, pipe_stderr=True)
+    )
+
+    duration = _duration_for_progress(video_path) if progress_callback else None
+    progress = FFmpegProgress(process.stderr, duration, progress_callback)
+    _kill_on_cancel(process, cancel_event)
+
+    levels = []
+    with tracing.process_span("ffmpeg.coarse_energy"):
+        try:
+            for raw in iter(process.stdout.readline, b""):
+                key, _, value = raw.decode("utf-8", errors="replace").strip().partition("=")
+                if key == "lavfi.astats.Overall.RMS_level":
+                    levels.append(float(value))  # "-inf" em janelas de silêncio digital
+
+            process.wait()
+            progress.join()
+            if cancel_event is not None and cancel_event.is_set():
+                raise OperationCancelled()
+            if process.returncode != 0:
+                raise ffmpeg.Error("ffmpeg", None, progress.stderr)
+        except ffmpeg.Error as e:
+            logging.error(f"Erro ao calcular o envelope grosso: {e.stderr.decode('utf-8')}")
+            raise
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+
+    # dBFS -> média dos quadrados na escala int16 (0 dBFS = amplitude 32768)
+    amplitudes = 10 ** (np.asarray(levels, dtype=np.float64) / 20) * 32768
+    return (amplitudes ** 2).astype(np.float32), _decoded_length_ms(progress, video_path)
+
+def cut_video_segment(video_path, output_path, start, end, progress_callback=None, cancel_event=None,
+                      mode=None):
+    """Corta um segmento de vídeo mantendo as características originais.
+    
+    progress_callback(fração, velocidade), se informado, recebe o progresso do ffmpeg.
+    cancel_event (threading.Event), se sinalizado durante o corte, encerra o ffmpeg
+    e lança OperationCancelled.
+    mode ("copy", "smart" ou "reencode") evita recalcular export_mode a cada segmento.
+    """
+    if cancel_event is not None and cancel_event.is_set():
+        raise OperationCancelled()
+    
+    mode = mode or export_mode(video_path)
+    if mode == "smart":
+        with tracing.span("smart_render"):
+            return cut_video_segment_smart(video_path, output_path, start, end, progress_callback,
+                                           cancel_event)
+    
     try:
         output_options = {}
         
-        # Se estiver configurado para copiar codecs originais
-        if EXPORT_PARAMS["copy_codec"]:
+        # Cópia dos codecs originais (sem opções, o ffmpeg recodifica)
+        if mode == "copy":
             output_options["c"] = "copy"
         
-        (
+        _run_with_progress(
             ffmpeg
             .input(video_path, ss=start, to=end)
             .output(output_path, **output_options)
-            .overwrite_output()
-            .run(capture_stdout=True, capture_stderr=True, quiet=True)
+            .overwrite_output(),
+            end - start,
+            progress_callback,
+            trace_name="ffmpeg.cut",
+            cancel_event=cancel_event
         )
         return True
     except ffmpeg.Error as e:
         logging.error(f"Erro ao cortar vídeo: {e.stderr.decode('utf-8')}")
-        raise
\ No newline at end of file
+        raise
+
+# Folga (s) subtraída do início de cada corte na passagem única, para o quadro-chave
+# do início não ser descartado por arredondamento do tempo no índice
+SINGLE_PASS_START_TOLERANCE = 0.001
+
+def cut_video_segments(video_path, cuts, mode=None, progress_callback=None, cancel_event=None):
+    """Corta vários segmentos com uma única execução do ffmpeg, lendo o arquivo de origem uma só vez.
+
+    Cada saída recebe seu próprio -ss/-to como opção de saída: o ffmpeg lê a
+    entrada sequencialmente e grava os pacotes de cada intervalo na saída
+    correspondente. Com cópia de codec o vídeo de cada parte começa no primeiro
+    quadro-chave a partir do início pedido, e o áudio no próprio início: os
+    inícios precisam estar em quadros-chave (ver KeyframeIndex.snap_segment)
+    para as faixas ficarem alinhadas.
+
+    Args:
+        video_path: Caminho para o arquivo de vídeo
+        cuts: Lista de tuplas (output_path, start, end), com tempos em segundos
+        mode: "copy" ou "reencode" (padrão: export_mode)
+        progress_callback: Função opcional (fração, velocidade), com a fração do
+            arquivo já lida até o fim do último corte (posição = fração * maior fim)
+        cancel_event: threading.Event opcional; se sinalizado, encerra o ffmpeg e
+            lança OperationCancelled (as saídas incompletas ficam para quem chamou)
+    """
+    try:
+        output_options = {}
+        
+        # Cópia dos codecs originais (sem opções, o ffmpeg recodifica)
+        if (mode or export_mode(video_path)) == "copy":
+            output_options["c"] = "copy"
+        
+        source = ffmpeg.input(video_path)
+        outputs = [
+            source.output(output_path, ss=max(0.0, start - SINGLE_PASS_START_TOLERANCE), to=end,
+                          **output_options)
+            for output_path, start, end in cuts
+        ]
+        with tracing.span("cut_single_pass", segments=len(cuts)):
+            _run_with_progress(
+                ffmpeg.merge_outputs(*outputs).overwrite_output(),
+                max(end for _, _, end in cuts),
+                progress_callback,
+                trace_name="ffmpeg.cut_single_pass",
+                cancel_event=cancel_event
+            )
+        return True
+    except ffmpeg.Error as e:
+        logging.error(f"Erro ao cortar vídeo em passagem única: {e.stderr.decode('utf-8')}")
+        raise
+
+def cut_video_segment_smart(video_path, output_path, start, end, progress_callback=None, cancel_event=None):
+    """Corte com precisão de quadro recodificando só os GOPs parciais das pontas.
+
+    O trecho entre o início pedido e o primeiro quadro-chave (e entre o último
+    quadro-chave e o fim) é recodificado no mesmo codec da origem, com o mesmo
+    perfil, nível, pix_fmt e base de tempo; os GOPs inteiros do meio são
+    copiados sem recodificação. As partes são concatenadas sem perdas e o áudio
+    é copiado da origem para o intervalo pedido.
+
+    O segmento inteiro é recodificado quando o codec não tem encoder em
+    SMART_RENDER_ENCODERS, o perfil não tem equivalente no encoder ou a parte
+    recodificada não sai com os mesmos parâmetros da origem (a concatenação
+    ficaria ilegível em muitos decodificadores).
+
+    progress_callback(fração, velocidade) recebe o progresso somado das etapas e
+    cancel_event (threading.Event), se sinalizado, encerra o ffmpeg da etapa em
+    andamento e lança OperationCancelled.
+    """
+    try:
+        video_stream = _video_stream_info(video_path)
+        encoder = SMART_RENDER_ENCODERS.get(video_stream.get("codec_name")) if video_stream else None
+        encode_options = _matching_encode_options(video_stream, encoder) if encoder else None
+
+        # Os tempos do índice são arredondados ao microssegundo: um quadro-chave a
+        # menos da folga da passagem única do início ou do fim conta como a ponta
+        tolerance = SINGLE_PASS_START_TOLERANCE
+        keyframes = get_keyframe_index(video_path)
+        first_keyframe = keyframes.snap_after(start - tolerance)
+        last_keyframe = keyframes.snap_before(end + tolerance)
+
+        if encode_options is None or first_keyframe >= last_keyframe:
+            # Sem um GOP inteiro para copiar (ou sem encoder compatível)
+            return _reencode_segment(video_path, output_path, start, end, progress_callback, cancel_event)
+
+        # Etapas (nome, início, fim, recodifica) e seu peso no progresso total. Os
+        # cortes recuam a folga, como o início da passagem única; só o início da
+        # cópia avança, porque ela começa no quadro-chave em ou antes dele. Assim
+        # cada quadro-chave fica só na parte copiada e nenhum GOP sai repetido
+        steps = []
+        if first_keyframe - start > tolerance:
+            steps.append(("head", max(0.0, start - tolerance), first_keyframe - tolerance, True))
+        steps.append(("middle", first_keyframe + tolerance, last_keyframe - tolerance, False))
+        if end - last_keyframe > tolerance:
+            steps.append(("tail", last_keyframe - tolerance, end - tolerance, True))
+        weights = [(b - a) * (1 if encode else _SMART_COPY_WEIGHT) for _, a, b, encode in steps]
+        weights.append((end - start) * _SMART_COPY_WEIGHT)  # Concatenação final
+        total_weight = sum(weights)
+
+        def step_progress(i):
+            if progress_callback is None:
+                return None
+            done = sum(weights[:i])
+
+            def report(fraction, speed=None):
+                if fraction is not None:
+                    progress_callback((done + fraction * weights[i]) / total_weight, speed)
+            return report
+
+        with tempfile.TemporaryDirectory(prefix="smart_render_") as work_dir:
+            parts = []
+            verified = False
+            for i, (name, part_start, part_end, encode) in enumerate(steps):
+                parts.append(os.path.join(work_dir, f"{name}.mkv"))
+                if encode:
+                    # trim pelo tempo de apresentação: o -to do ffmpeg conta a duração a
+                    # partir do primeiro quadro decodificado, não do -ss, e passaria do fim
+                    video = (
+                        ffmpeg
+                        .input(video_path, ss=part_start)
+                        .video
+                        .trim(end=part_end - part_start)
+                        .setpts("PTS-STARTPTS")
+                    )
+                    spec = ffmpeg.output(video, parts[-1], f="matroska", **encode_options)
+                else:
+                    # A cópia com -to para pelo tempo de decodificação: com quadros B o
+                    # quadro-chave seguinte (e o que vem depois dele) ainda entram, então
+                    # descarta os pacotes exibidos a partir do fim da parte
+                    spec = (
+                        ffmpeg
+                        .input(video_path, ss=part_start, to=part_end)
+                        .output(parts[-1], an=None, vcodec="copy", f="matroska",
+                                **{"bsf:v": f"noise=drop=gte(pts*tb\\,{part_end - part_start:.6f})"})
+                    )
+                _run_with_progress(spec.overwrite_output(), part_end - part_start, step_progress(i),
+                                   trace_name=f"ffmpeg.smart_render.{name}", cancel_event=cancel_event)
+
+                if encode and not verified:
+                    mismatch = _parameter_mismatch(parts[-1], video_stream)
+                    if mismatch:
+                        logging.warning(f"Parte recodificada difere da origem ({mismatch}); "
+                                        f"recodificando o segmento inteiro")
+                        return _reencode_segment(video_path, output_path, start, end,
+                                                 progress_callback, cancel_event)
+                    verified = True
+
+            list_path = os.path.join(work_dir, "parts.txt")
+            with open(list_path, "w", encoding="utf-8") as f:
+                for part in parts:
+                    escaped = part.replace("'", "'\\''")
+                    f.write(f"file '{escaped}'\n")
+
+            output_options = {"c": "copy"}
+            timescale = _timescale(video_stream)
+            if timescale and os.path.splitext(output_path)[1].lower() in (".mp4", ".m4v", ".mov"):
+                # Mesma base de tempo da origem (o Matroska das partes usa sempre 1 kHz)
+                output_options["video_track_timescale"] = timescale
+
+            video = ffmpeg.input(list_path, f="concat", safe=0)
+            audio = ffmpeg.input(video_path, ss=start, to=end)
+            _run_with_progress(
+                ffmpeg.output(video["v"], audio["a?"], output_path, **output_options).overwrite_output(),
+                end - start,
+                step_progress(len(steps)),
+                trace_name="ffmpeg.smart_render.concat",
+                cancel_event=cancel_event
+            )
+        return True
+    except ffmpeg.Error as e:
+        logging.error(f"Erro no corte inteligente: {e.stderr.decode('utf-8')}")
+        raise
+
+# Peso no progresso de um segundo copiado em relação a um segundo recodificado
+_SMART_COPY_WEIGHT = 0.1
+
+# Perfis informados pelo ffprobe -> valor de -profile:v de cada encoder
+# (perfis ausentes não têm equivalente e o segmento é recodificado inteiro)
+SMART_RENDER_PROFILES = {
+    "libx264": {
+        "Constrained Baseline": "baseline",
+        "Main": "main",
+        "High": "high",
+        "High 10": "high10",
+        "High 4:2:2": "high422",
+        "High 4:4:4 Predictive": "high444",
+    },
+    "libx265": {
+        "Main": "main",
+        "Main 10": "main10",
+        "Main Still Picture": "mainstillpicture",
+    },
+}
+
+# Parâmetros do stream que a parte recodificada precisa repetir para a concatenação funcionar
+_MATCHED_FIELDS = ("codec_name", "profile", "level", "pix_fmt", "width", "height")
+
+def _video_stream_info(video_path):
+    """Primeiro stream de vídeo segundo a inspeção da mídia (None se não houver)."""
+    return probe(video_path).video
+
+def _matching_encode_options(video_stream, encoder):
+    """Opções do ffmpeg para recodificar no mesmo perfil, nível, pix_fmt e taxa de quadros da origem.
+
+    Returns:
+        Dicionário de opções de saída, ou None se o perfil da origem não tiver
+        equivalente no encoder
+    """
+    profile = SMART_RENDER_PROFILES.get(encoder, {}).get(video_stream.get("profile"))
+    if profile is None:
+        return None
+    options = {
+        "vcodec": encoder,
+        "crf": EXPORT_PARAMS["smart_render_crf"],
+        "profile:v": profile,
+    }
+    if video_stream.get("pix_fmt"):
+        options["pix_fmt"] = video_stream["pix_fmt"]
+    if video_stream.get("avg_frame_rate") not in (None, "0/0"):
+        options["r"] = video_stream["avg_frame_rate"]
+    level = video_stream.get("level")
+    if isinstance(level, int) and level > 0:
+        # level_idc do ffprobe: H.264 = nível * 10, HEVC = nível * 30
+        if encoder == "libx264":
+            options["level"] = f"{level / 10:g}"
+        else:
+            options["x265-params"] = f"level-idc={level / 30:g}"
+    return options
+
+def _parameter_mismatch(part_path, video_stream):
+    """Descrição dos parâmetros em que a parte recodificada difere da origem ("" se iguais)."""
+    from probe import describe, run_ffprobe
+
+    encoded = describe(run_ffprobe(part_path))["video"] or {}
+    return ", ".join(f"{field}: {encoded.get(field)} != {video_stream.get(field)}"
+                     for field in _MATCHED_FIELDS if encoded.get(field) != video_stream.get(field))
+
+def _timescale(video_stream):
+    """Denominador da base de tempo do stream ("1/12800" -> 12800), ou None."""
+    _, _, den = str(video_stream.get("time_base") or "").partition("/")
+    return int(den) if den.isdigit() and int(den) > 0 else None
+
+def _reencode_segment(video_path, output_path, start, end, progress_callback=None, cancel_event=None):
+    """Corte recodificando o segmento inteiro (preciso, porém lento)."""
+    _run_with_progress(
+        ffmpeg
+        .input(video_path, ss=start, to=end)
+        .output(output_path)
+        .overwrite_output(),
+        end - start,
+        progress_callback,
+        trace_name="ffmpeg.reencode",
+        cancel_event=cancel_event
+    )
+    return True
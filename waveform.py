@@ -0,0 +1,105 @@
+"""
+Pirâmide de resolução do áudio para desenhar a forma de onda na interface.
+
+O nível 0 tem um valor por milissegundo (mínimo, máximo e energia média, a
+mesma do envelope da detecção) e cada nível acima agrupa PYRAMID_FACTOR valores
+do anterior. Para desenhar um trecho em N pixels basta ler o nível com cerca de
+um valor por pixel, então o custo de cada redesenho depende da largura da tela
+e não da duração do arquivo (um arquivo de 6 horas tem ~21,6 milhões de ms).
+"""
+import math
+import numpy as np
+from music_detection import MAX_AMPLITUDE
+
+# Quantos valores de um nível formam um valor do nível seguinte
+PYRAMID_FACTOR = 4
+
+# Energia mínima considerada na conversão para dB (evita log de zero)
+_MIN_ENERGY = 1e-10
+
+def energy_to_dbfs(energy):
+    """Converte energia média (média dos quadrados das amostras) em dBFS, como o pydub."""
+    return 10 * np.log10(np.maximum(energy, _MIN_ENERGY) / MAX_AMPLITUDE ** 2)
+
+def _reduce(array, ufunc, factor, dtype=None):
+    """Aplica ufunc a cada grupo de factor valores (o último grupo pode ser menor)."""
+    full = len(array) // factor * factor
+    reduced = ufunc.reduce(array[:full].reshape(-1, factor), axis=1, dtype=dtype)
+    if full == len(array):
+        return reduced
+    return np.append(reduced, ufunc.reduce(array[full:], dtype=dtype))
+
+class WaveformPyramid:
+    """Níveis de mínimo/máximo/energia do áudio, do milissegundo até um único valor.
+
+    Args:
+        envelope: Energia por milissegundo (ver music_detection.compute_envelope)
+        peaks: Array (n, 2) com a amostra mínima e a máxima de cada milissegundo
+            (ver EnvelopeBuilder); sem ele a forma de onda é aproximada por ±RMS
+        factor: Valores de um nível agrupados em cada valor do nível seguinte
+    """
+
+    def __init__(self, envelope, peaks=None, factor=PYRAMID_FACTOR):
+        self.factor = factor
+        self.duration_ms = len(envelope)
+
+        energy = np.asarray(envelope, dtype=np.float32)
+        if peaks is not None and len(peaks) == len(energy):
+            mins, maxs = peaks[:, 0], peaks[:, 1]
+        else:
+            rms = np.sqrt(energy).astype(np.float32)
+            mins, maxs = -rms, rms
+        self.has_peaks = peaks is not None and len(peaks) == len(energy)
+
+        # Cada nível: (mínimos, máximos, energia); acima do nível 0 a energia é somada,
+        # o que dá a média exata mesmo no último valor, que pode agrupar menos que factor
+        self.levels = [(mins, maxs, energy)]
+        while len(self.levels[-1][0]) > 1:
+            mins, maxs, energy = self.levels[-1]
+            self.levels.append((
+                _reduce(mins, np.minimum, factor),
+                _reduce(maxs, np.maximum, factor),
+                _reduce(energy, np.add, factor, np.float64),
+            ))
+
+    def level_for(self, ms_per_pixel):
+        """Nível mais grosso com pelo menos um valor por pixel."""
+        if ms_per_pixel < self.factor:
+            return 0
+        level = int(math.log(ms_per_pixel, self.factor) + 1e-9)
+        return min(level, len(self.levels) - 1)
+
+    def columns(self, start_ms, end_ms, width):
+        """Resume o trecho [start_ms, end_ms) em até width colunas.
+
+        Lê no máximo cerca de factor * width valores do nível escolhido.
+
+        Returns:
+            Tupla (bordas em ms, mínimos, máximos, energia média): as bordas têm um
+            valor a mais que as colunas; com zoom além de 1 ms por pixel há menos
+            colunas que pixels.
+        """
+        start_ms = max(0, int(start_ms))
+        end_ms = min(self.duration_ms, int(math.ceil(end_ms)))
+        if width <= 0 or end_ms <= start_ms:
+            empty = np.empty(0)
+            return np.array([start_ms]), empty, empty, empty
+
+        level = self.level_for((end_ms - start_ms) / width)
+        bin_ms = self.factor ** level
+        mins, maxs, energy = self.levels[level]
+
+        first = start_ms // bin_ms
+        last = min(len(mins), -(-end_ms // bin_ms))
+        # Índices do nível onde começa cada coluna (colunas vazias são descartadas)
+        bounds = np.unique(np.linspace(first, last, width + 1).astype(np.int64))
+        starts = bounds[:-1] - first
+
+        col_mins = np.minimum.reduceat(mins[first:last], starts)
+        col_maxs = np.maximum.reduceat(maxs[first:last], starts)
+        col_energy = np.add.reduceat(energy[first:last].astype(np.float64), starts)
+        edges_ms = np.minimum(bounds * bin_ms, self.duration_ms)
+
+        # Nível 0 guarda a energia média de cada ms; os demais, a soma
+        counts = np.diff(edges_ms) if level else np.diff(bounds)
+        return edges_ms, col_mins, col_maxs, col_energy / np.maximum(counts, 1)